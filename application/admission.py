@@ -0,0 +1,104 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class OverloadedError(Exception):
+    """Raised when a request can neither start nor wait its turn
+
+    Args:
+        message (str): description of the refusal
+        retry_after (int): number of seconds after which to try again
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limits the number of concurrent expensive operations, queueing the
+    overflow so that the cheapest queued operations start first, and turning
+    away requests once the queue is full.
+
+    Args:
+        max_concurrent (int): number of operations allowed to run at once
+        max_queued (int): number of operations allowed to wait
+        queue_timeout (float): number of seconds an operation may wait
+        smoothing (float): weight given to the latest duration when updating
+            the average duration of operations
+    """
+
+    def __init__(self, max_concurrent, max_queued, queue_timeout, smoothing=0.2):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.smoothing = smoothing
+        self.active = 0
+        self.average_duration = 1.0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    @property
+    def queued(self):
+        return len(self._queue)
+
+    @property
+    def retry_after(self):
+        """Estimated number of seconds before the queue has room again"""
+        waves = (len(self._queue) + 1) / self.max_concurrent
+        return max(1, int(math.ceil(self.average_duration * waves)))
+
+    def _acquire(self, cost):
+        with self._condition:
+            if self.active < self.max_concurrent and not self._queue:
+                self.active += 1
+                return
+            if len(self._queue) >= self.max_queued:
+                raise OverloadedError('Too many pending profile builds', self.retry_after)
+
+            ticket = (cost, next(self._sequence))
+            heapq.heappush(self._queue, ticket)
+            deadline = time.time() + self.queue_timeout
+            while self._queue[0] != ticket or self.active >= self.max_concurrent:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._condition.notify_all()
+                    raise OverloadedError('Timed out waiting to build profile', self.retry_after)
+                self._condition.wait(remaining)
+            heapq.heappop(self._queue)
+            self.active += 1
+            self._condition.notify_all()
+
+    def _release(self, duration):
+        with self._condition:
+            self.active -= 1
+            self.average_duration = (
+                self.smoothing * duration
+                + (1 - self.smoothing) * self.average_duration
+            )
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, cost):
+        """Wait for permission to run an operation of the given cost.
+
+        Args:
+            cost (float): estimated cost of the operation; cheaper operations
+                are admitted first
+
+        Raise:
+            OverloadedError: if the queue is full, or the wait times out
+        """
+        self._acquire(cost)
+        start = time.time()
+        try:
+            yield
+        finally:
+            self._release(time.time() - start)
@@ -0,0 +1,213 @@
+from application.helpers import COUNT_FIELDS
+from cache.records import Vocabulary
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+FIELDS = COUNT_FIELDS + ('original', 'forked')
+FLAGS = ('present', 'original', 'forked')
+DIMENSIONS = ('language', 'topic', 'group')
+
+
+class ProfileTable:
+    """Holds many profiles in columns, so that they may be summed, grouped
+    and ranked in vectorized passes rather than profile by profile.
+
+    Each profile is a row of FIELDS counts, flagged with whether it is
+    present and which repository counts it holds, so that aggregates keep the
+    fields merge_profiles would. Languages and topics are stored as (row,
+    label id) pairs, and each row may belong to one group (eg. an
+    organization).
+
+    Args:
+        profiles (iterable): profile data, as returned by the providers or
+            merge_profiles; None stands for a missing profile
+        keys (iterable): identifiers of the profiles, reported by top(); the
+            row numbers by default
+        groups (iterable): the group of each profile, or None
+
+    Raise:
+        ImportError: if numpy is not installed
+    """
+
+    def __init__(self, profiles, keys=None, groups=None):
+        if numpy is None:
+            raise ImportError('The numpy package is required to use ProfileTable')
+        profiles = list(profiles)
+        self.keys = list(range(len(profiles))) if keys is None else list(keys)
+        self.vocabularies = {dimension: Vocabulary() for dimension in DIMENSIONS}
+
+        rows = []
+        flags = []
+        pairs = {'language': ([], []), 'topic': ([], [])}
+        group_rows = []
+        group_ids = []
+        groups = [None] * len(profiles) if groups is None else list(groups)
+        for row, (profile, group) in enumerate(zip(profiles, groups)):
+            rows.append(self._get_counts(profile))
+            flags.append(self._get_flags(profile))
+            for dimension, field in (('language', 'languages'), ('topic', 'topics')):
+                for label in (profile or {}).get(field, ()):
+                    pairs[dimension][0].append(row)
+                    pairs[dimension][1].append(self.vocabularies[dimension].get_id(label))
+            if group is not None:
+                group_rows.append(row)
+                group_ids.append(self.vocabularies['group'].get_id(group))
+
+        self.values = numpy.array(rows, dtype=numpy.int64).reshape(len(rows), len(FIELDS))
+        self.flags = numpy.array(flags, dtype=numpy.int64).reshape(len(flags), len(FLAGS))
+        self.labels = {
+            dimension: (
+                numpy.array(label_rows, dtype=numpy.int64),
+                numpy.array(label_ids, dtype=numpy.int64),
+            )
+            for dimension, (label_rows, label_ids) in pairs.items()
+        }
+        self.labels['group'] = (
+            numpy.array(group_rows, dtype=numpy.int64),
+            numpy.array(group_ids, dtype=numpy.int64),
+        )
+
+    @staticmethod
+    def _get_counts(profile):
+        """Flatten a profile into a row of FIELDS counts"""
+        if not profile:
+            return [0] * len(FIELDS)
+        repositories = profile.get('repositories')
+        if isinstance(repositories, dict):
+            original = repositories.get('original', 0)
+            forked = repositories.get('forked', 0)
+        else:
+            original = repositories if isinstance(repositories, int) else 0
+            forked = 0
+        return [profile.get(field, 0) for field in COUNT_FIELDS] + [original, forked]
+
+    @staticmethod
+    def _get_flags(profile):
+        """Tell whether a profile is present, and whether it counts original
+        and forked repositories, as a row of FLAGS"""
+        if not profile:
+            return [0] * len(FLAGS)
+        repositories = profile.get('repositories')
+        return [
+            1,
+            int(isinstance(repositories, (int, dict))),
+            int(isinstance(repositories, dict)),
+        ]
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def _to_profile(counts, flags, languages, topics):
+        """Build the profile data merge_profiles would return for aggregated
+        counts, given the number of aggregated rows carrying each of FLAGS"""
+        profile = {'repositories': {}}
+        if flags[FLAGS.index('present')]:
+            if flags[FLAGS.index('original')]:
+                profile['repositories']['original'] = int(counts[-2])
+            if flags[FLAGS.index('forked')]:
+                profile['repositories']['forked'] = int(counts[-1])
+            profile.update(zip(COUNT_FIELDS, (int(count) for count in counts)))
+        profile['languages'] = sorted(languages)
+        profile['topics'] = sorted(topics)
+        return profile
+
+    def _present_labels(self, dimension):
+        """Return the labels of the given dimension used by any profile"""
+        vocabulary = self.vocabularies[dimension]
+        return [
+            vocabulary.labels[label_id]
+            for label_id in numpy.unique(self.labels[dimension][1])
+        ]
+
+    def _get_cooccurrences(self, dimension, other):
+        """Pair each label of a dimension with the labels of another that
+        appear on the same profiles.
+
+        Return:
+            a dict of label id lists of the other dimension, by label id
+        """
+        rows, ids = self.labels[dimension]
+        other_rows, other_ids = self.labels[other]
+        order = numpy.argsort(other_rows, kind='stable')
+        other_rows, other_ids = other_rows[order], other_ids[order]
+
+        counts = numpy.bincount(other_rows, minlength=len(self))
+        starts = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+        repeats = counts[rows]
+        pair_ids = numpy.repeat(ids, repeats)
+        offsets = numpy.arange(repeats.sum()) - numpy.repeat(
+            numpy.cumsum(repeats) - repeats,
+            repeats
+        )
+        pair_other_ids = other_ids[numpy.repeat(starts[rows], repeats) + offsets]
+
+        width = max(len(self.vocabularies[other]), 1)
+        pairs = numpy.unique(pair_ids * width + pair_other_ids)
+        label_ids, other_ids = numpy.divmod(pairs, width)
+        present_ids, starts = numpy.unique(label_ids, return_index=True)
+        return dict(zip(
+            present_ids.tolist(),
+            (chunk.tolist() for chunk in numpy.split(other_ids, starts[1:]))
+        ))
+
+    def sum(self):
+        """Aggregate every profile, as merge_profiles would"""
+        return self._to_profile(
+            self.values.sum(axis=0),
+            self.flags.sum(axis=0),
+            self._present_labels('language'),
+            self._present_labels('topic'),
+        )
+
+    def group_by(self, dimension):
+        """Aggregate the profiles sharing each label of the given dimension.
+
+        Args:
+            dimension (str): one of "language", "topic" or "group"
+
+        Return:
+            a dict of aggregated profile data, by label, as merge_profiles
+            would return for the profiles sharing it, each also holding the
+            number of (present) profiles aggregated under "profiles"
+        """
+        label_rows, label_ids = self.labels[dimension]
+        size = len(self.vocabularies[dimension])
+        totals = numpy.zeros((size, len(FIELDS)), dtype=numpy.int64)
+        numpy.add.at(totals, label_ids, self.values[label_rows])
+        flag_totals = numpy.zeros((size, len(FLAGS)), dtype=numpy.int64)
+        numpy.add.at(flag_totals, label_ids, self.flags[label_rows])
+
+        languages = self._get_cooccurrences(dimension, 'language')
+        topics = self._get_cooccurrences(dimension, 'topic')
+        language_labels = self.vocabularies['language'].labels
+        topic_labels = self.vocabularies['topic'].labels
+        groups = {}
+        for label_id, label in enumerate(self.vocabularies[dimension].labels):
+            profile = self._to_profile(
+                totals[label_id],
+                flag_totals[label_id],
+                [language_labels[other_id] for other_id in languages.get(label_id, ())],
+                [topic_labels[other_id] for other_id in topics.get(label_id, ())],
+            )
+            profile['profiles'] = int(flag_totals[label_id][FLAGS.index('present')])
+            groups[label] = profile
+        return groups
+
+    def top(self, field, k):
+        """Rank profiles by one of FIELDS.
+
+        Return:
+            a list of up to k (key, count) tuples, highest count first
+        """
+        column = self.values[:, FIELDS.index(field)]
+        k = min(k, len(column))
+        if k <= 0:
+            return []
+        candidates = numpy.argpartition(-column, k - 1)[:k]
+        ranked = candidates[numpy.argsort(-column[candidates], kind='stable')]
+        return [(self.keys[row], int(column[row])) for row in ranked]
@@ -0,0 +1,123 @@
+import hmac
+import os
+import re
+import tempfile
+import threading
+import uuid
+
+from flask import Blueprint, g, request
+from flask import make_response as make_flask_response
+
+from application.api.common import make_response
+from application.sampling import SamplingProfiler, profile_process
+from clients.limiter import limiters
+from config import config
+
+
+admin_blueprint = Blueprint('admin', __name__)
+
+PROFILE_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# The upstreams whose limiters are registered once their client is first
+# imported (see clients/__init__.py)
+UPSTREAMS = ('github', 'bitbucket')
+
+
+@admin_blueprint.route('/metrics')
+def get_metrics():
+    """Report the state of each upstream's concurrency limiter, or null for
+    those not initialized yet because the worker has not used their client"""
+    if not is_authorized(_get_bearer_token()):
+        return make_response({'error': 'Invalid admin token'}, 401)
+    metrics = dict.fromkeys(UPSTREAMS)
+    metrics.update(
+        (name, limiter.get_metrics())
+        for name, limiter in limiters.items()
+    )
+    return make_response({'limiters': metrics}, 200)
+
+
+def is_authorized(token):
+    """Return whether the given token matches the configured admin_token;
+    nothing does while it is empty"""
+    admin_token = config['admin_token']
+    if not admin_token or not token:
+        return False
+    return hmac.compare_digest(token.encode('utf-8'), admin_token.encode('utf-8'))
+
+
+def _get_bearer_token():
+    authorization = request.headers.get('Authorization', '')
+    if not authorization.startswith('Bearer '):
+        return None
+    return authorization[len('Bearer '):]
+
+
+def _make_folded_response(stacks):
+    return make_flask_response(stacks, 200, {'Content-Type': 'text/plain; charset=utf-8'})
+
+
+def _get_profile_path(profile_id):
+    directory = config['profiler_output_dir'] or tempfile.gettempdir()
+    return os.path.join(directory, 'repoziptories-profile-{}.folded'.format(profile_id))
+
+
+@admin_blueprint.route('/profile')
+def profile_worker():
+    """Sample the stacks of every other thread of the worker serving this
+    request for ?seconds, and return them in folded format"""
+    if not is_authorized(_get_bearer_token()):
+        return make_response({'error': 'Invalid admin token'}, 401)
+    try:
+        seconds = float(request.args.get('seconds', 10))
+    except ValueError:
+        return make_response({'error': 'Invalid duration'}, 400)
+    if not 0 < seconds <= float(config['profiler_max_seconds']):
+        return make_response(
+            {'error': 'Duration must be within {}s'.format(config['profiler_max_seconds'])},
+            400
+        )
+
+    stacks = profile_process(seconds, interval=float(config['profiler_interval']))
+    if stacks is None:
+        return make_response({'error': 'A profile is already running'}, 409)
+    return _make_folded_response(stacks)
+
+
+@admin_blueprint.route('/profile/<profile_id>')
+def get_request_profile(profile_id):
+    """Return the folded stacks sampled while serving a profiled request"""
+    if not is_authorized(_get_bearer_token()):
+        return make_response({'error': 'Invalid admin token'}, 401)
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return make_response({'error': 'No such profile'}, 404)
+    try:
+        with open(_get_profile_path(profile_id)) as profile_file:
+            return _make_folded_response(profile_file.read())
+    except FileNotFoundError:
+        return make_response({'error': 'No such profile'}, 404)
+
+
+@admin_blueprint.before_app_request
+def start_request_profile():
+    """Sample the thread serving any request carrying the admin token in an
+    X-Profile header"""
+    if is_authorized(request.headers.get('X-Profile')):
+        g.profiler = SamplingProfiler(
+            float(config['profiler_interval']),
+            thread_ids=[threading.get_ident()],
+        )
+        g.profiler.start()
+
+
+@admin_blueprint.after_app_request
+def stop_request_profile(response):
+    """Store the samples of a profiled request, identifying them by the
+    X-Profile-Id response header (see get_request_profile)"""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profile_id = uuid.uuid4().hex
+        with open(_get_profile_path(profile_id), 'w') as profile_file:
+            profile_file.write(profiler.stop())
+        response.headers['X-Profile-Id'] = profile_id
+    return response
@@ -1,11 +1,124 @@
+import gzip
+import hashlib
 import json
 
+from flask import has_request_context, request
 from flask import make_response as make_flask_response
+from werkzeug.http import http_date
 
+from config import config
 
-def make_response(content, status):
-    return make_flask_response(
-        json.dumps(content),
-        status,
-        {'Content-Type': 'application/json'}
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+def _serialize_json(content):
+    return json.dumps(content).encode('utf-8')
+
+
+def _serialize_orjson(content):
+    return orjson.dumps(content)
+
+
+SERIALIZERS = {'json': _serialize_json}
+if orjson is not None:
+    SERIALIZERS['orjson'] = _serialize_orjson
+
+COMPRESSORS = {'gzip': gzip.compress}
+if brotli is not None:
+    COMPRESSORS['br'] = brotli.compress
+
+
+def get_serializer(name='auto'):
+    """Return the function used to encode response content as JSON bytes.
+
+    Args:
+        name (str): one of SERIALIZERS, or "auto" to pick the fastest one
+            installed
+
+    Return:
+        a callable accepting JSON-compatible content and returning bytes
+    """
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in SERIALIZERS else 'json'
+    return SERIALIZERS[name]
+
+
+serialize = get_serializer(config['json_serializer'])
+
+
+def negotiate_encoding(accept_encodings):
+    """Pick the preferred supported content coding.
+
+    Args:
+        accept_encodings (werkzeug.datastructures.Accept): the parsed
+            Accept-Encoding header of the request
+
+    Return:
+        the name of a COMPRESSORS entry, or None to leave the body as-is
+    """
+    best_encoding = None
+    best_quality = 0
+    for encoding in ('br', 'gzip'):
+        if encoding not in COMPRESSORS:
+            continue
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+    return best_encoding
+
+
+def make_etag(body):
+    """Return an entity tag identifying the given serialized content. It is
+    sent as a weak validator, which stays valid whichever content coding is
+    applied to the body."""
+    return hashlib.sha1(body).hexdigest()
+
+
+def make_response(content, status, last_modified=None, max_age=None, headers=None):
+    """Serialize the given content into a JSON response.
+
+    Args:
+        content: JSON-compatible data to return
+        status (int): HTTP status code of the response
+        last_modified (float): timestamp at which the content was retrieved
+        max_age (int): number of seconds for which HTTP caches may reuse the
+            response; if given, the response carries validators and requests
+            with a matching If-None-Match header receive a 304
+        headers (dict): additional response headers
+
+    Return:
+        a flask.Response
+    """
+    body = serialize(content)
+    headers = dict(headers or {})
+    headers['Content-Type'] = 'application/json'
+    compressible = (
+        has_request_context() and len(body) >= int(config['compression_min_size'])
     )
+    if compressible:
+        # set before any 304, which must vary as the full response would
+        headers['Vary'] = 'Accept-Encoding'
+    if max_age is not None:
+        etag = make_etag(body)
+        headers['ETag'] = 'W/"{}"'.format(etag)
+        headers['Cache-Control'] = 'public, max-age={}'.format(max_age)
+        if last_modified is not None:
+            headers['Last-Modified'] = http_date(last_modified)
+        if has_request_context() and request.if_none_match.contains_weak(etag):
+            headers.pop('Content-Type')
+            return make_flask_response(b'', 304, headers)
+
+    if compressible:
+        encoding = negotiate_encoding(request.accept_encodings)
+        if encoding:
+            body = COMPRESSORS[encoding](body)
+            headers['Content-Encoding'] = encoding
+    return make_flask_response(body, status, headers)
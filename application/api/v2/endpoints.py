@@ -2,15 +2,13 @@ from distutils.util import strtobool
 
 from flask import Blueprint, request
 
+from application.admission import OverloadedError
 from application.api.common import make_response
 from application.helpers import merge_profiles
-from clients import GithubClient, BitBucketClient
-from clients.exceptions import (
-    InvalidCredentialsError,
-    RateLimitError,
-    UnknownProfileError,
-)
-from config import config
+from application.history import get_history
+from application.organizations import get_organization_profile
+from application.profiles import get_max_age, get_profiles
+from clients.exceptions import InvalidCredentialsError, RateLimitError
 
 
 v2_blueprint = Blueprint('v2', __name__)
@@ -19,28 +17,91 @@ v2_blueprint = Blueprint('v2', __name__)
 @v2_blueprint.route('/profile/<username>')
 def get_merged_profiles_v2(username):
     github_username = request.args.get('github_username', username)
-    github_client = GithubClient(config['github_token'])
+    bitbucket_username = request.args.get('bitbucket_username', username)
+    bitbucket_team = request.args.get('bitbucket_team')
+    is_team = None if bitbucket_team is None else bool(strtobool(bitbucket_team))
     try:
-        github_profile = github_client.get_profile(github_username)
-    except UnknownProfileError:
-        github_profile = None
+        profiles, fetched_at = get_profiles(
+            github_username,
+            bitbucket_username,
+            is_team
+        )
     except RateLimitError as error:
         return make_response({'error': str(error)}, 429)
     except InvalidCredentialsError as error:
         return make_response({'error': str(error)}, 401)
+    except OverloadedError as error:
+        return make_response(
+            {'error': str(error)},
+            503,
+            headers={'Retry-After': str(error.retry_after)}
+        )
+
+    profile = merge_profiles(profiles['github'], profiles['bitbucket'])
+    return make_response(
+        profile,
+        200,
+        last_modified=fetched_at,
+        max_age=get_max_age(fetched_at)
+    )
 
+
+@v2_blueprint.route('/profile/<username>/history')
+def get_profile_history_v2(username):
+    github_username = request.args.get('github_username', username)
     bitbucket_username = request.args.get('bitbucket_username', username)
-    is_team = bool(strtobool(request.args.get('bitbucket_team', 'true')))
-    bitbucket_client = BitBucketClient()
     try:
-        bitbucket_profile = bitbucket_client.get_profile(
-            bitbucket_username,
-            is_team=is_team
+        start, end = (
+            _parse_timestamp(request.args.get(name))
+            for name in ('start', 'end')
+        )
+    except ValueError as error:
+        return make_response({'error': str(error)}, 400)
+
+    points = get_history(github_username, bitbucket_username, start, end)
+    return make_response(
+        {
+            'points': [
+                dict(metrics, timestamp=timestamp)
+                for timestamp, metrics in points
+            ],
+        },
+        200
+    )
+
+
+def _parse_timestamp(value):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError('Invalid timestamp: {}'.format(value))
+
+
+@v2_blueprint.route('/organization/<name>')
+def get_organization_profile_v2(name):
+    github_organization = request.args.get('github_organization', name)
+    bitbucket_team = request.args.get('bitbucket_team', name)
+    try:
+        profile, fetched_at = get_organization_profile(
+            github_organization,
+            bitbucket_team
         )
-    except UnknownProfileError:
-        bitbucket_profile = None
     except RateLimitError as error:
         return make_response({'error': str(error)}, 429)
+    except InvalidCredentialsError as error:
+        return make_response({'error': str(error)}, 401)
+    except OverloadedError as error:
+        return make_response(
+            {'error': str(error)},
+            503,
+            headers={'Retry-After': str(error.retry_after)}
+        )
 
-    profile = merge_profiles(github_profile, bitbucket_profile)
-    return make_response(profile, 200)
+    return make_response(
+        profile,
+        200,
+        last_modified=fetched_at,
+        max_age=get_max_age(fetched_at)
+    )
@@ -0,0 +1,47 @@
+from flask import Blueprint, request
+
+from application.api.common import make_response
+from application.webhooks import (
+    handle_bitbucket_event,
+    handle_github_event,
+    verify_signature,
+)
+from config import config
+
+
+webhooks_blueprint = Blueprint('webhooks', __name__)
+
+
+@webhooks_blueprint.route('/github', methods=['POST'])
+def receive_github_event():
+    return _receive_event(
+        config['webhook_github_secret'],
+        request.headers.get('X-Hub-Signature-256'),
+        request.headers.get('X-GitHub-Event', ''),
+        lambda event, payload: handle_github_event(
+            event,
+            payload,
+            request.headers.get('X-GitHub-Delivery')
+        ),
+    )
+
+
+@webhooks_blueprint.route('/bitbucket', methods=['POST'])
+def receive_bitbucket_event():
+    return _receive_event(
+        config['webhook_bitbucket_secret'],
+        request.headers.get('X-Hub-Signature'),
+        request.headers.get('X-Event-Key', ''),
+        handle_bitbucket_event,
+    )
+
+
+def _receive_event(secret, signature, event, handle):
+    if not secret:
+        return make_response({'error': 'Webhooks are not configured'}, 404)
+    if not verify_signature(secret, request.get_data(), signature):
+        return make_response({'error': 'Invalid signature'}, 401)
+    payload = request.get_json(force=True, silent=True)
+    if not isinstance(payload, dict):
+        return make_response({'error': 'Invalid payload'}, 400)
+    return make_response(handle(event, payload), 200)
@@ -0,0 +1,281 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from application.helpers import merge_profiles
+from application.history import METRICS, get_metrics
+from application.profiles import build_profiles
+from clients.exceptions import InvalidCredentialsError, RateLimitError
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class RatePacer:
+    """Spaces the start of profile crawls so that they spend no more than an
+    hourly rate budget, and holds them all back after a rate limit is hit.
+
+    Args:
+        rate_budget (int): upstream requests allowed per hour, or 0 to start
+            crawls as soon as a worker is free
+        profile_cost (int): estimated upstream requests per profile
+    """
+
+    def __init__(self, rate_budget, profile_cost):
+        self.spacing = 3600 * profile_cost / rate_budget if rate_budget > 0 else 0
+        self._next_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next crawl may start"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.spacing
+        time.sleep(start - now)
+
+    def pause(self, seconds):
+        """Start no crawl for the given number of seconds"""
+        with self._lock:
+            self._next_start = max(self._next_start, time.monotonic() + seconds)
+
+
+class Checkpoint:
+    """Records which usernames have been written out, along with the state of
+    the writer at that point, in an append-only file. A line only counts once
+    complete, so that a run may be killed at any time.
+
+    Args:
+        path (str): location of the checkpoint file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self.state = None
+        if os.path.exists(path):
+            with open(path) as checkpoint_file:
+                for line in checkpoint_file:
+                    if not line.endswith('\n'):
+                        break
+                    entry = json.loads(line)
+                    self.done.update(entry['done'])
+                    self.state = entry['state']
+        self._file = open(path, 'a')
+
+    def save(self, usernames, state):
+        self._file.write(json.dumps({'done': usernames, 'state': state}) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done.update(usernames)
+        self.state = state
+
+    def close(self):
+        self._file.close()
+
+
+class NDJSONWriter:
+    """Appends rows to a file of JSON lines. Its state is the size of the
+    file, to which it is truncated on resumption, dropping any rows written
+    after the last checkpoint."""
+
+    def __init__(self, path, state=None):
+        self._file = open(path, 'r+b' if os.path.exists(path) else 'wb')
+        self._file.truncate(state or 0)
+        self._file.seek(state or 0)
+
+    def write(self, rows):
+        """Write the given rows durably, returning the writer's state"""
+        for row in rows:
+            self._file.write(json.dumps(row).encode('utf-8') + b'\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """Writes each batch of rows to its own Parquet file within a directory,
+    profile counts as columns. Its state is the number of files written;
+    files written after the last checkpoint are deleted on resumption."""
+
+    def __init__(self, path, state=None):
+        if pyarrow is None:
+            raise ImportError('The pyarrow package is required to export Parquet files')
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.parts = state or 0
+        for name in os.listdir(path):
+            if name.startswith('part-') and int(name[5:10]) > self.parts:
+                os.remove(os.path.join(path, name))
+        self.schema = pyarrow.schema(
+            [('username', pyarrow.string()), ('found', pyarrow.bool_())]
+            + [(field, pyarrow.int64()) for field in METRICS]
+            + [
+                ('languages', pyarrow.list_(pyarrow.string())),
+                ('topics', pyarrow.list_(pyarrow.string())),
+                ('error', pyarrow.string()),
+            ]
+        )
+
+    def write(self, rows):
+        """Write the given rows durably, returning the writer's state"""
+        columns = {name: [] for name in self.schema.names}
+        for row in rows:
+            profile = row['profile'] or {}
+            columns['username'].append(row['username'])
+            columns['found'].append(row['profile'] is not None)
+            for field, value in zip(METRICS, get_metrics(profile)):
+                columns[field].append(value)
+            columns['languages'].append(profile.get('languages', []))
+            columns['topics'].append(profile.get('topics', []))
+            columns['error'].append(row.get('error'))
+
+        self.parts += 1
+        pyarrow.parquet.write_table(
+            pyarrow.table(columns, schema=self.schema),
+            os.path.join(self.path, 'part-{:05d}.parquet'.format(self.parts))
+        )
+        return self.parts
+
+    def close(self):
+        pass
+
+
+WRITERS = {'ndjson': NDJSONWriter, 'parquet': ParquetWriter}
+
+
+def crawl_profile(username):
+    """Build the merged profile of an account sharing the given name on both
+    providers.
+
+    Return:
+        an output row holding the username, and the merged profile data or
+        None if neither account exists
+    """
+    profiles = build_profiles(username, username)
+    if not any(profiles.values()):
+        return {'username': username, 'profile': None}
+    return {
+        'username': username,
+        'profile': merge_profiles(profiles['github'], profiles['bitbucket']),
+    }
+
+
+class BulkCrawler:
+    """Crawls the merged profiles of many usernames concurrently, streaming
+    them to a writer in batches. Each batch is checkpointed once written, so
+    that an interrupted crawl resumes without crawling its usernames again.
+
+    Args:
+        writer: an NDJSONWriter or ParquetWriter
+        checkpoint (Checkpoint): record of the usernames already written
+        pacer (RatePacer): paces the start of each crawl
+        workers (int): number of profiles crawled at once
+        batch_size (int): number of rows written at a time
+        rate_limit_pause (int): number of seconds to hold crawls back after a
+            rate limit is hit
+        crawl (callable): returns the output row of a username
+    """
+
+    def __init__(self, writer, checkpoint, pacer, workers, batch_size,
+                 rate_limit_pause, crawl=crawl_profile):
+        self.writer = writer
+        self.checkpoint = checkpoint
+        self.pacer = pacer
+        self.workers = workers
+        self.batch_size = batch_size
+        self.rate_limit_pause = rate_limit_pause
+        self.crawl = crawl
+        self.written = 0
+
+    def _crawl(self, username):
+        """Crawl a profile once the pacer allows, retrying for as long as the
+        rate limit is hit. Any other error but invalid credentials makes an
+        error row of the username, rather than stopping the run."""
+        while True:
+            self.pacer.wait()
+            try:
+                return self.crawl(username)
+            except RateLimitError:
+                logger.warning(
+                    'Rate limit hit while crawling %s, pausing for %ss',
+                    username,
+                    self.rate_limit_pause
+                )
+                self.pacer.pause(self.rate_limit_pause)
+            except InvalidCredentialsError:
+                raise
+            except Exception as error:
+                # any other failure (eg. an unexpected PyGithub or requests
+                # error) only concerns this username
+                logger.exception('Failed to crawl %s', username)
+                return {
+                    'username': username,
+                    'profile': None,
+                    'error': str(error) or type(error).__name__,
+                }
+
+    def run(self, usernames):
+        """Crawl the given usernames, skipping those already checkpointed.
+
+        Args:
+            usernames (iterable): the names to crawl; consumed lazily, so that
+                it may be a file
+
+        Return:
+            the number of rows written
+
+        Raise:
+            InvalidCredentialsError: if GitHub rejects the configured token;
+                rows written until then remain checkpointed
+        """
+        batch = []
+        pending = set()
+        seen = set(self.checkpoint.done)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                for username in usernames:
+                    username = username.strip()
+                    if not username or username in seen:
+                        continue
+                    seen.add(username)
+                    pending.add(executor.submit(self._crawl, username))
+                    if len(pending) >= self.workers * 2:
+                        pending = self._collect(pending, batch, FIRST_COMPLETED)
+                self._collect(pending, batch)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+        if batch:
+            self._flush(batch)
+        return self.written
+
+    def _collect(self, futures, batch, return_when=ALL_COMPLETED):
+        """Move the rows of completed crawls to the batch, writing it out
+        whenever full, and return the crawls still running"""
+        done, not_done = wait(futures, return_when=return_when)
+        for future in done:
+            batch.append(future.result())
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+        return not_done
+
+    def _flush(self, batch):
+        state = self.writer.write(batch)
+        self.checkpoint.save([row['username'] for row in batch], state)
+        self.written += len(batch)
+        logger.info('Wrote %s profiles', self.written)
+        del batch[:]
@@ -1,18 +1,20 @@
 from collections import defaultdict
 
 
+COUNT_FIELDS = ('stars', 'starred', 'issues', 'followers', 'following', 'commits')
+
+
 def merge_profiles(*profiles):
     """Aggregate the data of the given SCM profiles"""
     merged_profile = defaultdict(int)
     merged_profile['repositories'] = defaultdict(int)
-    count_fields = ('stars', 'starred', 'issues', 'followers', 'following', 'commits')
     languages = set()
     topics = set()
     for profile in profiles:
         if not profile:
             continue
 
-        for field in count_fields:
+        for field in COUNT_FIELDS:
             merged_profile[field] += profile.get(field, 0)
 
         languages.update(profile.get('languages', []))
@@ -26,7 +28,69 @@ def merge_profiles(*profiles):
             merged_profile['repositories']['forked'] += repositories.get('forked', 0)
 
     merged_profile.update({
-        'languages': list(languages),
-        'topics': list(topics),
+        'languages': sorted(languages),
+        'topics': sorted(topics),
     })
     return dict(merged_profile)
+
+
+def summarize_organization(crawl):
+    """Derive profile data from the crawl of an organization (see
+    GithubClient.get_organization), counting each repository once.
+
+    Return:
+        a tuple of:
+            - the organization's profile data, or None if there is no crawl
+            - a dict of each member's profile data, by name; members are
+              credited with the repositories they own, and with their commits
+              to any of the organization's repositories
+    """
+    if not crawl:
+        return None, {}
+
+    def new_profile(user_data):
+        profile = dict(user_data)
+        profile.update({
+            'repositories': {'original': 0, 'forked': 0},
+            'stars': 0,
+            'issues': 0,
+            'watchers': 0,
+            'commits': 0,
+            'languages': set(),
+            'topics': set(),
+        })
+        return profile
+
+    user_fields = ('followers', 'following', 'starred')
+    totals = new_profile({
+        field: sum(user_data.get(field, 0) for user_data in crawl['members'].values())
+        for field in user_fields
+    })
+    members = {
+        name: new_profile(user_data)
+        for name, user_data in crawl['members'].items()
+    }
+
+    for repo in crawl['repositories'].values():
+        owners = [totals]
+        if repo['owner'] in members:
+            owners.append(members[repo['owner']])
+        for profile in owners:
+            profile['repositories']['forked' if repo['fork'] else 'original'] += 1
+            for field in ('stars', 'issues', 'watchers'):
+                profile[field] += repo.get(field, 0)
+
+        for name, count in repo['commits'].items():
+            totals['commits'] += count
+            if name in members:
+                members[name]['commits'] += count
+
+        names = {repo['owner']} | set(repo['commits'])
+        for profile in [totals] + [members[name] for name in names if name in members]:
+            profile['languages'].update(repo['languages'])
+            profile['topics'].update(repo['topics'])
+
+    for profile in [totals] + list(members.values()):
+        profile['languages'] = sorted(profile['languages'])
+        profile['topics'] = sorted(profile['topics'])
+    return totals, members
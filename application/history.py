@@ -0,0 +1,316 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from application.helpers import COUNT_FIELDS, merge_profiles
+from config import config
+
+
+logger = logging.getLogger(__name__)
+
+METRICS = COUNT_FIELDS + ('original', 'forked')
+RAW = 0
+
+
+def get_metrics(profile):
+    """Flatten merged profile data into a tuple of METRICS counts"""
+    repositories = profile.get('repositories', {})
+    if isinstance(repositories, int):
+        repositories = {'original': repositories}
+    return tuple(profile.get(field, 0) for field in COUNT_FIELDS) + (
+        repositories.get('original', 0),
+        repositories.get('forked', 0),
+    )
+
+
+def _encode(values):
+    """Pack integers into zigzag varints, so that small counts and deltas
+    take a byte each"""
+    data = bytearray()
+    for value in values:
+        value = (value << 1) ^ (value >> 63)
+        while value > 0x7f:
+            data.append((value & 0x7f) | 0x80)
+            value >>= 7
+        data.append(value)
+    return bytes(data)
+
+
+def _decode(data):
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append((value >> 1) ^ -(value & 1))
+            value = shift = 0
+    return values
+
+
+class HistoryStore:
+    """Keeps time series of profile metrics in a SQLite file shared by every
+    process on the host.
+
+    Each point holds the METRICS of a profile at a given time, stored as its
+    difference from the previous point of the series; every keyframe_interval
+    points, a keyframe holds the absolute values instead, so that a range is
+    read from the keyframe preceding it. Points older than raw_retention
+    seconds are downsampled to the last point of each downsample_interval.
+
+    Args:
+        path (str): location of the database file
+        min_interval (int): minimum number of seconds between the points of a
+            series; more frequent points are dropped
+        keyframe_interval (int): maximum number of points between keyframes
+        raw_retention (int): number of seconds for which every point is kept
+        downsample_interval (int): number of seconds covered by each point
+            once downsampled
+    """
+
+    def __init__(self, path, min_interval=3600, keyframe_interval=32,
+                 raw_retention=604800, downsample_interval=86400):
+        self.path = path
+        self.min_interval = min_interval
+        self.keyframe_interval = keyframe_interval
+        self.raw_retention = raw_retention
+        self.downsample_interval = downsample_interval
+        self._local = threading.local()
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS points ('
+            'key TEXT, resolution INTEGER, timestamp INTEGER, keyframe INTEGER, '
+            'data BLOB, PRIMARY KEY (key, resolution, timestamp)) WITHOUT ROWID'
+        )
+
+    def _connect(self):
+        """Return a connection owned by the current thread and process"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def record(self, key, profile, timestamp=None):
+        """Append the metrics of the given merged profile data to a series.
+
+        Args:
+            key (str): identifier of the series
+            profile (dict): merged profile data
+            timestamp (int): time of the point; now by default
+
+        Return:
+            whether the point was stored, rather than dropped for following
+            the last one too closely
+        """
+        timestamp = int(time.time() if timestamp is None else timestamp)
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            stored = self._append(connection, key, RAW, timestamp, get_metrics(profile), True)
+            if stored:
+                self._downsample(connection, key, timestamp)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return stored
+
+    def _append(self, connection, key, resolution, timestamp, values, throttle):
+        rows = self._read_tail(connection, key, resolution)
+        if rows:
+            last_timestamp, last_values, since_keyframe = rows
+            if timestamp <= last_timestamp:
+                return False
+            if throttle and timestamp - last_timestamp < self.min_interval:
+                return False
+        if not rows or since_keyframe + 1 >= self.keyframe_interval:
+            keyframe, data = 1, _encode(values)
+        else:
+            keyframe = 0
+            data = _encode(value - last for value, last in zip(values, last_values))
+        connection.execute(
+            'INSERT INTO points (key, resolution, timestamp, keyframe, data) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (key, resolution, timestamp, keyframe, data)
+        )
+        return True
+
+    def _read_tail(self, connection, key, resolution):
+        """Return the timestamp and values of the last point of a series,
+        with the number of points stored since its last keyframe, or None if
+        the series is empty"""
+        rows = connection.execute(
+            'SELECT timestamp, keyframe, data FROM points '
+            'WHERE key = ? AND resolution = ? AND timestamp >= ('
+            '  SELECT MAX(timestamp) FROM points '
+            '  WHERE key = ? AND resolution = ? AND keyframe = 1'
+            ') ORDER BY timestamp',
+            (key, resolution, key, resolution)
+        ).fetchall()
+        if not rows:
+            return None
+        points = list(self._decode_rows(rows))
+        return points[-1][0], points[-1][1], len(points) - 1
+
+    @staticmethod
+    def _decode_rows(rows):
+        """Yield (timestamp, values) pairs from rows starting with a keyframe"""
+        values = None
+        for timestamp, keyframe, data in rows:
+            decoded = _decode(data)
+            if keyframe:
+                values = decoded
+            else:
+                values = [value + delta for value, delta in zip(values, decoded)]
+            yield timestamp, values
+
+    def _downsample(self, connection, key, now):
+        """Replace the raw points of a series older than raw_retention by the
+        last point of each downsample_interval"""
+        cutoff = now - self.raw_retention
+        cutoff -= cutoff % self.downsample_interval
+        oldest = connection.execute(
+            'SELECT MIN(timestamp) FROM points WHERE key = ? AND resolution = ?',
+            (key, RAW)
+        ).fetchone()[0]
+        if oldest is None or oldest >= cutoff:
+            return
+
+        rows = connection.execute(
+            'SELECT timestamp, keyframe, data FROM points '
+            'WHERE key = ? AND resolution = ? ORDER BY timestamp',
+            (key, RAW)
+        ).fetchall()
+        buckets = {}
+        first_kept = None
+        for timestamp, values in self._decode_rows(rows):
+            if timestamp >= cutoff:
+                first_kept = timestamp, values
+                break
+            buckets[timestamp - timestamp % self.downsample_interval] = timestamp, values
+
+        for timestamp, values in sorted(buckets.values()):
+            self._append(connection, key, self.downsample_interval, timestamp, values, False)
+        connection.execute(
+            'DELETE FROM points WHERE key = ? AND resolution = ? AND timestamp < ?',
+            (key, RAW, cutoff)
+        )
+        if first_kept is not None:
+            connection.execute(
+                'UPDATE points SET keyframe = 1, data = ? '
+                'WHERE key = ? AND resolution = ? AND timestamp = ?',
+                (_encode(first_kept[1]), key, RAW, first_kept[0])
+            )
+
+    def get_range(self, key, start=None, end=None):
+        """Return the points of a series within the given time range.
+
+        Args:
+            key (str): identifier of the series
+            start (int): earliest timestamp to include, if any
+            end (int): latest timestamp to include, if any
+
+        Return:
+            a list of (timestamp, dict of METRICS) tuples, oldest first;
+            downsampled points precede the raw ones
+        """
+        start = -2 ** 63 if start is None else start
+        end = 2 ** 63 - 1 if end is None else end
+        connection = self._connect()
+        points = []
+        for resolution in (self.downsample_interval, RAW):
+            rows = connection.execute(
+                'SELECT timestamp, keyframe, data FROM points '
+                'WHERE key = ? AND resolution = ? AND timestamp <= ? AND timestamp >= ('
+                '  SELECT COALESCE(MAX(timestamp), ?) FROM points '
+                '  WHERE key = ? AND resolution = ? AND keyframe = 1 AND timestamp <= ?'
+                ') ORDER BY timestamp',
+                (key, resolution, end, start, key, resolution, start)
+            )
+            points.extend(
+                (timestamp, dict(zip(METRICS, values)))
+                for timestamp, values in self._decode_rows(rows)
+                if timestamp >= start
+            )
+        return points
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """Return the shared HistoryStore, creating it on first use.
+
+    Return:
+        a HistoryStore, or None if no history_path is configured
+    """
+    global _store
+    if not config['history_path']:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore(
+                config['history_path'],
+                min_interval=int(config['history_min_interval']),
+                keyframe_interval=int(config['history_keyframe_interval']),
+                raw_retention=int(config['history_raw_retention']),
+                downsample_interval=int(config['history_downsample_interval']),
+            )
+        return _store
+
+
+def get_series_key(github_username, bitbucket_username):
+    return json.dumps([github_username, bitbucket_username])
+
+
+def record_profiles(github_username, bitbucket_username, profiles, timestamp=None):
+    """Add a point to the history of the given accounts, if history is kept.
+    Failing to do so is logged rather than raised, since the profiles remain
+    servable.
+
+    Args:
+        github_username (str): name of the GitHub account
+        bitbucket_username (str): name of the BitBucket account
+        profiles (dict): profile data by provider name (see build_profiles)
+        timestamp (float): time at which the profiles were retrieved
+    """
+    store = get_history_store()
+    if store is None or not any(profiles.values()):
+        return
+    try:
+        store.record(
+            get_series_key(github_username, bitbucket_username),
+            merge_profiles(profiles['github'], profiles['bitbucket']),
+            timestamp,
+        )
+    except sqlite3.Error:
+        logger.exception(
+            'Failed to record the history of %s', (github_username, bitbucket_username)
+        )
+
+
+def get_history(github_username, bitbucket_username, start=None, end=None):
+    """Return the recorded points of the given accounts' metrics, without
+    contacting any provider (see HistoryStore.get_range).
+
+    Points are only recorded when the accounts' profiles are built: when a
+    request misses the profile cache, or when the pre-warmer refreshes them
+    ahead of expiry (at most once per profile_cache_ttl, and only while they
+    remain popular). Nothing snapshots profiles periodically, so accounts
+    nobody requests have gaps in their history, and no point is closer than
+    history_min_interval to the previous one.
+    """
+    store = get_history_store()
+    if store is None:
+        return []
+    return store.get_range(
+        get_series_key(github_username, bitbucket_username),
+        start,
+        end,
+    )
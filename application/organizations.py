@@ -0,0 +1,184 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from application import aggregation
+from application.helpers import merge_profiles, summarize_organization
+from application.profiles import admission_controller, estimate_cost, profile_costs
+from cache import make_cache
+from clients.budget import RequestBudget
+from clients.exceptions import BudgetExhaustedError, UnknownProfileError
+from config import config
+
+
+organization_cache = make_cache('organizations', int(config['profile_cache_ttl']))
+organization_index = make_cache('organization_index', int(config['profile_cache_ttl']))
+
+
+def get_organization_profile(github_organization, bitbucket_team):
+    """Return the aggregate profile of a GitHub organization and BitBucket
+    team, serving it from the organization cache when possible.
+
+    Args:
+        github_organization (str): name of the GitHub organization
+        bitbucket_team (str): name of the BitBucket team
+
+    Return:
+        a tuple of:
+            - the aggregate profile (see build_organization_profile)
+            - the timestamp at which it was built
+
+    Raise:
+        RateLimitError: if either provider's rate limit has been hit
+        InvalidCredentialsError: if GitHub rejects the configured token
+        OverloadedError: if too many profiles are already being built
+    """
+    key = (github_organization, bitbucket_team)
+    entry = organization_cache.get(key)
+    if entry is None:
+        with admission_controller.admit(estimate_cost(key)):
+            entry = organization_cache.get(key)
+            if entry is None:
+                entry = {
+                    'fetched_at': time.time(),
+                    'profile': build_organization_profile(*key),
+                }
+                organization_cache.set(key, entry)
+                _index_organization(key, entry['profile'])
+                profile_costs.set(
+                    key,
+                    sum(entry['profile']['totals']['repositories'].values())
+                )
+    return entry['profile'], entry['fetched_at']
+
+
+def _index_organization(key, profile):
+    """Remember that the given organization cache key counts the repositories
+    of its organization, team and members, so that it may be found by the
+    owner of any of them. Names are indexed regardless of provider, as
+    members are merged across providers by name."""
+    names = {name.lower() for name in list(key) + list(profile['members']) if name}
+    for name in names:
+        keys = organization_index.get(name, [])
+        if key not in keys:
+            organization_index.set(name, keys + [key])
+
+
+def invalidate_cached_organizations(username):
+    """Evict every cached organization profile counting the repositories of
+    an account, whether the organization itself or one of its members.
+
+    Args:
+        username (str): name of the account, on either provider
+
+    Return:
+        the number of cache entries evicted
+    """
+    keys = organization_index.get(username.lower(), [])
+    evicted = 0
+    for key in keys:
+        if key in organization_cache:
+            evicted += 1
+        organization_cache.delete(key)
+    if keys:
+        organization_index.delete(username.lower())
+    return evicted
+
+
+def build_organization_profile(github_organization, bitbucket_team):
+    """Crawl a GitHub organization and a BitBucket team concurrently, under a
+    shared budget of organization_request_budget requests.
+
+    Return:
+        a dict containing:
+            - totals: the merged profile data of the organization, counting
+              each repository once
+            - members: a dict of each member's merged profile data, by name
+              (members with the same name on both providers are merged)
+            - complete: whether the budget covered every member and
+              repository
+    """
+    budget = RequestBudget(int(config['organization_request_budget']))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        github_future = executor.submit(_crawl_github, github_organization, budget)
+        bitbucket_future = executor.submit(_crawl_bitbucket, bitbucket_team, budget)
+        github_crawl = github_future.result()
+        bitbucket_crawl = bitbucket_future.result()
+
+    github_totals, github_members = summarize_organization(github_crawl)
+    bitbucket_totals, bitbucket_members = summarize_organization(bitbucket_crawl)
+    return {
+        'totals': merge_profiles(github_totals, bitbucket_totals),
+        'members': merge_members(github_members, bitbucket_members),
+        'complete': all(
+            crawl is None or crawl['complete']
+            for crawl in (github_crawl, bitbucket_crawl)
+        ),
+    }
+
+
+def _get_unfinished_crawl():
+    """Return the crawl of an organization whose members and repositories the
+    budget did not even cover listing"""
+    return {'members': {}, 'repositories': {}, 'complete': False}
+
+
+def _crawl_github(organization_name, budget):
+    """Crawl a GitHub organization, returning None if it does not exist"""
+    from clients import GithubClient
+
+    github_client = GithubClient(config['github_token'])
+    try:
+        return github_client.get_organization(
+            organization_name,
+            budget,
+            max_workers=int(config['organization_fanout_workers']),
+        )
+    except UnknownProfileError:
+        return None
+    except BudgetExhaustedError:
+        return _get_unfinished_crawl()
+
+
+def _crawl_bitbucket(team_name, budget):
+    """Crawl a BitBucket team, returning None if it does not exist"""
+    from clients import BitBucketClient
+
+    bitbucket_client = BitBucketClient()
+    try:
+        return bitbucket_client.get_team(
+            team_name,
+            budget,
+            max_workers=int(config['organization_fanout_workers']),
+        )
+    except UnknownProfileError:
+        return None
+    except BudgetExhaustedError:
+        return _get_unfinished_crawl()
+
+
+def merge_members(*providers):
+    """Merge each member's profile data across providers, as merge_profiles
+    would, in vectorized passes when numpy is installed.
+
+    Args:
+        providers: dicts of each member's profile data, by name, one per
+            provider
+
+    Return:
+        a dict of each member's merged profile data, by name
+    """
+    if aggregation.numpy is None:
+        return {
+            name: merge_profiles(*(members.get(name) for members in providers))
+            for name in set().union(*providers)
+        }
+    profiles = []
+    names = []
+    for members in providers:
+        for name, profile in members.items():
+            profiles.append(profile)
+            names.append(name)
+    merged = aggregation.ProfileTable(profiles, groups=names).group_by('group')
+    for profile in merged.values():
+        del profile['profiles']
+    return merged
@@ -0,0 +1,134 @@
+import heapq
+import logging
+import math
+import threading
+import time
+
+from clients.exceptions import ApiResponseError, RateLimitError
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCounter:
+    """Tracks how often each key is requested. Counts decay exponentially, so
+    that recent traffic outweighs old traffic."""
+
+    def __init__(self, half_life, max_keys):
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def _decay(self, score, elapsed):
+        return score * math.pow(0.5, max(elapsed, 0) / self.half_life)
+
+    def record(self, key):
+        """Count one request for the given key"""
+        with self._lock:
+            now = time.time()
+            score, updated_at = self._scores.get(key, (0.0, now))
+            self._scores[key] = (self._decay(score, now - updated_at) + 1, now)
+            if len(self._scores) > self.max_keys:
+                self._prune(now)
+
+    def _prune(self, now):
+        """Forget the coldest keys, keeping 90% of max_keys"""
+        excess = len(self._scores) - int(self.max_keys * 0.9)
+        coldest = heapq.nsmallest(
+            excess,
+            self._scores,
+            key=lambda key: self._decay(*self._score_at(key, now)),
+        )
+        for key in coldest:
+            del self._scores[key]
+
+    def _score_at(self, key, now):
+        score, updated_at = self._scores[key]
+        return score, now - updated_at
+
+    def most_common(self, n):
+        """Return up to n keys, hottest first"""
+        with self._lock:
+            now = time.time()
+            return heapq.nlargest(
+                n,
+                self._scores,
+                key=lambda key: self._decay(*self._score_at(key, now)),
+            )
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class ProfileRefresher(threading.Thread):
+    """Periodically rebuilds the most requested profiles before their cached
+    data expires, spending no more than a share of the upstream rate budget.
+
+    Args:
+        cache (cache.TTLCache): the cache holding built profiles
+        counter (RequestCounter): request frequencies of the cached keys
+        build (callable): rebuilds the profile for a cache key
+        interval (int): number of seconds between refresh rounds
+        lead_time (int): refresh entries expiring within this many seconds
+        rate_budget (int): upstream requests allowed per hour
+        budget_share (float): portion of the rate budget to spend refreshing
+        profile_cost (int): estimated upstream requests per profile build
+    """
+
+    def __init__(self, cache, counter, build, interval, lead_time,
+                 rate_budget, budget_share, profile_cost):
+        super().__init__(name='profile-refresher', daemon=True)
+        self.cache = cache
+        self.counter = counter
+        self.build = build
+        self.interval = interval
+        self.lead_time = lead_time
+        self.rate_budget = rate_budget
+        self.budget_share = budget_share
+        self.profile_cost = profile_cost
+        self._stopped = threading.Event()
+
+    @property
+    def refreshes_per_round(self):
+        """The number of profiles that may be rebuilt in a single round"""
+        requests_per_round = (
+            self.rate_budget * self.budget_share * self.interval / 3600
+        )
+        return int(requests_per_round // self.profile_cost)
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.refresh()
+
+    def stop(self):
+        self._stopped.set()
+
+    def refresh(self):
+        """Rebuild the hottest profiles nearing expiry.
+
+        Return:
+            the list of refreshed keys
+        """
+        budget = self.refreshes_per_round
+        refreshed = []
+        if budget <= 0:
+            return refreshed
+
+        deadline = time.time() + self.lead_time
+        for key in self.counter.most_common(len(self.counter)):
+            if len(refreshed) >= budget:
+                break
+            entry = self.cache.get_entry(key)
+            if entry is not None and entry[1] > deadline:
+                continue
+
+            try:
+                self.cache.set(key, self.build(*key))
+            except RateLimitError:
+                logger.warning('Rate limit hit while pre-warming %s', key)
+                break
+            except ApiResponseError:
+                logger.exception('Failed to pre-warm %s', key)
+            refreshed.append(key)
+        return refreshed
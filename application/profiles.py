@@ -0,0 +1,312 @@
+import time
+from concurrent.futures import Future
+
+from application.admission import AdmissionController
+from application.history import record_profiles
+from application.prewarm import ProfileRefresher, RequestCounter
+from application.workers import get_crawl_pool
+from cache import make_cache, pack_record, unpack_record
+from clients.exceptions import UnknownProfileError
+from config import config
+
+
+profile_cache = make_cache('profiles', int(config['profile_cache_ttl']))
+unknown_accounts = make_cache('unknown_accounts', int(config['negative_cache_ttl']))
+bitbucket_account_kinds = make_cache(
+    'bitbucket_account_kinds',
+    int(config['account_kind_ttl'])
+)
+profile_costs = make_cache('profile_costs', int(config['profile_cost_ttl']))
+profile_index = make_cache('profile_index', int(config['profile_cache_ttl']))
+admission_controller = AdmissionController(
+    max_concurrent=int(config['admission_max_concurrent']),
+    max_queued=int(config['admission_max_queued']),
+    queue_timeout=float(config['admission_queue_timeout']),
+)
+request_counter = RequestCounter(
+    half_life=int(config['prewarm_half_life']),
+    max_keys=int(config['prewarm_max_tracked']),
+)
+
+
+def get_profiles(github_username, bitbucket_username, is_team=None):
+    """Return the GitHub and BitBucket profiles of the given accounts, serving
+    them from the profile cache when possible.
+
+    Args:
+        github_username (str): name of the GitHub account
+        bitbucket_username (str): name of the BitBucket account
+        is_team (bool): indicates whether the BitBucket account is a team, or
+            None if unknown
+
+    Return:
+        a tuple of:
+            - a dict mapping each provider name to its profile data (or None,
+              if the account does not exist)
+            - the timestamp at which that data was retrieved
+
+    Raise:
+        RateLimitError: if either provider's rate limit has been hit
+        InvalidCredentialsError: if GitHub rejects the configured token
+        OverloadedError: if too many profiles are already being built
+    """
+    key = (github_username, bitbucket_username, is_team)
+    request_counter.record(key)
+    entry = profile_cache.get(key)
+    if entry is None:
+        with admission_controller.admit(estimate_cost(key)):
+            entry = profile_cache.get(key)
+            if entry is None:
+                entry = _build_cache_entry(*key)
+                profile_cache.set(key, entry)
+                profile_costs.set(key, count_repositories(entry['profiles']))
+    profiles = {
+        provider: unpack_record(profile)
+        for provider, profile in entry['profiles'].items()
+    }
+    return profiles, entry['fetched_at']
+
+
+def estimate_cost(key):
+    """Estimate the cost of building the profiles of the given cache key, as
+    the number of repositories they held when last built"""
+    return profile_costs.get(key, int(config['admission_default_cost']))
+
+
+def count_repositories(profiles):
+    """Return the total number of repositories in the given profiles"""
+    count = 0
+    for profile in profiles.values():
+        repositories = (unpack_record(profile) or {}).get('repositories', 0)
+        if isinstance(repositories, dict):
+            count += sum(repositories.values())
+        else:
+            count += repositories
+    return count
+
+
+def get_max_age(fetched_at):
+    """Return the number of seconds for which profiles retrieved at the given
+    timestamp remain fresh"""
+    return max(0, int(fetched_at + profile_cache.ttl - time.time()))
+
+
+def _build_cache_entry(github_username, bitbucket_username, is_team=None):
+    """Build the profile cache entry of the given accounts, storing each
+    profile as a CompactRecord where it fits one. Each build also adds a
+    point to the accounts' history."""
+    profiles = build_profiles(github_username, bitbucket_username, is_team)
+    fetched_at = time.time()
+    record_profiles(github_username, bitbucket_username, profiles, fetched_at)
+    _index_profiles((github_username, bitbucket_username, is_team))
+    return {
+        'fetched_at': fetched_at,
+        'profiles': {
+            provider: pack_record(profile)
+            for provider, profile in profiles.items()
+        },
+    }
+
+
+def _get_index_key(provider, username):
+    return provider, username.lower()
+
+
+def _index_profiles(key):
+    """Remember that the given profile cache key holds the profiles of its
+    GitHub and BitBucket accounts, so that they may be found by account"""
+    github_username, bitbucket_username, _ = key
+    for index_key in (
+        _get_index_key('github', github_username),
+        _get_index_key('bitbucket', bitbucket_username),
+    ):
+        keys = profile_index.get(index_key, [])
+        if key not in keys:
+            profile_index.set(index_key, keys + [key])
+
+
+def update_cached_profiles(provider, username, update):
+    """Modify the cached profile data of an account in place, leaving the
+    expiry of the cache entries holding it unchanged.
+
+    Args:
+        provider (str): "github" or "bitbucket"
+        username (str): name of the account
+        update (callable): modifies the profile data dict it is given
+
+    Return:
+        the number of cache entries updated
+    """
+    updated = 0
+    for key in profile_index.get(_get_index_key(provider, username), []):
+        entry = profile_cache.get_entry(key)
+        if entry is None:
+            continue
+        value, expires_at = entry
+        profile = unpack_record(value['profiles'][provider])
+        if profile is None:
+            continue
+        update(profile)
+        profiles = dict(value['profiles'])
+        profiles[provider] = pack_record(profile)
+        profile_cache.set(
+            key,
+            dict(value, profiles=profiles),
+            ttl=expires_at - time.time()
+        )
+        updated += 1
+    return updated
+
+
+def invalidate_cached_profiles(provider, username):
+    """Evict every cache entry holding the profile data of an account.
+
+    Args:
+        provider (str): "github" or "bitbucket"
+        username (str): name of the account
+
+    Return:
+        the number of cache entries evicted
+    """
+    index_key = _get_index_key(provider, username)
+    keys = profile_index.get(index_key, [])
+    evicted = 0
+    for key in keys:
+        if key in profile_cache:
+            evicted += 1
+        profile_cache.delete(key)
+    if keys:
+        profile_index.delete(index_key)
+    return evicted
+
+
+def build_profiles(github_username, bitbucket_username, is_team=None):
+    """Retrieve fresh GitHub and BitBucket profiles, bypassing the profile
+    cache. Accounts recently found not to exist are not looked up again.
+
+    Args:
+        github_username (str): name of the GitHub account
+        bitbucket_username (str): name of the BitBucket account
+        is_team (bool): indicates whether the BitBucket account is a team; if
+            None, the account kind that last resolved is used, or else a team
+            and then a user are sought
+
+    Return:
+        a dict mapping each provider name to its profile data (or None, if
+        the account does not exist)
+    """
+    pool = get_crawl_pool()
+    run = _run_inline if pool is None else pool.submit
+
+    github_future = None
+    if ('github', github_username) not in unknown_accounts:
+        github_future = run(_fetch_github_profile, github_username)
+        if pool is None:
+            # raise any GitHub error before crawling BitBucket for nothing
+            github_future.result()
+
+    bitbucket_future = None
+    bitbucket_kinds = _get_bitbucket_kinds(bitbucket_username, is_team)
+    if bitbucket_kinds:
+        bitbucket_future = run(
+            _fetch_bitbucket_profile,
+            bitbucket_username,
+            bitbucket_kinds
+        )
+
+    github_profile = None
+    if github_future is not None:
+        github_profile = github_future.result()
+        if github_profile is None:
+            unknown_accounts.set(('github', github_username), True)
+
+    bitbucket_profile = None
+    if bitbucket_future is not None:
+        bitbucket_profile, resolved_kind = bitbucket_future.result()
+        for kind in bitbucket_kinds:
+            if kind == resolved_kind:
+                bitbucket_account_kinds.set(bitbucket_username, kind)
+                break
+            unknown_accounts.set(('bitbucket', bitbucket_username, kind), True)
+
+    return {'github': github_profile, 'bitbucket': bitbucket_profile}
+
+
+def _get_bitbucket_kinds(username, is_team):
+    """Return the account kinds (True for a team, False for a user) worth
+    seeking for the given BitBucket name, in order"""
+    if is_team is None:
+        remembered_kind = bitbucket_account_kinds.get(username)
+        kinds = (True, False) if remembered_kind is None else (remembered_kind,)
+    else:
+        kinds = (is_team,)
+    return tuple(
+        kind for kind in kinds
+        if ('bitbucket', username, kind) not in unknown_accounts
+    )
+
+
+def _run_inline(func, *args):
+    """Call the function on the current thread, wrapping its outcome in a
+    future so that it may be handled like a pooled call"""
+    future = Future()
+    try:
+        future.set_result(func(*args))
+    except Exception as error:
+        future.set_exception(error)
+    return future
+
+
+def _fetch_github_profile(username):
+    """Crawl a GitHub profile, returning None if the account does not exist.
+    Defined at module level so that it may run in the crawl process pool."""
+    from clients import GithubClient
+
+    github_client = GithubClient(config['github_token'])
+    try:
+        return github_client.get_profile(username)
+    except UnknownProfileError:
+        return None
+
+
+def _fetch_bitbucket_profile(username, kinds):
+    """Crawl the first BitBucket account of the given kinds that exists.
+    Defined at module level so that it may run in the crawl process pool.
+
+    Return:
+        a tuple of the profile data and the kind of the account found, or
+        (None, None) if none exists
+    """
+    from clients import BitBucketClient
+
+    bitbucket_client = BitBucketClient()
+    for is_team in kinds:
+        try:
+            return bitbucket_client.get_profile(username, is_team=is_team), is_team
+        except UnknownProfileError:
+            continue
+    return None, None
+
+
+def start_refresher(processes=1):
+    """Start pre-warming the most requested profiles in the background.
+
+    Args:
+        processes (int): number of processes pre-warming at once, between
+            which the prewarm_rate_budget is divided
+
+    Return:
+        the running application.prewarm.ProfileRefresher
+    """
+    refresher = ProfileRefresher(
+        cache=profile_cache,
+        counter=request_counter,
+        build=_build_cache_entry,
+        interval=int(config['prewarm_interval']),
+        lead_time=int(config['prewarm_lead_time']),
+        rate_budget=int(config['prewarm_rate_budget']) // processes,
+        budget_share=float(config['prewarm_budget_share']),
+        profile_cost=int(config['prewarm_profile_cost']),
+    )
+    refresher.start()
+    return refresher
@@ -0,0 +1,89 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def _format_frame(frame):
+    return '{}.{}'.format(frame.f_globals.get('__name__', '?'), frame.f_code.co_name)
+
+
+def _fold(frame):
+    """Return the stack ending in the given frame, outermost call first, as
+    the semicolon-separated frames that flame graph tools expect"""
+    frames = []
+    while frame is not None:
+        frames.append(_format_frame(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+class SamplingProfiler(threading.Thread):
+    """Periodically samples the stacks of running threads, so that where time
+    is spent can be seen without instrumenting any code.
+
+    Args:
+        interval (float): number of seconds between samples
+        thread_ids (iterable): identifiers of the threads to sample; every
+            thread but the profiler's by default
+        ignored_ids (iterable): identifiers of threads not to sample
+    """
+
+    def __init__(self, interval=0.005, thread_ids=None, ignored_ids=()):
+        super().__init__(name='sampling-profiler', daemon=True)
+        self.interval = interval
+        self.thread_ids = None if thread_ids is None else set(thread_ids)
+        self.ignored_ids = set(ignored_ids)
+        self.samples = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        ignored = self.ignored_ids | {threading.get_ident()}
+        while not self._stopped.wait(self.interval):
+            self.sample(ignored)
+
+    def sample(self, ignored=()):
+        """Count the current stack of each sampled thread"""
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in ignored:
+                continue
+            if self.thread_ids is not None and thread_id not in self.thread_ids:
+                continue
+            self.samples[_fold(frame)] += 1
+
+    def stop(self):
+        """Stop sampling, and return the samples in folded format"""
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+        return self.format()
+
+    def format(self):
+        """Return one "<stack> <count>" line per distinct stack, as read by
+        flamegraph.pl and speedscope"""
+        return ''.join(
+            '{} {}\n'.format(stack, count)
+            for stack, count in sorted(self.samples.items())
+        )
+
+
+_profile_lock = threading.Lock()
+
+
+def profile_process(seconds, interval=0.005):
+    """Sample every thread of the process but the calling one for the given
+    duration.
+
+    Return:
+        the samples in folded format, or None if another such profile is
+        already running
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(interval, ignored_ids=[threading.get_ident()])
+        profiler.start()
+        time.sleep(seconds)
+        return profiler.stop()
+    finally:
+        _profile_lock.release()
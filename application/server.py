@@ -0,0 +1,184 @@
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestHandler(WSGIRequestHandler):
+    # Close connections after each response, so that idle keep-alive clients
+    # cannot hold on to the worker's threads
+    protocol_version = 'HTTP/1.0'
+
+
+class ThreadPoolWSGIServer(BaseWSGIServer):
+    """A WSGI server handling requests on a fixed number of threads, serving
+    an already bound socket.
+
+    Args:
+        host (str): address the socket is bound to
+        port (int): port the socket is bound to
+        app (callable): the WSGI application
+        threads (int): number of requests handled at once
+        fd (int): file descriptor of the listening socket
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads, fd):
+        super().__init__(host, port, app, handler=RequestHandler, fd=fd)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class PreforkServer:
+    """Serves a WSGI application from a number of worker processes, forked
+    from a master process that imported the application beforehand, so that
+    workers share its memory pages. Workers that die are replaced.
+
+    On SIGTERM or SIGINT, workers stop accepting connections and finish their
+    in-flight requests; any still running after graceful_timeout seconds are
+    killed.
+
+    Args:
+        app (callable): the WSGI application
+        host (str): address to listen on
+        port (int): port to listen on
+        workers (int): number of worker processes
+        threads (int): number of requests each worker handles at once
+        graceful_timeout (float): number of seconds workers may take to drain
+        backlog (int): number of pending connections the socket may hold
+        post_fork (list): callables run in each worker after it is forked,
+            given the index of the worker; a replaced worker keeps the index
+            of the one it replaces
+        worker_exit (list): callables run in each worker once it is drained
+    """
+
+    def __init__(self, app, host, port, workers, threads, graceful_timeout,
+                 backlog=128, post_fork=(), worker_exit=()):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.backlog = backlog
+        self.post_fork = list(post_fork)
+        self.worker_exit = list(worker_exit)
+        self.socket = None
+        self.pids = {}
+        self._stopping = False
+
+    def bind(self):
+        """Open the listening socket shared by all workers"""
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(self.backlog)
+        self.socket.set_inheritable(True)
+        return self.socket.getsockname()
+
+    def run(self):
+        """Fork the workers and supervise them until they have all exited"""
+        if self.socket is None:
+            self.bind()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGALRM, self._kill)
+        logger.info('Listening on %s:%s', *self.socket.getsockname()[:2])
+        for index in range(self.workers):
+            self._spawn(index)
+
+        while self.pids:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index = self.pids.pop(pid, None)
+            if not self._stopping and index is not None:
+                logger.warning('Worker %s exited with status %s', pid, status)
+                self._spawn(index)
+        signal.alarm(0)
+        self.socket.close()
+
+    def _spawn(self, index):
+        pid = os.fork()
+        if pid:
+            self.pids[pid] = index
+            return pid
+
+        status = 1
+        try:
+            self._run_worker(index)
+            status = 0
+        except BaseException:
+            logger.exception('Worker %s crashed', os.getpid())
+        finally:
+            os._exit(status)
+
+    def _run_worker(self, index):
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGALRM):
+            signal.signal(signum, signal.SIG_DFL)
+        random.seed()
+        for hook in self.post_fork:
+            hook(index)
+
+        host, port = self.socket.getsockname()[:2]
+        server = ThreadPoolWSGIServer(
+            host,
+            port,
+            self.app,
+            self.threads,
+            self.socket.fileno()
+        )
+        self.socket.close()
+
+        def drain(signum, frame):
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, drain)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        server.serve_forever()
+        server.server_close()
+        server.executor.shutdown(wait=True)
+        for hook in self.worker_exit:
+            hook()
+
+    def _stop(self, signum, frame):
+        """Ask every worker to drain, killing them after graceful_timeout"""
+        if self._stopping:
+            return
+        self._stopping = True
+        logger.info('Stopping %s workers', len(self.pids))
+        for pid in self.pids:
+            self._signal(pid, signal.SIGTERM)
+        signal.alarm(max(1, int(self.graceful_timeout)))
+
+    def _kill(self, signum, frame):
+        for pid in self.pids:
+            logger.warning('Killing worker %s after graceful timeout', pid)
+            self._signal(pid, signal.SIGKILL)
+
+    @staticmethod
+    def _signal(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
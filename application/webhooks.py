@@ -0,0 +1,132 @@
+import hashlib
+import hmac
+
+from application.organizations import invalidate_cached_organizations
+from application.profiles import invalidate_cached_profiles, update_cached_profiles
+from cache import make_cache
+from clients.cache import repository_cache
+from config import config
+
+
+# Ids of the GitHub deliveries already handled, since a redelivered star
+# event would otherwise be counted twice
+handled_deliveries = make_cache(
+    'webhook_deliveries',
+    int(config['webhook_delivery_ttl'])
+)
+
+
+def verify_signature(secret, body, signature):
+    """Return whether the signature header of a webhook delivery matches the
+    HMAC-SHA256 of its body.
+
+    Args:
+        secret (str): the secret shared with the provider
+        body (bytes): the raw request body
+        signature (str): the header value, as "sha256=<hex digest>"
+    """
+    if not secret or not signature or not signature.startswith('sha256='):
+        return False
+    digest = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(digest, signature[len('sha256='):])
+
+
+def _adjust(fields, delta):
+    def update(profile):
+        for field in fields:
+            if field in profile:
+                profile[field] += delta
+    return update
+
+
+def handle_github_event(event, payload, delivery_id=None):
+    """Bring the cached data affected by a GitHub webhook event up to date.
+
+    Stars are counted in place; any other change to a repository evicts its
+    metrics, and its owner's profiles and the organization profiles counting
+    them, to be crawled again when requested.
+    Deliveries already handled are skipped.
+
+    Args:
+        event (str): the X-GitHub-Event header
+        payload (dict): the event payload
+        delivery_id (str): the X-GitHub-Delivery header, if any
+
+    Return:
+        a dict of the number of "updated" and "invalidated" cache entries
+    """
+    result = {'updated': 0, 'invalidated': 0}
+    repository = payload.get('repository')
+    if not repository:
+        return result
+    # claimed in a single step, so that concurrent redeliveries cannot both
+    # get through, and released if handling fails, so that a later one may
+    if delivery_id and not handled_deliveries.add(delivery_id, True):
+        return result
+    try:
+        return _handle_github_event(event, payload, repository)
+    except BaseException:
+        if delivery_id:
+            handled_deliveries.delete(delivery_id)
+        raise
+
+
+def _handle_github_event(event, payload, repository):
+    result = {'updated': 0, 'invalidated': 0}
+    owner = repository['owner']['login']
+
+    if event == 'star':
+        delta = 1 if payload.get('action') == 'created' else -1
+        result['updated'] += update_cached_profiles(
+            'github', owner, _adjust(('stars', 'watchers'), delta)
+        )
+        result['updated'] += update_cached_profiles(
+            'github', payload['sender']['login'], _adjust(('starred',), delta)
+        )
+        return result
+
+    if event not in ('push', 'repository', 'fork'):
+        return result
+    repository_cache.invalidate('github', (repository['full_name'], owner))
+    repository_cache.invalidate('github_contributors', repository['full_name'])
+    owners = [owner]
+    if event == 'fork':
+        owners.append(payload['forkee']['owner']['login'])
+    for username in owners:
+        result['invalidated'] += invalidate_cached_profiles('github', username)
+        result['invalidated'] += invalidate_cached_organizations(username)
+    return result
+
+
+def _get_bitbucket_username(account):
+    return account.get('username') or account.get('nickname')
+
+
+def handle_bitbucket_event(event, payload):
+    """Bring the cached data affected by a BitBucket webhook event up to date,
+    evicting the metrics of its repository, and its owner's profiles and the
+    organization profiles counting them.
+
+    Args:
+        event (str): the X-Event-Key header, eg. "repo:push"
+        payload (dict): the event payload
+
+    Return:
+        a dict of the number of "updated" and "invalidated" cache entries
+    """
+    result = {'updated': 0, 'invalidated': 0}
+    repository = payload.get('repository')
+    if not repository or not event.startswith('repo:'):
+        return result
+
+    repository_cache.invalidate('bitbucket', repository.get('uuid'))
+    repository_cache.invalidate('bitbucket_shared', repository.get('uuid'))
+    owners = [repository.get('owner', {})]
+    if event == 'repo:fork':
+        owners.append(payload.get('fork', {}).get('owner', {}))
+    for owner in owners:
+        username = _get_bitbucket_username(owner)
+        if username:
+            result['invalidated'] += invalidate_cached_profiles('bitbucket', username)
+            result['invalidated'] += invalidate_cached_organizations(username)
+    return result
@@ -0,0 +1,38 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from config import config
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_crawl_pool():
+    """Return the shared process pool that runs provider crawls, creating it on
+    first use in each process (a pool inherited through fork is unusable).
+
+    Return:
+        a concurrent.futures.ProcessPoolExecutor, or None if crawls are
+        configured to run on the request thread
+    """
+    global _pool, _pool_pid
+    processes = int(config['crawl_processes'])
+    if processes <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=processes)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def shutdown_crawl_pool(wait=True):
+    """Stop the shared process pool, if it has been started"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=wait)
+            _pool = None
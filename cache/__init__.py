@@ -0,0 +1,6 @@
+from cache.factory import make_cache, start_checkpointer  # noqa
+from cache.layered import LayeredCache, RedisStore, SQLiteStore  # noqa
+from cache.records import CompactRecord, pack_record, unpack_record  # noqa
+from cache.repositories import RepositoryCache  # noqa
+from cache.snapshot import Checkpointer, Snapshot  # noqa
+from cache.ttl import TTLCache  # noqa
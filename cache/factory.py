@@ -0,0 +1,78 @@
+import atexit
+import os
+
+from cache.layered import LayeredCache, RedisStore, SQLiteStore
+from cache.snapshot import Checkpointer
+from cache.ttl import TTLCache
+from config import config
+
+
+_stores = {}
+in_process_caches = {}
+
+
+def get_store():
+    """Return the store shared between processes, as configured by
+    cache_backend, or None if caches are kept in-process only"""
+    backend = config['cache_backend']
+    if backend == 'memory':
+        return None
+    if backend not in _stores:
+        if backend == 'sqlite':
+            _stores[backend] = SQLiteStore(
+                config['cache_path'],
+                poll_interval=float(config['cache_poll_interval'])
+            )
+        elif backend == 'redis':
+            _stores[backend] = RedisStore(config['cache_redis_url'])
+        else:
+            raise ValueError('Unknown cache backend: {}'.format(backend))
+    return _stores[backend]
+
+
+def make_cache(namespace, ttl):
+    """Create a cache for the given kind of data.
+
+    Args:
+        namespace (str): name distinguishing the cache's keys from others'
+        ttl (int): default number of seconds before entries expire
+
+    Return:
+        a TTLCache, or a LayeredCache if a shared store is configured
+    """
+    store = get_store()
+    if store is None:
+        cache = TTLCache(ttl)
+        in_process_caches[namespace] = cache
+        return cache
+    return LayeredCache(namespace, store, ttl, l1_size=int(config['cache_l1_size']))
+
+
+def start_checkpointer(worker_index=None):
+    """Restore in-process caches from their last snapshots, and checkpoint
+    them every cache_snapshot_interval seconds and at exit. Caches backed by
+    a shared store already outlive the process, so are left alone.
+
+    Args:
+        worker_index (int): index of the server worker running the caches,
+            whose snapshots are then kept in a directory of their own so
+            that workers do not overwrite each other's
+
+    Return:
+        the running cache.snapshot.Checkpointer, or None if no
+        cache_snapshot_dir is configured
+    """
+    if not config['cache_snapshot_dir']:
+        return None
+    directory = config['cache_snapshot_dir']
+    if worker_index is not None:
+        directory = os.path.join(directory, 'worker-{}'.format(worker_index))
+    checkpointer = Checkpointer(
+        in_process_caches,
+        directory,
+        interval=int(config['cache_snapshot_interval']),
+    )
+    checkpointer.restore()
+    checkpointer.start()
+    atexit.register(checkpointer.stop)
+    return checkpointer
@@ -0,0 +1,332 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from cache.ttl import TTLCache
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+
+def _encode_key(namespace, key):
+    return '{}:{}'.format(namespace, json.dumps(key))
+
+
+def _prepare_private_file(path):
+    """Create the file at the given path, in a directory created if need be,
+    such that only the current user may write either. Entries are unpickled,
+    so whoever can write the database (or its -wal journal, created next to
+    it) can run code in every process that reads it.
+
+    Raise:
+        PermissionError: if the file or its directory belongs to another user,
+            or may be written by others
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    descriptor = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+    try:
+        file_status = os.fstat(descriptor)
+    finally:
+        os.close(descriptor)
+    for name, status in ((directory, os.stat(directory)), (path, file_status)):
+        if status.st_uid != os.getuid() or status.st_mode & 0o022:
+            raise PermissionError(
+                '{} must belong to the current user, and only be writable by '
+                'them'.format(name)
+            )
+
+
+class SQLiteStore:
+    """A cache store shared by every process on the host through a SQLite
+    file. Writes are logged in an invalidations table that other processes
+    poll to evict their stale copies.
+
+    Args:
+        path (str): location of the database file, which (like its directory)
+            must only be writable by the current user; "~" is expanded
+        poll_interval (float): minimum number of seconds between polls for
+            invalidations
+    """
+
+    def __init__(self, path, poll_interval=1):
+        self.path = os.path.expanduser(path)
+        _prepare_private_file(self.path)
+        self.poll_interval = poll_interval
+        self.listeners = []
+        self._local = threading.local()
+        self._last_poll = 0
+        self._poll_lock = threading.Lock()
+        self._writes = 0
+        connection = self._connect()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, value BLOB, expires_at REAL)'
+        )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS invalidations ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, pid INTEGER, '
+            'created_at REAL)'
+        )
+        row = connection.execute('SELECT MAX(id) FROM invalidations').fetchone()
+        self._last_seen = row[0] or 0
+
+    def _connect(self):
+        """Return a connection owned by the current thread and process"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        """Return a (value, expires_at) tuple, or None if missing or expired"""
+        row = self._connect().execute(
+            'SELECT value, expires_at FROM entries WHERE key = ? AND expires_at > ?',
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        connection = self._connect()
+        connection.execute(
+            'INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, pickle.dumps(value), expires_at)
+        )
+        self._publish(connection, key)
+
+    def add(self, key, value, expires_at):
+        """Store the value unless the key holds a live one, atomically across
+        processes, returning whether it was stored"""
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'DELETE FROM entries WHERE key = ? AND expires_at <= ?',
+                (key, time.time())
+            )
+            added = connection.execute(
+                'INSERT OR IGNORE INTO entries (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, pickle.dumps(value), expires_at)
+            ).rowcount == 1
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        if added:
+            self._publish(connection, key)
+        return added
+
+    def delete(self, key):
+        connection = self._connect()
+        connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+        self._publish(connection, key)
+
+    def clear(self, prefix):
+        connection = self._connect()
+        connection.execute(
+            "DELETE FROM entries WHERE substr(key, 1, ?) = ?",
+            (len(prefix), prefix)
+        )
+        self._publish(connection, prefix + '*')
+
+    def _publish(self, connection, key):
+        now = time.time()
+        connection.execute(
+            'INSERT INTO invalidations (key, pid, created_at) VALUES (?, ?, ?)',
+            (key, os.getpid(), now)
+        )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            connection.execute('DELETE FROM entries WHERE expires_at <= ?', (now,))
+            connection.execute(
+                'DELETE FROM invalidations WHERE created_at <= ?',
+                (now - 3600,)
+            )
+
+    def sync(self):
+        """Pass the keys written by other processes since the last poll on to
+        the listeners, polling at most once every poll_interval seconds"""
+        now = time.time()
+        with self._poll_lock:
+            if now - self._last_poll < self.poll_interval:
+                return
+            self._last_poll = now
+            rows = self._connect().execute(
+                'SELECT id, key, pid FROM invalidations WHERE id > ? ORDER BY id',
+                (self._last_seen,)
+            ).fetchall()
+            if rows:
+                self._last_seen = rows[-1][0]
+        for _, key, pid in rows:
+            if pid != os.getpid():
+                for listener in self.listeners:
+                    listener(key)
+
+
+class RedisStore:
+    """A cache store shared through a Redis-compatible server, which
+    broadcasts invalidations over pub/sub.
+
+    Args:
+        url (str): address of the server, eg. redis://localhost:6379/0
+        channel (str): name of the pub/sub channel carrying invalidations
+    """
+
+    def __init__(self, url, channel='repoziptories:invalidations'):
+        if redis is None:
+            raise ImportError('The redis package is required to use RedisStore')
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self.listeners = []
+        self._invalidated = deque()
+        self._listener = None
+        self._listener_pid = None
+
+    def _listen(self):
+        """Subscribe to invalidations once per process"""
+        if self._listener_pid == os.getpid():
+            return
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.channel: self._on_message})
+        self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+        self._listener_pid = os.getpid()
+
+    def _on_message(self, message):
+        pid, key = message['data'].decode('utf-8').split(':', 1)
+        if int(pid) != os.getpid():
+            self._invalidated.append(key)
+
+    def get(self, key):
+        self._listen()
+        payload = self.client.get(key)
+        return None if payload is None else pickle.loads(payload)
+
+    def set(self, key, value, expires_at):
+        ttl_ms = int((expires_at - time.time()) * 1000)
+        if ttl_ms > 0:
+            self.client.set(key, pickle.dumps((value, expires_at)), px=ttl_ms)
+        self._publish(key)
+
+    def add(self, key, value, expires_at):
+        """Store the value unless the key holds a live one, atomically across
+        processes, returning whether it was stored"""
+        ttl_ms = int((expires_at - time.time()) * 1000)
+        if ttl_ms <= 0:
+            return False
+        added = bool(self.client.set(
+            key,
+            pickle.dumps((value, expires_at)),
+            px=ttl_ms,
+            nx=True
+        ))
+        if added:
+            self._publish(key)
+        return added
+
+    def delete(self, key):
+        self.client.delete(key)
+        self._publish(key)
+
+    def clear(self, prefix):
+        keys = list(self.client.scan_iter(match=prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+        self._publish(prefix + '*')
+
+    def _publish(self, key):
+        self.client.publish(self.channel, '{}:{}'.format(os.getpid(), key))
+
+    def sync(self):
+        """Pass the keys written by other processes since the last call on to
+        the listeners"""
+        self._listen()
+        while self._invalidated:
+            key = self._invalidated.popleft()
+            for listener in self.listeners:
+                listener(key)
+
+
+class LayeredCache:
+    """Fronts a store shared between processes (L2) with a small in-process
+    LRU (L1). Writes go through to the store, and entries written by other
+    processes are evicted from the L1 as their invalidations arrive.
+
+    Offers the same interface as TTLCache.
+
+    Args:
+        namespace (str): prefix isolating this cache's keys in the store
+        store (SQLiteStore or RedisStore): the shared store
+        ttl (int): default number of seconds before entries expire
+        l1_size (int): maximum number of entries kept in-process
+    """
+
+    def __init__(self, namespace, store, ttl, l1_size=1024):
+        self.namespace = namespace
+        self.store = store
+        self.ttl = ttl
+        self.l1 = TTLCache(ttl, max_size=l1_size)
+        store.listeners.append(self._evict)
+
+    def _evict(self, encoded_key):
+        """Drop the L1 copy of an entry that another process overwrote"""
+        if encoded_key == self.namespace + ':*':
+            self.l1.clear()
+        elif encoded_key.startswith(self.namespace + ':'):
+            self.l1.delete(encoded_key)
+
+    def get(self, key, default=None):
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def get_entry(self, key):
+        self.store.sync()
+        encoded_key = _encode_key(self.namespace, key)
+        entry = self.l1.get_entry(encoded_key)
+        if entry is None:
+            entry = self.store.get(encoded_key)
+            if entry is not None:
+                self.l1.set_entry(encoded_key, *entry)
+        return entry
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        encoded_key = _encode_key(self.namespace, key)
+        self.store.set(encoded_key, value, expires_at)
+        self.l1.set_entry(encoded_key, value, expires_at)
+
+    def add(self, key, value, ttl=None):
+        """Store the value unless the key holds a live one in the store, as a
+        single step across processes.
+
+        Return:
+            whether the value was stored
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        encoded_key = _encode_key(self.namespace, key)
+        added = self.store.add(encoded_key, value, expires_at)
+        if added:
+            self.l1.set_entry(encoded_key, value, expires_at)
+        return added
+
+    def delete(self, key):
+        encoded_key = _encode_key(self.namespace, key)
+        self.store.delete(encoded_key)
+        self.l1.delete(encoded_key)
+
+    def clear(self):
+        self.store.clear(self.namespace + ':')
+        self.l1.clear()
+
+    def __contains__(self, key):
+        return self.get_entry(key) is not None
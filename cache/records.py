@@ -0,0 +1,132 @@
+import threading
+from array import array
+
+
+INT, MAPPING, LABELS = range(3)
+INT_RANGE = range(-2 ** 63, 2 ** 63)
+
+# Beyond this many distinct layouts, dicts are likely keyed by data rather
+# than by field names, and are kept as they are
+MAX_LAYOUTS = 256
+
+
+class Vocabulary:
+    """Assigns consecutive integer ids to labels, so that each label is kept
+    once however many records use it. Thread-safe."""
+
+    def __init__(self):
+        self.labels = []
+        self.ids = {}
+        self._lock = threading.Lock()
+
+    def get_id(self, label):
+        label_id = self.ids.get(label)
+        if label_id is None:
+            with self._lock:
+                label_id = self.ids.get(label)
+                if label_id is None:
+                    label_id = len(self.labels)
+                    self.labels.append(label)
+                    self.ids[label] = label_id
+        return label_id
+
+    def __len__(self):
+        return len(self.labels)
+
+
+layouts = Vocabulary()
+labels = Vocabulary()
+
+
+class CompactRecord:
+    """Holds a flat dict of counts, count mappings (eg. repositories) and
+    label lists (eg. languages) in a single array of integers. Its keys are
+    kept in a shared layout, and its labels in a shared vocabulary.
+
+    Records are pickled as plain dicts, since layout and label ids are only
+    meaningful to the process that assigned them.
+    """
+
+    __slots__ = ('_layout', '_values')
+
+    def __init__(self, layout, values):
+        self._layout = layout
+        self._values = values
+
+    @classmethod
+    def from_dict(cls, data):
+        """Pack the given dict, or return None if it does not fit"""
+        layout = []
+        values = array('q')
+        for key, value in data.items():
+            if type(value) is int and value in INT_RANGE:
+                layout.append((key, INT))
+                values.append(value)
+            elif isinstance(value, dict) and _is_mapping(value):
+                layout.append((key, MAPPING))
+                values.append(len(value))
+                for label, count in value.items():
+                    values.append(labels.get_id(label))
+                    values.append(count)
+            elif isinstance(value, list) and all(type(item) is str for item in value):
+                layout.append((key, LABELS))
+                values.append(len(value))
+                values.extend(labels.get_id(item) for item in value)
+            else:
+                return None
+
+        layout = tuple(layout)
+        if layout not in layouts.ids and len(layouts) >= MAX_LAYOUTS:
+            return None
+        return cls(layouts.get_id(layout), values.tobytes())
+
+    def to_dict(self):
+        values = array('q')
+        values.frombytes(self._values)
+        values = iter(values)
+        data = {}
+        for key, kind in layouts.labels[self._layout]:
+            if kind == INT:
+                data[key] = next(values)
+            elif kind == MAPPING:
+                data[key] = {
+                    labels.labels[next(values)]: next(values)
+                    for _ in range(next(values))
+                }
+            else:
+                data[key] = [labels.labels[next(values)] for _ in range(next(values))]
+        return data
+
+    def __reduce__(self):
+        return pack_record, (self.to_dict(),)
+
+    def __eq__(self, other):
+        if isinstance(other, CompactRecord):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __repr__(self):
+        return 'CompactRecord({!r})'.format(self.to_dict())
+
+
+def _is_mapping(value):
+    return all(
+        type(label) is str and type(count) is int and count in INT_RANGE
+        for label, count in value.items()
+    )
+
+
+def pack_record(value):
+    """Return a CompactRecord of the given dict when it fits one, or else the
+    value itself"""
+    if not isinstance(value, dict):
+        return value
+    record = CompactRecord.from_dict(value)
+    return value if record is None else record
+
+
+def unpack_record(value):
+    """Return the dict held by a CompactRecord, or else the value itself"""
+    if isinstance(value, CompactRecord):
+        return value.to_dict()
+    return value
@@ -0,0 +1,62 @@
+from cache.records import pack_record, unpack_record
+
+
+class RepositoryCache:
+    """Shares per-repository metrics between profile builds. An entry is only
+    reused while the repository's version (eg. its last update timestamp)
+    matches the one it was computed for. Metrics keyed by field names may be
+    stored as CompactRecords; those keyed by data (eg. commits by author) are
+    not, since each of their key sets would take up a layout of its own.
+
+    Args:
+        entries (TTLCache or LayeredCache): where to store the metrics, which
+            expire with its ttl regardless of their version
+    """
+
+    def __init__(self, entries):
+        self._entries = entries
+
+    def get(self, provider, repo_id, version):
+        """Return the metrics stored for the given repository version, or None"""
+        entry = self._entries.get((provider, repo_id))
+        if entry is None or entry['version'] != version:
+            return None
+        return unpack_record(entry['metrics'])
+
+    def set(self, provider, repo_id, version, metrics, compact=False):
+        """Store the metrics of the given repository version, as a
+        CompactRecord if compact and they fit one"""
+        self._entries.set((provider, repo_id), {
+            'version': version,
+            'metrics': pack_record(metrics) if compact else metrics,
+        })
+
+    def invalidate(self, provider, repo_id):
+        self._entries.delete((provider, repo_id))
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_or_compute(self, provider, repo_id, version, compute, compact=False):
+        """Return the stored metrics of the given repository version, calling
+        compute() to derive and store them when missing or outdated.
+
+        Args:
+            provider (str): name of the service hosting the repository
+            repo_id: identifier of the repository within the provider, or
+                None to bypass the cache
+            version: value that changes whenever the repository does
+            compute (callable): returns the repository's metrics
+            compact (bool): whether the metrics are a dict keyed by field
+                names, to be stored as a CompactRecord
+
+        Return:
+            the metrics
+        """
+        if repo_id is None:
+            return compute()
+        metrics = self.get(provider, repo_id, version)
+        if metrics is None:
+            metrics = compute()
+            self.set(provider, repo_id, version, metrics, compact)
+        return metrics
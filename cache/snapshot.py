@@ -0,0 +1,161 @@
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'RZSNAP1\n'
+HEADER = struct.Struct('>Q')
+
+
+def write_snapshot(path, entries, raw_entries=()):
+    """Atomically write cache entries to a snapshot file. The file holds an
+    index of keys, followed by each value, pickled and compressed, so that
+    readers may load values individually.
+
+    Args:
+        path (str): location of the snapshot
+        entries (iterable): (key, value, expires_at) tuples to encode
+        raw_entries (iterable): (key, encoded value, expires_at) tuples, as
+            read from a previous snapshot
+
+    Return:
+        the number of entries written
+    """
+    index = {}
+    blobs = []
+    offset = 0
+    now = time.time()
+
+    def add(key, blob, expires_at):
+        nonlocal offset
+        if expires_at <= now or key in index:
+            return
+        index[key] = (offset, len(blob), expires_at)
+        blobs.append(blob)
+        offset += len(blob)
+
+    for key, value, expires_at in entries:
+        add(key, zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)), expires_at)
+    for key, blob, expires_at in raw_entries:
+        add(key, blob, expires_at)
+
+    encoded_index = pickle.dumps(index, pickle.HIGHEST_PROTOCOL)
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'wb') as snapshot_file:
+        snapshot_file.write(MAGIC)
+        snapshot_file.write(HEADER.pack(len(encoded_index)))
+        snapshot_file.write(encoded_index)
+        for blob in blobs:
+            snapshot_file.write(blob)
+    os.replace(temporary_path, path)
+    return len(index)
+
+
+class Snapshot:
+    """Memory-maps a snapshot file, reading only its index up front and
+    decoding each value the first time it is taken.
+
+    Args:
+        path (str): location of the snapshot
+
+    Raise:
+        ValueError: if the file is not a snapshot
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as snapshot_file:
+            self._map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError('Not a cache snapshot: {}'.format(path))
+        index_start = len(MAGIC) + HEADER.size
+        (index_length,) = HEADER.unpack(self._map[len(MAGIC):index_start])
+        self._index = pickle.loads(self._map[index_start:index_start + index_length])
+        self._data_start = index_start + index_length
+        self._lock = threading.Lock()
+
+    def _read(self, offset, length):
+        start = self._data_start + offset
+        return self._map[start:start + length]
+
+    def pop(self, key):
+        """Remove the key from the snapshot, returning its (value, expires_at)
+        or None if it is missing or expired"""
+        with self._lock:
+            location = self._index.pop(key, None)
+        if location is None or location[2] <= time.time():
+            return None
+        offset, length, expires_at = location
+        return pickle.loads(zlib.decompress(self._read(offset, length))), expires_at
+
+    def discard(self, key):
+        with self._lock:
+            self._index.pop(key, None)
+
+    def raw_entries(self):
+        """Return the (key, encoded value, expires_at) tuples not yet taken"""
+        with self._lock:
+            locations = list(self._index.items())
+        return [
+            (key, self._read(offset, length), expires_at)
+            for key, (offset, length, expires_at) in locations
+        ]
+
+    def __len__(self):
+        return len(self._index)
+
+
+class Checkpointer(threading.Thread):
+    """Periodically writes caches to snapshot files, so that a restarted
+    process may start with their contents.
+
+    Args:
+        caches (dict): TTLCache instances, by name
+        directory (str): where to keep the snapshot files
+        interval (int): number of seconds between checkpoints
+    """
+
+    def __init__(self, caches, directory, interval):
+        super().__init__(name='cache-checkpointer', daemon=True)
+        self.caches = caches
+        self.directory = directory
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def _get_path(self, name):
+        return os.path.join(self.directory, '{}.snapshot'.format(name))
+
+    def restore(self):
+        """Attach each cache's last snapshot, if any, for lazy loading"""
+        for name, cache in self.caches.items():
+            path = self._get_path(name)
+            if not os.path.isfile(path):
+                continue
+            try:
+                cache.attach_snapshot(Snapshot(path))
+            except (OSError, ValueError, pickle.UnpicklingError):
+                logger.exception('Ignoring unreadable cache snapshot %s', path)
+
+    def checkpoint(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for name, cache in self.caches.items():
+            entries, raw_entries = cache.get_snapshot_entries()
+            write_snapshot(self._get_path(name), entries, raw_entries)
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.checkpoint()
+            except OSError:
+                logger.exception('Failed to checkpoint caches')
+
+    def stop(self):
+        """Stop checkpointing periodically, writing a final checkpoint"""
+        self._stopped.set()
+        self.checkpoint()
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """A thread-safe, in-process store whose entries expire after a number of
+    seconds. If given a max_size, the least recently used entries are evicted
+    to stay within it."""
+
+    def __init__(self, ttl, max_size=None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the live value stored under key, or the default"""
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def get_entry(self, key):
+        """Return a (value, expires_at) tuple for the given key, or None if it
+        is missing or expired"""
+        with self._lock:
+            return self._get_live_entry(key)
+
+    def _get_live_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None and self._snapshot is not None:
+            entry = self._snapshot.pop(key)
+            if entry is not None:
+                self._store(key, entry)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, value, ttl=None):
+        """Store the value, expiring it after ttl seconds (defaulting to the
+        cache's own ttl)"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self.set_entry(key, value, expires_at)
+
+    def add(self, key, value, ttl=None):
+        """Store the value unless the key already holds a live one, as a
+        single step.
+
+        Return:
+            whether the value was stored
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if self._get_live_entry(key) is not None:
+                return False
+            self._store(key, (value, expires_at))
+            return True
+
+    def set_entry(self, key, value, expires_at):
+        """Store the value, expiring it at the given timestamp"""
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot.discard(key)
+            self._store(key, (value, expires_at))
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if self.max_size is not None:
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot.discard(key)
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = None
+            self._entries.clear()
+
+    def attach_snapshot(self, snapshot):
+        """Fall back on the given cache.snapshot.Snapshot for missing keys,
+        loading its entries as they are requested"""
+        with self._lock:
+            self._snapshot = snapshot
+
+    def get_snapshot_entries(self):
+        """Return the entries to checkpoint, as a tuple of:
+            - (key, value, expires_at) tuples of the loaded entries
+            - (key, encoded value, expires_at) tuples of the snapshot entries
+              not loaded yet
+        """
+        with self._lock:
+            entries = [
+                (key, value, expires_at)
+                for key, (value, expires_at) in self._entries.items()
+            ]
+            snapshot = self._snapshot
+        raw_entries = snapshot.raw_entries() if snapshot is not None else []
+        return entries, raw_entries
+
+    def __contains__(self, key):
+        return self.get_entry(key) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -1,2 +1,29 @@
-from clients.bitbucket import BitBucketClient  # noqa
-from clients.github import GithubClient  # noqa
+import importlib
+import sys
+import types
+
+
+# The provider clients pull in PyGithub and requests, so they are only
+# imported once first accessed
+_lazy_attributes = {
+    'BitBucketClient': 'clients.bitbucket',
+    'GithubClient': 'clients.github',
+}
+
+
+class _LazyModule(types.ModuleType):
+    def __getattr__(self, name):
+        module_name = _lazy_attributes.get(name)
+        if module_name is None:
+            raise AttributeError(
+                "module '{}' has no attribute '{}'".format(self.__name__, name)
+            )
+        value = getattr(importlib.import_module(module_name), name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(_lazy_attributes))
+
+
+sys.modules[__name__].__class__ = _LazyModule
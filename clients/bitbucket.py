@@ -1,37 +1,196 @@
+import math
+import os
+import threading
+from distutils.util import strtobool
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
 import requests
 
+from clients.budget import fan_out
+from clients.cache import repository_cache
 from clients.exceptions import ApiResponseError, RateLimitError, UnknownProfileError
+from clients.limiter import make_limiter
+from clients.retry import (
+    HedgingPolicy,
+    RetryBudget,
+    RetryPolicy,
+    parse_retry_after,
+)
 from config import config
 
 
+def classify_error(error):
+    """Tell whether a failed BitBucket request may be retried.
+
+    Return:
+        a tuple of whether the error is transient and the number of seconds
+        BitBucket asked to wait (or None)
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True, None
+    if isinstance(error, ApiResponseError):
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is not None:
+            return True, retry_after
+        status = error.args[0] if error.args else None
+        if isinstance(status, int) and status >= 500:
+            return True, None
+    return False, None
+
+
+def _read_error_body(response):
+    """Return the parsed JSON body of an error response, or its text when
+    it is not JSON (eg. a proxy's HTML error page)"""
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the requests session whose connection pool is shared by the
+    current process, creating one after each fork."""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            _session = requests.Session()
+            _session_pid = os.getpid()
+        return _session
+
+
+retry_policy = RetryPolicy(
+    classify_error,
+    max_attempts=int(config['retry_max_attempts']),
+    base_delay=float(config['retry_base_delay']),
+    max_delay=float(config['retry_max_delay']),
+    budget=RetryBudget(float(config['retry_budget_ratio'])),
+)
+hedging_policy = HedgingPolicy(percentile=float(config['hedge_percentile']))
+limiter = make_limiter(
+    'bitbucket',
+    lambda error: isinstance(error, RateLimitError),
+)
+
+
 class BitBucketClient:
     """Provides a basic interface for retrieving relevant data from BitBucket"""
 
     def __init__(self):
         self.base_url = config['bitbucket_base_url']
+        self.page_window = int(config['bitbucket_page_window'])
+        self.retry_policy = retry_policy
+        self.repository_cache = repository_cache
+        self.limiter = limiter
+        self.hedging_policy = (
+            hedging_policy if strtobool(str(config['hedge_requests'])) else None
+        )
+        # The clients.budget.RequestBudget charged for each request, if any
+        self.budget = None
 
-    @staticmethod
-    def _get_resource(url):
-        response = requests.get(url)
+    def _get_resource(self, url):
+        if self.hedging_policy is None:
+            return self.retry_policy.call(
+                self.limiter.call,
+                self._request_resource,
+                url
+            )
+        return self.retry_policy.call(
+            self.hedging_policy.call,
+            self.limiter.call,
+            self._request_resource,
+            url
+        )
+
+    def _request_resource(self, url):
+        if self.budget is not None:
+            self.budget.charge()
+        response = get_session().get(url)
         if 200 <= response.status_code <= 299:
             return response.json()
         elif response.status_code == 429:
-            raise RateLimitError('Exceeded BitBucket rate limit')
+            error = RateLimitError('Exceeded BitBucket rate limit')
         else:
-            raise ApiResponseError(response.status_code, response.json())
+            error = ApiResponseError(response.status_code, _read_error_body(response))
+        error.retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        raise error
 
     def _get_response_size(self, url):
         response = self._get_resource(url)
         return response.get('size')
 
     def _get_response_values(self, url):
-        next_page = url
-        while next_page:
-            response = self._get_resource(next_page)
-            next_page = response.get('next')
-            for value in response['values']:
+        first_page = self._get_resource(url)
+        for value in first_page['values']:
+            yield value
+
+        page_urls = self._get_remaining_page_urls(first_page)
+        if page_urls is None:
+            pages = self._walk_pages(first_page.get('next'))
+        else:
+            pages = self._prefetch_pages(page_urls)
+        for page in pages:
+            for value in page['values']:
                 yield value
 
+    @staticmethod
+    def _get_remaining_page_urls(page):
+        """Work out the URLs of the pages following the given one.
+
+        Args:
+            page (dict): a parsed, paginated response
+
+        Return:
+            a list of URLs, or None if the collection's size is not reported
+        """
+        if not page.get('next'):
+            return []
+        if 'size' not in page or 'pagelen' not in page:
+            return None
+
+        page_count = int(math.ceil(page['size'] / page['pagelen']))
+        scheme, netloc, path, query, fragment = urlsplit(page['next'])
+        parameters = [(key, value) for key, value in parse_qsl(query) if key != 'page']
+        return [
+            urlunsplit((
+                scheme,
+                netloc,
+                path,
+                urlencode(parameters + [('page', number)]),
+                fragment,
+            ))
+            for number in range(page.get('page', 1) + 1, page_count + 1)
+        ]
+
+    def _walk_pages(self, url):
+        """Follow next links one page at a time"""
+        while url:
+            page = self._get_resource(url)
+            url = page.get('next')
+            yield page
+
+    def _prefetch_pages(self, urls):
+        """Fetch the given pages concurrently, keeping at most page_window
+        requests in flight, and yield them in order"""
+        with ThreadPoolExecutor(max_workers=self.page_window) as executor:
+            urls = iter(urls)
+            in_flight = deque(
+                executor.submit(self._get_resource, url)
+                for _, url in zip(range(self.page_window), urls)
+            )
+            while in_flight:
+                page = in_flight.popleft().result()
+                url = next(urls, None)
+                if url is not None:
+                    in_flight.append(executor.submit(self._get_resource, url))
+                yield page
+
     def get_profile(self, profile_name, is_team=True):
         """Retrieve all relevant data from the named profile.
 
@@ -44,18 +203,20 @@ class BitBucketClient:
         Return:
             a dict of retrieved API data
         """
-        response = requests.get(
-            '{}/{}/{}'.format(
-                self.base_url,
-                'teams' if is_team else 'users',
-                profile_name
+        try:
+            user = self._get_resource(
+                '{}/{}/{}'.format(
+                    self.base_url,
+                    'teams' if is_team else 'users',
+                    profile_name
+                )
             )
-        )
-        if response.status_code == 404:
-            raise UnknownProfileError(
-                'No such BitBucket account: {}'.format(profile_name)
-            )
-        user = response.json()
+        except ApiResponseError as error:
+            if error.args and error.args[0] == 404:
+                raise UnknownProfileError(
+                    'No such BitBucket account: {}'.format(profile_name)
+                )
+            raise
 
         profile_data = {}
         profile_data.update(self._get_user_data(user))
@@ -104,19 +265,16 @@ class BitBucketClient:
         for repo in self._get_response_values(repo_endpoint):
             repositories += 1
 
-            watcher_endpoint = repo['links']['watchers']['href']
-            watchers += self._get_response_size(watcher_endpoint)
-
-            commits_endpoint = '{}/repositories/{}/{}/commits'.format(
-                self.base_url,
-                user['username'],
-                repo['slug'],
+            metrics = self.repository_cache.get_or_compute(
+                'bitbucket',
+                repo.get('uuid'),
+                repo.get('updated_on'),
+                lambda: self._get_repository_metrics(user, repo),
+                compact=True,
             )
-            commits += len(list(self._get_response_values(commits_endpoint)))
-
-            if repo['has_issues']:
-                issues_endpoint = repo['links']['issues']['href']
-                issues += self._get_response_size(issues_endpoint)
+            watchers += metrics['watchers']
+            commits += metrics['commits']
+            issues += metrics['issues']
 
             if repo['language']:
                 languages.add(repo['language'])
@@ -126,5 +284,193 @@ class BitBucketClient:
             'watchers': watchers,
             'commits': commits,
             'issues': issues,
-            'languages': list(languages),
+            'languages': sorted(languages),
+        }
+
+    def _get_repository_metrics(self, user, repo):
+        """Retrieve the metrics of a single repository that cost requests.
+
+        Args:
+            user (dict): a parsed response from the /user API
+            repo (dict): a parsed repository from the /repositories API
+
+        Return:
+            a dict containing:
+                - the number of watchers
+                - the number of commits
+                - the number of issues
+        """
+        watcher_endpoint = repo['links']['watchers']['href']
+        commits_endpoint = '{}/repositories/{}/{}/commits'.format(
+            self.base_url,
+            user['username'],
+            repo['slug'],
+        )
+        metrics = {
+            'watchers': self._get_response_size(watcher_endpoint),
+            'commits': len(list(self._get_response_values(commits_endpoint))),
+            'issues': 0,
+        }
+        if repo['has_issues']:
+            issues_endpoint = repo['links']['issues']['href']
+            metrics['issues'] = self._get_response_size(issues_endpoint)
+        return metrics
+
+    def get_team(self, team_name, budget, max_workers=8):
+        """Retrieve the members of the named team, and the repositories owned
+        by the team or its members. Each repository is crawled once, however
+        many members share it.
+
+        Args:
+            team_name (str): name of the BitBucket team
+            budget (clients.budget.RequestBudget): limit on the number of
+                requests to make, possibly shared with other crawls; charged
+                for each request sent
+            max_workers (int): number of members or repositories crawled at
+                once
+
+        Return:
+            a dict containing:
+                - members: a dict of each member's user data, by username
+                - repositories: a dict of each repository's data (see
+                  _get_shared_repository_data), by full name
+                - complete: whether the budget covered every member and
+                  repository
+
+        Raise:
+            BudgetExhaustedError: if the budget is spent before the team's
+                members and repositories are listed
+        """
+        self.budget = budget
+        try:
+            return self._get_team(team_name, budget, max_workers)
+        finally:
+            self.budget = None
+
+    def _get_team(self, team_name, budget, max_workers):
+        try:
+            team = self._get_resource('{}/teams/{}'.format(self.base_url, team_name))
+        except ApiResponseError as error:
+            if error.args and error.args[0] == 404:
+                raise UnknownProfileError(
+                    'No such BitBucket team: {}'.format(team_name)
+                )
+            raise
+
+        members = {
+            member['username']: member
+            for member in self._get_response_values(
+                '{}/teams/{}/members'.format(self.base_url, team_name)
+            )
+        }
+        repos = {
+            repo['full_name']: repo
+            for repo in self._get_response_values(team['links']['repositories']['href'])
+        }
+
+        member_data = fan_out(
+            self._get_member_data,
+            members,
+            budget=budget,
+            max_workers=max_workers,
+        )
+        for user_data, member_repos in member_data.values():
+            for repo in member_repos:
+                repos.setdefault(repo['full_name'], repo)
+
+        repository_data = fan_out(
+            lambda repo: self._get_shared_repository_data(repo, members),
+            repos,
+            budget=budget,
+            max_workers=max_workers,
+        )
+        return {
+            'members': {
+                username: user_data
+                for username, (user_data, _) in member_data.items()
+            },
+            'repositories': repository_data,
+            'complete': (
+                len(member_data) == len(members)
+                and len(repository_data) == len(repos)
+            ),
+        }
+
+    def _get_member_data(self, member):
+        """Return a tuple of the member's user data and owned repositories"""
+        user = self._get_resource(
+            '{}/users/{}'.format(self.base_url, member['username'])
+        )
+        repos = list(self._get_response_values(user['links']['repositories']['href']))
+        return self._get_user_data(user), repos
+
+    def _get_shared_repository_data(self, repo, members):
+        """Retrieve data related to a repository shared by a team.
+
+        Args:
+            repo (dict): a parsed repository from the /repositories API
+            members (dict): the team's members, by username
+
+        Return:
+            a dict containing:
+                - the username of the repository's owner
+                - whether the repository is a fork
+                - the number of issues and watchers
+                - a list of languages used
+                - the number of commits of each member, by username
+        """
+        owner = repo['full_name'].split('/', 1)[0]
+        metrics = self.repository_cache.get_or_compute(
+            'bitbucket_shared',
+            repo.get('uuid'),
+            repo.get('updated_on'),
+            lambda: self._get_shared_repository_metrics(owner, repo),
+        )
+        return {
+            'owner': owner,
+            'fork': 'parent' in repo,
+            'issues': metrics['issues'],
+            'watchers': metrics['watchers'],
+            'languages': [repo['language']] if repo['language'] else [],
+            'topics': [],
+            'commits': {
+                username: count
+                for username, count in metrics['authors'].items()
+                if username in members
+            },
+        }
+
+    def _get_shared_repository_metrics(self, owner, repo):
+        """Retrieve the metrics of a shared repository that cost requests,
+        walking its commits once to attribute them to their authors.
+
+        Args:
+            owner (str): username of the repository's owner
+            repo (dict): a parsed repository from the /repositories API
+
+        Return:
+            a dict containing:
+                - the number of watchers
+                - the number of issues
+                - the number of commits of each author with a BitBucket
+                  account, by username
+        """
+        commits_endpoint = '{}/repositories/{}/{}/commits'.format(
+            self.base_url,
+            owner,
+            repo['slug'],
+        )
+        authors = {}
+        for commit in self._get_response_values(commits_endpoint):
+            username = (commit.get('author', {}).get('user') or {}).get('username')
+            if username:
+                authors[username] = authors.get(username, 0) + 1
+
+        metrics = {
+            'watchers': self._get_response_size(repo['links']['watchers']['href']),
+            'issues': 0,
+            'authors': authors,
         }
+        if repo['has_issues']:
+            metrics['issues'] = self._get_response_size(repo['links']['issues']['href'])
+        return metrics
@@ -0,0 +1,72 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from clients.exceptions import BudgetExhaustedError
+
+
+class RequestBudget:
+    """Caps the number of upstream requests that the tasks of a single crawl
+    may make between them. Clients charge it for each request they send,
+    retries and hedged duplicates included.
+
+    Args:
+        limit (int): number of requests allowed
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.spent = 0
+        self.exhausted = False
+        self._lock = threading.Lock()
+
+    def spend(self, cost):
+        """Return whether a task costing the given number of requests may
+        run, reserving them if so"""
+        with self._lock:
+            if self.spent + cost > self.limit:
+                self.exhausted = True
+                return False
+            self.spent += cost
+            return True
+
+    def charge(self):
+        """Reserve a request about to be sent.
+
+        Raise:
+            BudgetExhaustedError: if every request allowed has been spent
+        """
+        if not self.spend(1):
+            raise BudgetExhaustedError(
+                'Spent the budget of {} requests'.format(self.limit)
+            )
+
+
+def fan_out(func, items, budget, max_workers):
+    """Call func on each item concurrently, for as long as the budget allows.
+    Tasks charge the budget for the requests they send; once it is spent,
+    those still running fail and those pending are skipped.
+
+    Args:
+        func (callable): the task, called with an item
+        items (dict): the items to process, by key
+        budget (RequestBudget): the budget to spend
+        max_workers (int): number of tasks run at once
+
+    Return:
+        a dict of each task's result, by key, omitting the items the budget
+        did not cover
+    """
+    def run(item):
+        if budget.exhausted:
+            raise BudgetExhaustedError('Spent the budget of {} requests'.format(budget.limit))
+        return func(item)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {key: executor.submit(run, item) for key, item in items.items()}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except BudgetExhaustedError:
+                continue
+    return results
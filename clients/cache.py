@@ -0,0 +1,7 @@
+from cache import RepositoryCache, make_cache
+from config import config
+
+
+repository_cache = RepositoryCache(
+    make_cache('repositories', int(config['repository_cache_ttl']))
+)
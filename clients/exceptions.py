@@ -16,3 +16,8 @@ class RateLimitError(ApiResponseError):
 class InvalidCredentialsError(ApiResponseError):
     """Raised on failed authentication"""
     pass
+
+
+class BudgetExhaustedError(ApiResponseError):
+    """Raised when a crawl has spent the requests it was allowed"""
+    pass
@@ -1,17 +1,117 @@
 import github
+import requests
 
+from clients.budget import fan_out
+from clients.cache import repository_cache
 from clients.exceptions import (
     InvalidCredentialsError,
     RateLimitError,
     UnknownProfileError,
 )
+from clients.github_commits import CommitCounter
+from clients.limiter import make_limiter
+from clients.retry import RetryBudget, RetryPolicy, parse_retry_after
+from config import config
+
+
+# The methods of PyGithub's requester through which every request is sent,
+# by whichever version of PyGithub is installed; each returns the status,
+# headers and body of the response rather than raising errors
+REQUEST_METHODS = ('requestJson', 'requestMultipart', 'requestBlob')
+
+
+def classify_error(error):
+    """Tell whether a failed GitHub call may be retried.
+
+    Return:
+        a tuple of whether the error is transient and the number of seconds
+        GitHub asked to wait (or None)
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True, None
+    if isinstance(error, github.GithubException):
+        retry_after = parse_retry_after(
+            (getattr(error, 'headers', None) or {}).get('retry-after')
+        )
+        if retry_after is not None:
+            return True, retry_after
+        if isinstance(error.status, int) and error.status >= 500:
+            return True, None
+    return False, None
+
+
+def is_overloaded(error):
+    """Tell whether GitHub refused a call because of its load, through its
+    primary or secondary (abuse detection) rate limits"""
+    if isinstance(error, github.RateLimitExceededException):
+        return True
+    if isinstance(error, github.GithubException):
+        if error.status == 429:
+            return True
+        if error.status == 403:
+            message = str(error.data).lower()
+            return 'abuse' in message or 'secondary rate limit' in message
+    return False
+
+
+def is_refused(response):
+    """Tell whether a response sent through PyGithub's requester (see
+    REQUEST_METHODS) refuses the request because of GitHub's load, like the
+    errors is_overloaded recognizes once PyGithub raises them"""
+    status, headers, body = response
+    if status == 429:
+        return True
+    if status == 403:
+        message = str(body).lower()
+        return (
+            'rate limit' in message
+            or 'abuse' in message
+            or (headers or {}).get('x-ratelimit-remaining') == '0'
+        )
+    return False
+
+
+commit_counter = CommitCounter(config['github_commit_count_mode'])
+retry_policy = RetryPolicy(
+    classify_error,
+    max_attempts=int(config['retry_max_attempts']),
+    base_delay=float(config['retry_base_delay']),
+    max_delay=float(config['retry_max_delay']),
+    budget=RetryBudget(float(config['retry_budget_ratio'])),
+)
+limiter = make_limiter('github', is_overloaded, is_refused)
 
 
 class GithubClient:
-    """Provides a basic interface for retrieving relevant data from GitHub"""
+    """Provides a basic interface for retrieving relevant data from GitHub.
+    Every request it sends, including those of paginated lists and lazily
+    completed objects, goes through the concurrency limiter."""
 
     def __init__(self, *args, **kwargs):
         self.client = github.Github(*args, **kwargs)
+        self.commit_counter = commit_counter
+        self.retry_policy = retry_policy
+        self.repository_cache = repository_cache
+        self.limiter = limiter
+        # The clients.budget.RequestBudget charged for each request, if any
+        self.budget = None
+        self._hook_requester()
+
+    def _hook_requester(self):
+        """Send every request of the client, by whichever object makes it,
+        through the limiter and charge it to the budget"""
+        requester = self.client._Github__requester
+
+        def hook(send):
+            def request(*args, **kwargs):
+                if self.budget is not None:
+                    self.budget.charge()
+                return self.limiter.call(send, *args, **kwargs)
+            return request
+
+        for name in REQUEST_METHODS:
+            if hasattr(requester, name):
+                setattr(requester, name, hook(getattr(requester, name)))
 
     def get_profile(self, profile_name):
         """Retrieve all relevant data from the named profile.
@@ -29,7 +129,10 @@ class GithubClient:
             RateLimitError: if the number of requests exceeds GitHub's rate limit
         """
         try:
-            user = self.client.get_user(profile_name)
+            user = self.retry_policy.call(
+                self.client.get_user,
+                profile_name
+            )
         except github.UnknownObjectException:
             raise UnknownProfileError(
                 'No such GitHub account: {}'.format(profile_name)
@@ -41,7 +144,10 @@ class GithubClient:
 
         profile = {}
         try:
-            profile.update(self._get_user_data(user))
+            profile.update(self.retry_policy.call(
+                self._get_user_data,
+                user
+            ))
             profile.update(self._get_repository_data(user))
         except github.RateLimitExceededException:
             raise RateLimitError('Exceeded GitHub rate limit')
@@ -68,8 +174,7 @@ class GithubClient:
         }
         return user_data
 
-    @staticmethod
-    def _get_repository_data(user):
+    def _get_repository_data(self, user):
         """Retrieve data related to the given user's repositories.
 
         Args:
@@ -92,10 +197,24 @@ class GithubClient:
         watchers = 0
         languages = set()
         topics = set()
-        for repo in user.get_repos():
+        # each request is retried on its own, so that a transient failure
+        # does not list every repository or count their commits again
+        for repo in self.retry_policy.call(list, user.get_repos()):
             if not repo.fork:
                 original_repo_count += 1
-                original_repo_commits += repo.get_commits(author=user).totalCount
+                original_repo_commits += self.repository_cache.get_or_compute(
+                    'github',
+                    (repo.full_name, user.login),
+                    repo.pushed_at,
+                    lambda: {
+                        'commits': self.retry_policy.call(
+                            self.commit_counter.count,
+                            repo,
+                            user
+                        ),
+                    },
+                    compact=True,
+                )['commits']
             else:
                 forked_repo_count += 1
             stars_received += repo.stargazers_count
@@ -115,6 +234,163 @@ class GithubClient:
             'issues': issues,
             'watchers': watchers,
             'commits': original_repo_commits,
-            'languages': list(languages),
-            'topics': list(topics),
+            'languages': sorted(languages),
+            'topics': sorted(topics),
+        }
+
+    def get_organization(self, organization_name, budget, max_workers=8):
+        """Retrieve the members of the named organization, and the
+        repositories owned by the organization or its members. Each
+        repository is crawled once, however many members share it.
+
+        Args:
+            organization_name (str): name of the GitHub organization
+            budget (clients.budget.RequestBudget): limit on the number of
+                requests to make, possibly shared with other crawls; charged
+                for each request sent
+            max_workers (int): number of members or repositories crawled at
+                once
+
+        Return:
+            a dict containing:
+                - members: a dict of each member's user data, by login
+                - repositories: a dict of each repository's data (see
+                  _get_shared_repository_data), by full name
+                - complete: whether the budget covered every member and
+                  repository
+
+        Raise:
+            UnknownProfileError: if there is no such organization
+            RateLimitError: if the number of requests exceeds GitHub's rate limit
+            InvalidCredentialsError: if GitHub rejects the configured token
+            BudgetExhaustedError: if the budget is spent before the
+                organization's members and repositories are listed
+        """
+        self.budget = budget
+        try:
+            return self._get_organization(organization_name, budget, max_workers)
+        except github.UnknownObjectException:
+            raise UnknownProfileError(
+                'No such GitHub organization: {}'.format(organization_name)
+            )
+        except github.RateLimitExceededException:
+            raise RateLimitError('Exceeded GitHub rate limit')
+        except github.BadCredentialsException:
+            raise InvalidCredentialsError('Cannot authenticate with given credentials')
+        finally:
+            self.budget = None
+
+    def _get_organization(self, organization_name, budget, max_workers):
+        organization = self.retry_policy.call(
+            self.client.get_organization,
+            organization_name
+        )
+        members = {
+            member.login: member
+            for member in self.retry_policy.call(list, organization.get_members())
+        }
+        repos = {
+            repo.full_name: repo
+            for repo in self.retry_policy.call(list, organization.get_repos())
+        }
+
+        member_data = fan_out(
+            self._get_member_data,
+            members,
+            budget=budget,
+            max_workers=max_workers,
+        )
+        for user_data, member_repos in member_data.values():
+            for repo in member_repos:
+                repos.setdefault(repo.full_name, repo)
+
+        repository_data = fan_out(
+            lambda repo: self._get_shared_repository_data(repo, members),
+            repos,
+            budget=budget,
+            max_workers=max_workers,
+        )
+        return {
+            'members': {
+                login: user_data
+                for login, (user_data, _) in member_data.items()
+            },
+            'repositories': repository_data,
+            'complete': (
+                len(member_data) == len(members)
+                and len(repository_data) == len(repos)
+            ),
+        }
+
+    def _get_member_data(self, member):
+        """Return a tuple of the member's user data and owned repositories"""
+        user_data = self.retry_policy.call(
+            self._get_user_data,
+            member
+        )
+        repos = self.retry_policy.call(list, member.get_repos())
+        return user_data, repos
+
+    def _get_shared_repository_data(self, repo, members):
+        """Retrieve data related to a repository shared by an organization.
+
+        Args:
+            repo (github.Repository.Repository): an instantiated repository
+            members (dict): the organization's members, by login
+
+        Return:
+            a dict containing:
+                - the login of the repository's owner
+                - whether the repository is a fork
+                - the number of stars, open issues and watchers
+                - a list of languages and topics used
+                - the number of commits of each member, by login
+        """
+        commits = {}
+        if not repo.fork:
+            contributors = self.repository_cache.get_or_compute(
+                'github_contributors',
+                repo.full_name,
+                repo.pushed_at,
+                lambda: self.retry_policy.call(
+                    self._get_contributor_commits,
+                    repo
+                ),
+            )
+            if contributors is None and repo.owner.login in members:
+                contributors = {
+                    repo.owner.login: self.retry_policy.call(
+                        self.commit_counter.count,
+                        repo,
+                        members[repo.owner.login]
+                    ),
+                }
+            commits = {
+                login: count
+                for login, count in (contributors or {}).items()
+                if login in members
+            }
+
+        return {
+            'owner': repo.owner.login,
+            'fork': repo.fork,
+            'stars': repo.stargazers_count,
+            'issues': repo.open_issues_count,
+            'watchers': repo.watchers_count,
+            'languages': [repo.language] if repo.language else [],
+            'topics': list(repo.topics or []),
+            'commits': commits,
+        }
+
+    @staticmethod
+    def _get_contributor_commits(repo):
+        """Return the number of commits of each of the repository's top 100
+        contributors, by login, or None if GitHub is still computing them"""
+        stats = repo.get_stats_contributors()
+        if stats is None:
+            return None
+        return {
+            contributor.author.login: contributor.total
+            for contributor in stats
+            if contributor.author
         }
@@ -0,0 +1,203 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import github
+
+from clients.exceptions import ApiResponseError
+
+
+LAST_PAGE_PATTERN = re.compile(r'[?&]page=(\d+)[^>]*>;\s*rel="last"')
+
+HISTORY_QUERY = """
+query($owner: String!, $name: String!, $author: ID!) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          history(author: {id: $author}) {
+            totalCount
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def count_with_link_header(repo, user):
+    """Request a single commit per page and read the number of pages from the
+    Link header of the response"""
+    try:
+        headers, data = repo._requester.requestJsonAndCheck(
+            'GET',
+            '{}/commits'.format(repo.url),
+            parameters={'author': user.login, 'per_page': 1},
+        )
+    except github.GithubException as error:
+        if error.status == 409:  # the repository is empty
+            return 0
+        raise
+    match = LAST_PAGE_PATTERN.search(headers.get('link', ''))
+    return int(match.group(1)) if match else len(data)
+
+
+def count_with_contributor_stats(repo, user):
+    """Look the user up in the repository's contributor statistics, which
+    GitHub only reports for the top 100 contributors, and which may still be
+    being computed"""
+    stats = repo.get_stats_contributors()
+    if stats is None:
+        return None
+    for contributor in stats:
+        if contributor.author and contributor.author.login == user.login:
+            return contributor.total
+    return 0 if len(stats) < 100 else None
+
+
+def count_with_graphql(repo, user):
+    """Query the commit history of the default branch through the GraphQL API"""
+    owner, name = repo.full_name.split('/', 1)
+    headers, data = repo._requester.requestJsonAndCheck(
+        'POST',
+        '/graphql',
+        input={
+            'query': HISTORY_QUERY,
+            'variables': {'owner': owner, 'name': name, 'author': user.node_id},
+        },
+    )
+    if data.get('errors'):
+        return None
+    branch = data['data']['repository']['defaultBranchRef']
+    if branch is None:
+        return 0
+    return branch['target']['history']['totalCount']
+
+
+def count_with_total_count(repo, user):
+    """Let PyGithub paginate through the user's commits"""
+    return repo.get_commits(author=user).totalCount
+
+
+STRATEGIES = OrderedDict((
+    ('link', count_with_link_header),
+    ('stats', count_with_contributor_stats),
+    ('graphql', count_with_graphql),
+    ('total_count', count_with_total_count),
+))
+
+
+class CommitCounter:
+    """Counts a user's commits to a repository, choosing among several
+    strategies according to how quickly each has answered so far.
+
+    Args:
+        mode (str): the name of one of STRATEGIES, or "auto" to use any of
+            them
+        smoothing (float): weight given to the latest timing when updating a
+            strategy's average cost
+        failure_penalty (float): factor by which the cost of a failed attempt
+            exceeds that of the costliest strategy, so that strategies which
+            fail quickly do not pass for cheap
+    """
+
+    def __init__(self, mode='auto', smoothing=0.2, failure_penalty=2.0):
+        if mode == 'auto':
+            self.strategies = STRATEGIES
+        else:
+            self.strategies = OrderedDict(((mode, STRATEGIES[mode]),))
+        self.smoothing = smoothing
+        self.failure_penalty = failure_penalty
+        self.costs = {}
+        self._preferred = {}
+        self._lock = threading.Lock()
+
+    def _rank(self, repo_name):
+        """Order strategy names by preference: the one that last worked for
+        this repository, then those never benchmarked, then the cheapest"""
+        with self._lock:
+            preferred = self._preferred.get(repo_name)
+            ranked = sorted(
+                self.strategies,
+                key=lambda name: (
+                    name != preferred,
+                    name in self.costs,
+                    self.costs.get(name, 0),
+                )
+            )
+        return ranked
+
+    def _record(self, name, elapsed):
+        with self._lock:
+            if name in self.costs:
+                elapsed = (
+                    self.smoothing * elapsed
+                    + (1 - self.smoothing) * self.costs[name]
+                )
+            self.costs[name] = elapsed
+
+    def _time(self, name, repo, user):
+        """Run a strategy, recording its cost.
+
+        Return:
+            a tuple of the number of commits, or None if the strategy failed,
+            and the error it raised, if any
+        """
+        start = time.perf_counter()
+        commits = error = None
+        try:
+            commits = self.strategies[name](repo, user)
+        except github.RateLimitExceededException:
+            raise
+        except github.GithubException as exception:
+            error = exception
+        elapsed = time.perf_counter() - start
+        if commits is None:
+            with self._lock:
+                costliest = max([elapsed] + list(self.costs.values()))
+            elapsed = costliest * self.failure_penalty
+        self._record(name, elapsed)
+        return commits, error
+
+    def count(self, repo, user):
+        """Return the number of commits the user authored in the repository.
+
+        Args:
+            repo (github.Repository.Repository): the repository to inspect
+            user (github.NamedUser.NamedUser): the commit author
+
+        Return:
+            int
+
+        Raise:
+            github.GithubException: the error of the last strategy tried, if
+                every strategy failed and it raised one
+            ApiResponseError: if every strategy failed otherwise
+        """
+        error = None
+        for name in self._rank(repo.full_name):
+            commits, error = self._time(name, repo, user)
+            if commits is not None:
+                with self._lock:
+                    self._preferred[repo.full_name] = name
+                return commits
+        if error is not None:
+            raise error
+        raise ApiResponseError(
+            'Unable to count commits to {}'.format(repo.full_name)
+        )
+
+    def benchmark(self, repo, user):
+        """Run every strategy against the repository, updating their costs.
+
+        Return:
+            a dict mapping each strategy name to a (commits, seconds) tuple
+        """
+        results = {}
+        for name in self.strategies:
+            start = time.perf_counter()
+            commits, _ = self._time(name, repo, user)
+            results[name] = (commits, time.perf_counter() - start)
+        return results
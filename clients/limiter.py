@@ -0,0 +1,130 @@
+import threading
+import time
+
+from config import config
+
+
+limiters = {}
+
+
+class AdaptiveLimiter:
+    """Caps the number of calls in flight to an upstream, adapting the cap to
+    how well the upstream copes. While latency stays near its baseline, the cap
+    grows by about one per cap's worth of calls; when the upstream throttles a
+    call or latency spikes, the cap is cut by a factor. Calls started before a
+    cut cannot cut it again, so a single burst of slow calls counts once.
+
+    Args:
+        is_overloaded (callable): given a raised exception, tells whether the
+            upstream refused the call because of its load
+        is_refused (callable): given the result of a call, tells whether the
+            upstream refused it because of its load, for calls that return
+            refusals rather than raise them
+        initial_limit (int): number of calls allowed in flight at first
+        min_limit (int): lowest the cap may be cut to
+        max_limit (int): highest the cap may grow to
+        backoff (float): factor applied to the cap when cutting it
+        tolerance (float): ratio of a call's latency to the baseline past which
+            the call counts as a spike
+        smoothing (float): weight given to the latest latency when updating
+            the baseline
+    """
+
+    def __init__(self, is_overloaded, initial_limit=8, min_limit=1, max_limit=64,
+                 backoff=0.5, tolerance=2.0, smoothing=0.1, is_refused=None):
+        self.is_overloaded = is_overloaded
+        self.is_refused = is_refused
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.baseline = None
+        self._cut_at = float('-inf')
+        self._condition = threading.Condition()
+
+    def _acquire(self):
+        with self._condition:
+            while self.in_flight >= max(int(self.limit), 1):
+                self._condition.wait()
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def _release(self, start, latency=None, overloaded=False):
+        """Free the slot of a call, adapting the cap to its outcome.
+
+        Args:
+            start (float): when the call was admitted
+            latency (float): duration of the call, or None if it failed
+            overloaded (bool): whether the upstream refused the call
+        """
+        with self._condition:
+            self.in_flight -= 1
+            is_spike = (
+                latency is not None
+                and self.baseline is not None
+                and latency > self.baseline * self.tolerance
+            )
+            if start >= self._cut_at:
+                if overloaded or is_spike:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._cut_at = time.perf_counter()
+                elif latency is not None:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if latency is not None:
+                self.baseline = latency if self.baseline is None else (
+                    self.smoothing * latency
+                    + (1 - self.smoothing) * self.baseline
+                )
+            self._condition.notify_all()
+
+    def call(self, func, *args, **kwargs):
+        """Call func once a slot is free, and adapt the cap to how it went"""
+        start = self._acquire()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as error:
+            self._release(start, overloaded=self.is_overloaded(error))
+            raise
+        if self.is_refused is not None and self.is_refused(result):
+            self._release(start, overloaded=True)
+        else:
+            self._release(start, latency=time.perf_counter() - start)
+        return result
+
+    def get_metrics(self):
+        """Return a dict of the current cap, calls in flight and baseline
+        latency (in seconds)"""
+        with self._condition:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'baseline_latency': self.baseline,
+            }
+
+
+def make_limiter(name, is_overloaded, is_refused=None):
+    """Build an AdaptiveLimiter from the configured bounds, registering it
+    under the given name so that its metrics get reported.
+
+    Args:
+        name (str): name of the upstream the limiter protects
+        is_overloaded (callable): see AdaptiveLimiter
+        is_refused (callable): see AdaptiveLimiter
+
+    Return:
+        an AdaptiveLimiter
+    """
+    limiter = AdaptiveLimiter(
+        is_overloaded,
+        initial_limit=int(config['concurrency_initial_limit']),
+        min_limit=int(config['concurrency_min_limit']),
+        max_limit=int(config['concurrency_max_limit']),
+        backoff=float(config['concurrency_backoff']),
+        tolerance=float(config['concurrency_latency_tolerance']),
+        is_refused=is_refused,
+    )
+    limiters[name] = limiter
+    return limiter
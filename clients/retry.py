@@ -0,0 +1,157 @@
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from email.utils import mktime_tz, parsedate_tz
+
+
+def parse_retry_after(value):
+    """Convert a Retry-After header into a number of seconds to wait.
+
+    Args:
+        value (str): either a number of seconds or an HTTP date
+
+    Return:
+        a float, or None if the value is missing or unreadable
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, mktime_tz(parsed) - time.time())
+
+
+class RetryBudget:
+    """Caps retries to a share of all calls, so that a struggling upstream is
+    not buried under a storm of retries.
+
+    Args:
+        ratio (float): retries allowed per call made
+        reserve (int): retries allowed regardless of traffic
+    """
+
+    def __init__(self, ratio, reserve=10):
+        self.ratio = ratio
+        self.reserve = reserve
+        self._tokens = float(reserve)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.reserve * 10)
+
+    def withdraw(self):
+        """Return whether a retry may be made, consuming a token if so"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class RetryPolicy:
+    """Retries idempotent calls that fail transiently, backing off
+    exponentially with full jitter, or as long as the upstream asked.
+
+    Args:
+        classify (callable): given a raised exception, returns a tuple of
+            whether it is transient and the number of seconds the upstream
+            asked to wait (or None)
+        max_attempts (int): number of attempts, including the first
+        base_delay (float): upper bound, in seconds, of the first backoff
+        max_delay (float): longest wait between attempts; errors asking for
+            a longer wait are raised instead
+        budget (RetryBudget): shared limit on the number of retries
+    """
+
+    def __init__(self, classify, max_attempts=3, base_delay=0.5, max_delay=10,
+                 budget=None):
+        self.classify = classify
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+    def get_delay(self, attempt, retry_after=None):
+        """Return the number of seconds to wait before the next attempt"""
+        if retry_after is not None:
+            return retry_after
+        backoff = self.base_delay * 2 ** (attempt - 1)
+        return random.uniform(0, min(self.max_delay, backoff))
+
+    def call(self, func, *args, **kwargs):
+        if self.budget is not None:
+            self.budget.deposit()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                is_transient, retry_after = self.classify(error)
+                delay = self.get_delay(attempt, retry_after)
+                if (
+                    not is_transient
+                    or attempt == self.max_attempts
+                    or delay > self.max_delay
+                    or (self.budget is not None and not self.budget.withdraw())
+                ):
+                    raise
+            time.sleep(delay)
+
+
+class HedgingPolicy:
+    """Sends a duplicate of any call still pending after the recent p95
+    latency, returning whichever answers first.
+
+    Args:
+        percentile (float): latency percentile past which to hedge
+        min_samples (int): number of timed calls needed before hedging
+        window (int): number of recent latencies to keep
+        max_workers (int): number of threads available to run calls
+    """
+
+    def __init__(self, percentile=95, min_samples=20, window=200, max_workers=16):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @property
+    def threshold(self):
+        """The number of seconds after which a call is hedged, or None"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < self.min_samples:
+            return None
+        index = int(math.ceil(self.percentile / 100 * len(latencies))) - 1
+        return latencies[max(index, 0)]
+
+    def _record(self, elapsed):
+        with self._lock:
+            self._latencies.append(elapsed)
+
+    def call(self, func, *args, **kwargs):
+        threshold = self.threshold
+        start = time.perf_counter()
+        pending = [self._executor.submit(func, *args, **kwargs)]
+        if threshold is not None:
+            done, _ = wait(pending, timeout=threshold)
+            if not done:
+                pending.append(self._executor.submit(func, *args, **kwargs))
+
+        first_error = None
+        for future in as_completed(pending):
+            try:
+                result = future.result()
+            except Exception as error:
+                first_error = first_error or error
+                continue
+            self._record(time.perf_counter() - start)
+            return result
+        raise first_error
@@ -2,6 +2,33 @@ import os
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader
+
+
+_parsed_files = {}
+
+
+def _parse_file(file_path):
+    """Parse the given YAML file, reusing the result for as long as the file
+    is unchanged.
+
+    Args:
+        file_path (str): absolute or relative path to the YAML file to parse
+
+    Return:
+        dict
+    """
+    path = os.path.realpath(file_path)
+    stat = os.stat(path)
+    cache_key = (path, stat.st_mtime_ns, stat.st_size)
+    if cache_key not in _parsed_files:
+        with open(path) as config_file:
+            _parsed_files[cache_key] = yaml.load(config_file, Loader=SafeLoader) or {}
+    return _parsed_files[cache_key]
+
 
 def _get_config(file_path):
     """Read the configuration from the given YAML file, overriding individual
@@ -13,8 +40,7 @@ def _get_config(file_path):
     Return:
         dict
     """
-    with open(file_path) as config_file:
-        config = yaml.load(config_file)
+    config = dict(_parse_file(file_path))
     for key, value in config.items():
         config[key] = os.getenv(key.upper(), value)
     return config
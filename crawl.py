@@ -0,0 +1,68 @@
+import argparse
+import logging
+import sys
+
+from application.bulk import BulkCrawler, Checkpoint, RatePacer, WRITERS
+from application.workers import shutdown_crawl_pool
+from config import config
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description='Crawl the merged profiles of many usernames into a file.'
+    )
+    parser.add_argument(
+        'usernames',
+        type=argparse.FileType('r'),
+        help='file listing one username per line, or - for stdin'
+    )
+    parser.add_argument(
+        'output',
+        help='NDJSON file, or directory of Parquet files, to write profiles to'
+    )
+    parser.add_argument('--format', choices=sorted(WRITERS), default='ndjson')
+    parser.add_argument(
+        '--checkpoint',
+        help='file recording progress, from which an interrupted crawl '
+             'resumes (default: OUTPUT.checkpoint)'
+    )
+    parser.add_argument('--workers', type=int, default=int(config['bulk_workers']))
+    parser.add_argument('--batch-size', type=int, default=int(config['bulk_batch_size']))
+    parser.add_argument(
+        '--rate-budget',
+        type=int,
+        default=int(config['bulk_rate_budget']),
+        help='upstream requests allowed per hour, or 0 for no pacing'
+    )
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    checkpoint = Checkpoint(args.checkpoint or args.output.rstrip('/') + '.checkpoint')
+    writer = WRITERS[args.format](args.output, checkpoint.state)
+    crawler = BulkCrawler(
+        writer,
+        checkpoint,
+        RatePacer(args.rate_budget, int(config['prewarm_profile_cost'])),
+        workers=args.workers,
+        batch_size=args.batch_size,
+        rate_limit_pause=int(config['bulk_rate_limit_pause']),
+    )
+    try:
+        written = crawler.run(args.usernames)
+    finally:
+        writer.close()
+        checkpoint.close()
+        shutdown_crawl_pool(wait=True)
+    logging.info(
+        'Wrote %s profiles (%s in total) to %s',
+        written,
+        len(checkpoint.done),
+        args.output
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
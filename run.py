@@ -1,4 +1,70 @@
+import logging
+from distutils.util import strtobool
+
 from application.app import app
+from application.profiles import start_refresher
+from application.server import PreforkServer
+from application.workers import shutdown_crawl_pool
+from cache.factory import get_store, start_checkpointer
+from config import config
+
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTasks:
+    """Runs the per-process background threads of a worker. Each worker
+    checkpoints its own caches. Profiles pre-warmed into a shared cache store
+    reach every worker, so only the first worker pre-warms them; otherwise
+    each worker pre-warms its own caches on a share of the budget.
+
+    Args:
+        workers (int): number of server workers
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.checkpointer = None
+        self.refresher = None
+
+    def start(self, worker_index):
+        self.checkpointer = start_checkpointer(worker_index)
+        if not strtobool(str(config['prewarm_enabled'])):
+            return
+        if get_store() is None:
+            self.refresher = start_refresher(processes=self.workers)
+        elif worker_index == 0:
+            self.refresher = start_refresher()
+
+    def stop(self):
+        """Stop the background threads, once in-flight crawls have finished"""
+        if self.refresher is not None:
+            self.refresher.stop()
+        shutdown_crawl_pool(wait=True)
+        if self.checkpointer is not None:
+            self.checkpointer.stop()
+
 
 if __name__ == '__main__':
-    app.run(host='127.0.0.1')
+    logging.basicConfig(level=logging.INFO)
+    workers = int(config['server_workers'])
+    if workers > 1 and get_store() is None:
+        logger.warning(
+            'The %s cache backend is not shared between the %d workers: each '
+            'webhook only updates the caches of the worker receiving it. Set '
+            'cache_backend to sqlite or redis to share them.',
+            config['cache_backend'],
+            workers
+        )
+    tasks = BackgroundTasks(workers)
+    server = PreforkServer(
+        app,
+        host=config['server_host'],
+        port=int(config['server_port']),
+        workers=workers,
+        threads=int(config['server_threads']),
+        graceful_timeout=float(config['server_graceful_timeout']),
+        post_fork=[tasks.start],
+        worker_exit=[tasks.stop],
+    )
+    server.run()
@@ -0,0 +1,107 @@
+import json
+import tempfile
+from unittest import mock, TestCase
+
+from application.api.admin import endpoints
+from application.app import app
+
+
+class GetMetricsTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(endpoints.config, {'admin_token': 'token'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = app.test_client()
+
+    def test_reports_limiter_metrics(self):
+        mock_limiter = mock.Mock()
+        mock_limiter.get_metrics.return_value = {'limit': 3}
+        with mock.patch.dict(endpoints.limiters, {'github': mock_limiter}, clear=True):
+            response = self.client.get(
+                '/admin/metrics',
+                headers={'Authorization': 'Bearer token'}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.get_data(as_text=True)),
+            {'limiters': {'github': {'limit': 3}, 'bitbucket': None}}
+        )
+
+    def test_rejects_invalid_token(self):
+        self.assertEqual(self.client.get('/admin/metrics').status_code, 401)
+        response = self.client.get('/admin/metrics', headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(response.status_code, 401)
+
+
+class ProfileTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.dict(
+            endpoints.config,
+            {'admin_token': 'token', 'profiler_output_dir': directory.name}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = app.test_client()
+
+    def test_profiles_worker(self):
+        with mock.patch.object(endpoints, 'profile_process', return_value='a;b 3\n') as mock_profile:
+            response = self.client.get(
+                '/admin/profile?seconds=2',
+                headers={'Authorization': 'Bearer token'}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(as_text=True), 'a;b 3\n')
+        self.assertEqual(response.mimetype, 'text/plain')
+        mock_profile.assert_called_once_with(2.0, interval=0.005)
+
+    def test_rejects_invalid_requests(self):
+        with mock.patch.object(endpoints, 'profile_process', return_value=None) as mock_profile:
+            self.assertEqual(self.client.get('/admin/profile').status_code, 401)
+            self.assertEqual(
+                self.client.get('/admin/profile', headers={'Authorization': 'Bearer nope'}).status_code,
+                401
+            )
+            for seconds in ('soon', '0', '3600'):
+                response = self.client.get(
+                    '/admin/profile?seconds={}'.format(seconds),
+                    headers={'Authorization': 'Bearer token'}
+                )
+                self.assertEqual(response.status_code, 400)
+            mock_profile.assert_not_called()
+
+            response = self.client.get('/admin/profile', headers={'Authorization': 'Bearer token'})
+            self.assertEqual(response.status_code, 409)
+
+    def test_disabled_without_token(self):
+        with mock.patch.dict(endpoints.config, {'admin_token': ''}):
+            response = self.client.get('/admin/profile', headers={'Authorization': 'Bearer '})
+        self.assertEqual(response.status_code, 401)
+
+    def test_profiles_requests_with_header(self):
+        response = self.client.get('/admin/metrics', headers={'X-Profile': 'token'})
+        profile_id = response.headers['X-Profile-Id']
+
+        response = self.client.get(
+            '/admin/profile/{}'.format(profile_id),
+            headers={'Authorization': 'Bearer token'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/plain')
+
+        self.assertNotIn('X-Profile-Id', self.client.get('/admin/metrics').headers)
+        self.assertNotIn(
+            'X-Profile-Id',
+            self.client.get('/admin/metrics', headers={'X-Profile': 'nope'}).headers
+        )
+        for profile_id in ('0' * 32, '../etc/passwd'):
+            response = self.client.get(
+                '/admin/profile/{}'.format(profile_id),
+                headers={'Authorization': 'Bearer token'}
+            )
+            self.assertEqual(response.status_code, 404)
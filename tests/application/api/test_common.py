@@ -1,7 +1,46 @@
+import gzip
 import json
+import os
+import subprocess
+import sys
 from unittest import mock, TestCase
 
+from werkzeug.datastructures import Accept
+
 from application.api import common
+from application.app import app
+
+
+class GetSerializerTestCase(TestCase):
+    def test_stdlib_serializer_encodes_json(self):
+        serializer = common.get_serializer('json')
+        self.assertEqual(serializer({'foo': 'bar'}), b'{"foo": "bar"}')
+
+    def test_auto_prefers_fast_serializer(self):
+        with mock.patch.dict(common.SERIALIZERS, {'orjson': mock.Mock()}):
+            self.assertIs(common.get_serializer('auto'), common.SERIALIZERS['orjson'])
+        with mock.patch.dict(common.SERIALIZERS, clear=True, json=common._serialize_json):
+            self.assertIs(common.get_serializer('auto'), common._serialize_json)
+
+    def test_serializers_agree(self):
+        content = {'repositories': {'original': 1}, 'languages': ['Python'], 'stars': 3}
+        for serializer in common.SERIALIZERS.values():
+            self.assertEqual(json.loads(serializer(content)), content)
+
+
+class NegotiateEncodingTestCase(TestCase):
+    def test_prefers_highest_quality(self):
+        accept = Accept([('gzip', 1), ('deflate', 1)])
+        self.assertEqual(common.negotiate_encoding(accept), 'gzip')
+
+    def test_prefers_brotli_when_installed(self):
+        accept = Accept([('gzip', 1), ('br', 1)])
+        with mock.patch.dict(common.COMPRESSORS, {'br': mock.Mock()}):
+            self.assertEqual(common.negotiate_encoding(accept), 'br')
+
+    def test_ignores_unsupported_encodings(self):
+        self.assertIsNone(common.negotiate_encoding(Accept([('deflate', 1)])))
+        self.assertIsNone(common.negotiate_encoding(Accept([('gzip', 0)])))
 
 
 class MakeResponseTestCase(TestCase):
@@ -9,8 +48,95 @@ class MakeResponseTestCase(TestCase):
         with mock.patch.object(common, 'make_flask_response') as mock_make_response:
             response = common.make_response({'foo': 'bar'}, 200)
         mock_make_response.assert_called_once_with(
-            json.dumps({'foo': 'bar'}),
+            common.serialize({'foo': 'bar'}),
             200,
             {'Content-Type': 'application/json'}
         )
         self.assertEqual(response, mock_make_response.return_value)
+
+    def test_compresses_large_content_when_accepted(self):
+        content = {'languages': ['Python'] * 500}
+        with mock.patch.dict(common.config, {'compression_min_size': 1024}):
+            with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+                response = common.make_response(content, 200)
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(json.loads(gzip.decompress(response.get_data())), content)
+
+    def test_does_not_compress_small_content(self):
+        with mock.patch.dict(common.config, {'compression_min_size': 1024}):
+            with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+                response = common.make_response({'foo': 'bar'}, 200)
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(json.loads(response.get_data()), {'foo': 'bar'})
+
+    def test_does_not_compress_unless_accepted(self):
+        content = {'languages': ['Python'] * 500}
+        with mock.patch.dict(common.config, {'compression_min_size': 1024}):
+            with app.test_request_context():
+                response = common.make_response(content, 200)
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(json.loads(response.get_data()), content)
+
+    def test_adds_caching_headers(self):
+        with app.test_request_context():
+            response = common.make_response({'foo': 'bar'}, 200, last_modified=0, max_age=60)
+
+        etag = common.make_etag(common.serialize({'foo': 'bar'}))
+        self.assertEqual(response.headers['ETag'], 'W/"{}"'.format(etag))
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(response.headers['Last-Modified'], 'Thu, 01 Jan 1970 00:00:00 GMT')
+
+    def test_etag_does_not_depend_on_hash_seed(self):
+        script = (
+            'from application.api.common import make_etag, serialize\n'
+            'from application.helpers import merge_profiles\n'
+            'profile = merge_profiles(\n'
+            '    {"languages": ["Go", "Rust", "Python"], "topics": ["cli", "web"]},\n'
+            '    {"languages": ["Haskell", "C"], "topics": ["api", "db"]},\n'
+            ')\n'
+            'print(make_etag(serialize(profile)))\n'
+        )
+        etags = {
+            subprocess.check_output(
+                [sys.executable, '-c', script],
+                env=dict(os.environ, PYTHONHASHSEED=seed),
+            )
+            for seed in ('1', '2', '3')
+        }
+        self.assertEqual(len(etags), 1)
+
+    def test_returns_not_modified_on_matching_etag(self):
+        etag = common.make_etag(common.serialize({'foo': 'bar'}))
+        for if_none_match in (etag, 'W/"{}"'.format(etag), '"other", "{}"'.format(etag)):
+            headers = {'If-None-Match': if_none_match}
+            with app.test_request_context(headers=headers):
+                response = common.make_response({'foo': 'bar'}, 200, max_age=60)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.get_data(), b'')
+            self.assertEqual(response.headers['Cache-Control'], 'public, max-age=60')
+
+    def test_not_modified_varies_like_full_response(self):
+        content = {'languages': ['Python'] * 500}
+        etag = common.make_etag(common.serialize(content))
+        with mock.patch.dict(common.config, {'compression_min_size': 1024}):
+            with app.test_request_context(headers={'If-None-Match': etag}):
+                response = common.make_response(content, 200, max_age=60)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+
+    def test_returns_content_on_stale_etag(self):
+        with app.test_request_context(headers={'If-None-Match': '"stale"'}):
+            response = common.make_response({'foo': 'bar'}, 200, max_age=60)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.get_data()), {'foo': 'bar'})
+
+    def test_adds_extra_headers(self):
+        with app.test_request_context():
+            response = common.make_response({}, 503, headers={'Retry-After': '3'})
+        self.assertEqual(response.headers['Retry-After'], '3')
+        self.assertEqual(response.headers['Content-Type'], 'application/json')
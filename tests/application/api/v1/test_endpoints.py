@@ -1,6 +1,7 @@
 from contextlib import ExitStack
 from unittest import mock, TestCase
 
+from application.admission import OverloadedError
 from application.api.v1 import endpoints
 from application.app import app
 from clients import exceptions
@@ -8,135 +9,73 @@ from clients import exceptions
 
 class GetMergedProfilesTestCase(TestCase):
     def test_retrieves_profiles(self):
+        profiles = {'github': {'stars': 1}, 'bitbucket': None}
         with ExitStack() as stack:
-            context_managers = (
-                mock.patch.object(endpoints.GithubClient, 'get_profile'),
-                mock.patch.object(endpoints.BitBucketClient, 'get_profile'),
-                mock.patch.object(endpoints, 'make_response'),
+            mock_get_profiles = stack.enter_context(
+                mock.patch.object(endpoints, 'get_profiles', return_value=(profiles, 100))
             )
-            for context_manager in context_managers:
-                stack.enter_context(context_manager)
-
-            with app.test_request_context('/v1/profile/username?github_username=gh_user'):
-                response = endpoints.get_merged_profiles_v1('username')
-
-            endpoints.GithubClient.get_profile.assert_called_once_with('gh_user')
-            endpoints.BitBucketClient.get_profile.assert_called_once_with('username', is_team=True)
-            endpoints.make_response.assert_called_once_with(
-                {
-                    'github': endpoints.GithubClient.get_profile.return_value,
-                    'bitbucket': endpoints.BitBucketClient.get_profile.return_value,
-                },
-                200
-            )
-            self.assertEqual(response, endpoints.make_response.return_value)
-
-    def test_ignores_missing_github_profile(self):
-        error = exceptions.UnknownProfileError()
-        with ExitStack() as stack:
-            context_managers = (
-                mock.patch.object(endpoints.GithubClient, 'get_profile', side_effect=error),
-                mock.patch.object(endpoints.BitBucketClient, 'get_profile'),
-                mock.patch.object(endpoints, 'make_response'),
+            stack.enter_context(mock.patch.object(endpoints, 'get_max_age', return_value=60))
+            mock_make_response = stack.enter_context(
+                mock.patch.object(endpoints, 'make_response')
             )
-            for context_manager in context_managers:
-                stack.enter_context(context_manager)
-
-            with app.test_request_context('/v1/profile/username'):
+            with app.test_request_context('/v1/profile/username?github_username=gh_user'):
                 response = endpoints.get_merged_profiles_v1('username')
 
-            endpoints.GithubClient.get_profile.assert_called_once_with('username')
-            endpoints.BitBucketClient.get_profile.assert_called_once_with('username', is_team=True)
-            endpoints.make_response.assert_called_once_with(
-                {
-                    'github': None,
-                    'bitbucket': endpoints.BitBucketClient.get_profile.return_value,
-                },
-                200
-            )
-            self.assertEqual(response, endpoints.make_response.return_value)
-
-    def test_raises_error_on_github_rate_limit(self):
+        mock_get_profiles.assert_called_once_with('gh_user', 'username', None)
+        mock_make_response.assert_called_once_with(
+            profiles,
+            200,
+            last_modified=100,
+            max_age=60
+        )
+        self.assertEqual(response, mock_make_response.return_value)
+
+    def test_reads_bitbucket_query_parameters(self):
+        with mock.patch.object(endpoints, 'get_profiles', return_value=({}, 0)) as mock_get_profiles:
+            with mock.patch.object(endpoints, 'make_response'):
+                with app.test_request_context(
+                    '/v1/profile/username?bitbucket_username=bb_user&bitbucket_team=false'
+                ):
+                    endpoints.get_merged_profiles_v1('username')
+
+        mock_get_profiles.assert_called_once_with('username', 'bb_user', False)
+
+    def test_raises_error_on_rate_limit(self):
         error = exceptions.RateLimitError('this is a test')
-        with ExitStack() as stack:
-            context_managers = (
-                mock.patch.object(endpoints.GithubClient, 'get_profile', side_effect=error),
-                mock.patch.object(endpoints.BitBucketClient, 'get_profile'),
-                mock.patch.object(endpoints, 'make_response'),
-            )
-            for context_manager in context_managers:
-                stack.enter_context(context_manager)
+        with mock.patch.object(endpoints, 'get_profiles', side_effect=error):
+            with mock.patch.object(endpoints, 'make_response') as mock_make_response:
+                with app.test_request_context('/v1/profile/username'):
+                    response = endpoints.get_merged_profiles_v1('username')
 
-            with app.test_request_context('/v1/profile/username'):
-                response = endpoints.get_merged_profiles_v1('username')
-
-            endpoints.make_response.assert_called_once_with(
-                {'error': 'this is a test'},
-                429
-            )
-            self.assertEqual(response, endpoints.make_response.return_value)
+        mock_make_response.assert_called_once_with(
+            {'error': 'this is a test'},
+            429
+        )
+        self.assertEqual(response, mock_make_response.return_value)
 
     def test_raises_error_on_invalid_github_credentials(self):
         error = exceptions.InvalidCredentialsError('this is a test')
-        with ExitStack() as stack:
-            context_managers = (
-                mock.patch.object(endpoints.GithubClient, 'get_profile', side_effect=error),
-                mock.patch.object(endpoints.BitBucketClient, 'get_profile'),
-                mock.patch.object(endpoints, 'make_response'),
-            )
-            for context_manager in context_managers:
-                stack.enter_context(context_manager)
-
-            with app.test_request_context('/v1/profile/username'):
-                response = endpoints.get_merged_profiles_v1('username')
-
-            endpoints.make_response.assert_called_once_with(
-                {'error': 'this is a test'},
-                401
-            )
-            self.assertEqual(response, endpoints.make_response.return_value)
-
-    def test_ignores_missing_bitbucket_profile(self):
-        error = exceptions.UnknownProfileError()
-        with ExitStack() as stack:
-            context_managers = (
-                mock.patch.object(endpoints.GithubClient, 'get_profile'),
-                mock.patch.object(endpoints.BitBucketClient, 'get_profile', side_effect=error),
-                mock.patch.object(endpoints, 'make_response'),
-            )
-            for context_manager in context_managers:
-                stack.enter_context(context_manager)
-
-            with app.test_request_context('/v1/profile/username'):
-                response = endpoints.get_merged_profiles_v1('username')
-
-            endpoints.GithubClient.get_profile.assert_called_once_with('username')
-            endpoints.BitBucketClient.get_profile.assert_called_once_with('username', is_team=True)
-            endpoints.make_response.assert_called_once_with(
-                {
-                    'github': endpoints.GithubClient.get_profile.return_value,
-                    'bitbucket': None,
-                },
-                200
-            )
-            self.assertEqual(response, endpoints.make_response.return_value)
-
-    def test_raises_error_on_bitbucket_rate_limit(self):
-        error = exceptions.RateLimitError('this is a test')
-        with ExitStack() as stack:
-            context_managers = (
-                mock.patch.object(endpoints.GithubClient, 'get_profile'),
-                mock.patch.object(endpoints.BitBucketClient, 'get_profile', side_effect=error),
-                mock.patch.object(endpoints, 'make_response'),
-            )
-            for context_manager in context_managers:
-                stack.enter_context(context_manager)
-
-            with app.test_request_context('/v1/profile/username'):
-                response = endpoints.get_merged_profiles_v1('username')
-
-            endpoints.make_response.assert_called_once_with(
-                {'error': 'this is a test'},
-                429
-            )
-            self.assertEqual(response, endpoints.make_response.return_value)
+        with mock.patch.object(endpoints, 'get_profiles', side_effect=error):
+            with mock.patch.object(endpoints, 'make_response') as mock_make_response:
+                with app.test_request_context('/v1/profile/username'):
+                    response = endpoints.get_merged_profiles_v1('username')
+
+        mock_make_response.assert_called_once_with(
+            {'error': 'this is a test'},
+            401
+        )
+        self.assertEqual(response, mock_make_response.return_value)
+
+    def test_sheds_load_when_overloaded(self):
+        error = OverloadedError('this is a test', retry_after=7)
+        with mock.patch.object(endpoints, 'get_profiles', side_effect=error):
+            with mock.patch.object(endpoints, 'make_response') as mock_make_response:
+                with app.test_request_context('/v1/profile/username'):
+                    response = endpoints.get_merged_profiles_v1('username')
+
+        mock_make_response.assert_called_once_with(
+            {'error': 'this is a test'},
+            503,
+            headers={'Retry-After': '7'}
+        )
+        self.assertEqual(response, mock_make_response.return_value)
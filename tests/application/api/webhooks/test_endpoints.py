@@ -0,0 +1,75 @@
+import hashlib
+import hmac
+import json
+from unittest import mock, TestCase
+
+from application.api.webhooks import endpoints
+from application.app import app
+
+
+def sign(body, secret='secret'):
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+class ReceiveEventTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(
+            endpoints.config,
+            {'webhook_github_secret': 'secret', 'webhook_bitbucket_secret': 'secret'}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_handles_signed_github_event(self):
+        body = json.dumps({'action': 'created'}).encode('utf-8')
+        with mock.patch.object(endpoints, 'handle_github_event', return_value={'updated': 1}) as mock_handle:
+            response = app.test_client().post(
+                '/webhooks/github',
+                data=body,
+                headers={
+                    'X-GitHub-Event': 'star',
+                    'X-GitHub-Delivery': 'delivery-1',
+                    'X-Hub-Signature-256': sign(body),
+                },
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.get_data(as_text=True)), {'updated': 1})
+        mock_handle.assert_called_once_with('star', {'action': 'created'}, 'delivery-1')
+
+    def test_handles_signed_bitbucket_event(self):
+        body = b'{"repository": {}}'
+        with mock.patch.object(endpoints, 'handle_bitbucket_event', return_value={}) as mock_handle:
+            response = app.test_client().post(
+                '/webhooks/bitbucket',
+                data=body,
+                headers={'X-Event-Key': 'repo:push', 'X-Hub-Signature': sign(body)},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        mock_handle.assert_called_once_with('repo:push', {'repository': {}})
+
+    def test_rejects_invalid_signature(self):
+        with mock.patch.object(endpoints, 'handle_github_event') as mock_handle:
+            response = app.test_client().post(
+                '/webhooks/github',
+                data=b'{}',
+                headers={'X-GitHub-Event': 'push', 'X-Hub-Signature-256': sign(b'{}', 'other')},
+            )
+
+        self.assertEqual(response.status_code, 401)
+        mock_handle.assert_not_called()
+
+    def test_rejects_invalid_payload(self):
+        response = app.test_client().post(
+            '/webhooks/github',
+            data=b'[]',
+            headers={'X-GitHub-Event': 'push', 'X-Hub-Signature-256': sign(b'[]')},
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_disabled_without_secret(self):
+        with mock.patch.dict(endpoints.config, {'webhook_github_secret': ''}):
+            response = app.test_client().post('/webhooks/github', data=b'{}')
+        self.assertEqual(response.status_code, 404)
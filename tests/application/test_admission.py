@@ -0,0 +1,71 @@
+import threading
+import time
+from unittest import TestCase
+
+from application import admission
+
+
+class AdmissionControllerTestCase(TestCase):
+    def test_admits_up_to_max_concurrent(self):
+        controller = admission.AdmissionController(
+            max_concurrent=2,
+            max_queued=0,
+            queue_timeout=1
+        )
+        with controller.admit(1):
+            with controller.admit(1):
+                self.assertEqual(controller.active, 2)
+                with self.assertRaises(admission.OverloadedError) as cm:
+                    with controller.admit(1):
+                        pass
+        self.assertEqual(controller.active, 0)
+        self.assertGreaterEqual(cm.exception.retry_after, 1)
+
+    def test_times_out_in_queue(self):
+        controller = admission.AdmissionController(
+            max_concurrent=1,
+            max_queued=1,
+            queue_timeout=0.01
+        )
+        with controller.admit(1):
+            with self.assertRaises(admission.OverloadedError):
+                with controller.admit(1):
+                    pass
+        self.assertEqual(controller.queued, 0)
+
+    def test_admits_cheapest_queued_operations_first(self):
+        controller = admission.AdmissionController(
+            max_concurrent=1,
+            max_queued=10,
+            queue_timeout=5
+        )
+        order = []
+
+        def build(cost):
+            with controller.admit(cost):
+                order.append(cost)
+
+        with controller.admit(0):
+            threads = []
+            for cost in (30, 10, 20):
+                thread = threading.Thread(target=build, args=(cost,))
+                thread.start()
+                threads.append(thread)
+                while controller.queued < len(threads):
+                    time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, [10, 20, 30])
+
+    def test_tracks_average_duration(self):
+        controller = admission.AdmissionController(
+            max_concurrent=1,
+            max_queued=1,
+            queue_timeout=1,
+            smoothing=1
+        )
+        controller._acquire(1)
+        controller._release(4)
+        self.assertEqual(controller.average_duration, 4)
+        self.assertEqual(controller.retry_after, 4)
@@ -0,0 +1,106 @@
+from unittest import skipIf, TestCase
+
+from application import aggregation, helpers
+
+
+PROFILES = [
+    {
+        'repositories': {'original': 3, 'forked': 1},
+        'stars': 10,
+        'commits': 100,
+        'followers': 4,
+        'languages': ['Python', 'C'],
+        'topics': ['web'],
+    },
+    {
+        'repositories': 2,
+        'commits': 30,
+        'watchers': 5,
+        'languages': ['Python'],
+    },
+    None,
+    {
+        'repositories': {'original': 1, 'forked': 0},
+        'stars': 50,
+        'commits': 7,
+        'languages': ['Go'],
+        'topics': ['cli', 'web'],
+    },
+]
+
+
+@skipIf(aggregation.numpy is None, 'numpy is not installed')
+class ProfileTableTestCase(TestCase):
+    def _make_table(self):
+        return aggregation.ProfileTable(
+            PROFILES,
+            keys=['ada', 'bob', 'cy', 'dee'],
+            groups=['org', 'org', None, 'other'],
+        )
+
+    def _normalize(self, profile):
+        profile = dict(profile)
+        profile['repositories'] = dict(profile['repositories'])
+        profile['languages'] = sorted(profile['languages'])
+        profile['topics'] = sorted(profile['topics'])
+        return profile
+
+    def test_sums_like_merge_profiles(self):
+        self.assertEqual(
+            self._normalize(self._make_table().sum()),
+            self._normalize(helpers.merge_profiles(*PROFILES))
+        )
+        for profile in PROFILES:
+            self.assertEqual(
+                self._normalize(aggregation.ProfileTable([profile]).sum()),
+                self._normalize(helpers.merge_profiles(profile))
+            )
+        self.assertEqual(
+            aggregation.ProfileTable([]).sum(),
+            helpers.merge_profiles()
+        )
+        for profiles in ([{'stars': 1}], [None], [{'stars': 1}, {'repositories': 2}]):
+            self.assertEqual(
+                aggregation.ProfileTable(profiles).sum(),
+                helpers.merge_profiles(*profiles)
+            )
+
+    def test_groups_by_language(self):
+        groups = self._make_table().group_by('language')
+        self.assertEqual(sorted(groups), ['C', 'Go', 'Python'])
+        python = self._normalize(groups['Python'])
+        self.assertEqual(python['profiles'], 2)
+        self.assertEqual(python['commits'], 130)
+        self.assertEqual(python['repositories'], {'original': 5, 'forked': 1})
+        self.assertEqual(python['languages'], ['C', 'Python'])
+        self.assertEqual(python['topics'], ['web'])
+
+    def test_groups_by_topic(self):
+        groups = self._make_table().group_by('topic')
+        self.assertEqual(groups['web']['profiles'], 2)
+        self.assertEqual(groups['web']['stars'], 60)
+        self.assertEqual(groups['cli']['languages'], ['Go'])
+
+    def test_groups_by_group(self):
+        groups = self._make_table().group_by('group')
+        self.assertEqual(sorted(groups), ['org', 'other'])
+        self.assertEqual(groups['org']['profiles'], 2)
+        self.assertEqual(groups['org']['commits'], 130)
+        self.assertEqual(sorted(groups['other']['topics']), ['cli', 'web'])
+
+    def test_groups_like_merge_profiles(self):
+        groups = aggregation.ProfileTable(
+            PROFILES,
+            groups=['org', 'other', 'none', 'other'],
+        ).group_by('group')
+        self.assertEqual(groups['none'], dict(helpers.merge_profiles(None), profiles=0))
+        self.assertEqual(groups['other']['profiles'], 2)
+        del groups['other']['profiles']
+        self.assertEqual(groups['other'], helpers.merge_profiles(PROFILES[1], PROFILES[3]))
+
+    def test_ranks_top_profiles(self):
+        table = self._make_table()
+        self.assertEqual(table.top('commits', 2), [('ada', 100), ('bob', 30)])
+        self.assertEqual(table.top('stars', 10)[0], ('dee', 50))
+        self.assertEqual(len(table.top('stars', 10)), 4)
+        self.assertEqual(table.top('stars', 0), [])
@@ -0,0 +1,20 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+
+# Modules the application must not import before serving its first request
+DEFERRED_MODULES = ('github', 'requests', 'clients.github', 'clients.bitbucket')
+
+
+class ImportTestCase(TestCase):
+    def test_defers_provider_client_imports(self):
+        script = (
+            'import sys\n'
+            'import application.app\n'
+            'print(*(name in sys.modules for name in sys.argv[1:]))\n'
+        )
+        output = subprocess.check_output(
+            [sys.executable, '-c', script] + list(DEFERRED_MODULES)
+        )
+        self.assertEqual(output.split(), [b'False'] * len(DEFERRED_MODULES))
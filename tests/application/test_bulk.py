@@ -0,0 +1,148 @@
+import json
+import os
+import tempfile
+from unittest import mock, skipIf, TestCase
+
+import github
+import requests
+
+from application import bulk
+from clients.exceptions import ApiResponseError, InvalidCredentialsError, RateLimitError
+
+
+def crawl(username):
+    return {'username': username, 'profile': {'stars': len(username)}}
+
+
+class BulkCrawlerTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, 'profiles.ndjson')
+        self.checkpoint_path = os.path.join(directory.name, 'profiles.checkpoint')
+
+    def run_crawler(self, usernames, crawl=crawl, batch_size=2):
+        checkpoint = bulk.Checkpoint(self.checkpoint_path)
+        writer = bulk.NDJSONWriter(self.output, checkpoint.state)
+        crawler = bulk.BulkCrawler(
+            writer,
+            checkpoint,
+            bulk.RatePacer(0, 1),
+            workers=2,
+            batch_size=batch_size,
+            rate_limit_pause=0,
+            crawl=crawl,
+        )
+        try:
+            return crawler.run(usernames)
+        finally:
+            writer.close()
+            checkpoint.close()
+
+    def read_output(self):
+        with open(self.output) as output_file:
+            return [json.loads(line) for line in output_file]
+
+    def test_writes_rows(self):
+        written = self.run_crawler(['ada\n', 'bob\n', '\n', 'ada\n', 'carol\n'])
+        self.assertEqual(written, 3)
+        rows = self.read_output()
+        self.assertCountEqual([row['username'] for row in rows], ['ada', 'bob', 'carol'])
+        self.assertEqual(rows[0]['profile'], {'stars': len(rows[0]['username'])})
+
+    def test_resumes_without_crawling_again(self):
+        def failing_crawl(username):
+            if username == 'e':
+                raise InvalidCredentialsError('bad token')
+            return crawl(username)
+
+        with self.assertRaises(InvalidCredentialsError):
+            self.run_crawler(['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h'], failing_crawl, batch_size=2)
+        done = bulk.Checkpoint(self.checkpoint_path).done
+        self.assertTrue(done)
+
+        # rows written after the last checkpoint are discarded
+        with open(self.output, 'a') as output_file:
+            output_file.write('{"username": "partial"')
+
+        mock_crawl = mock.Mock(side_effect=crawl)
+        self.run_crawler(['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h'], mock_crawl)
+        crawled = {call[0][0] for call in mock_crawl.call_args_list}
+        self.assertFalse(crawled & done)
+        self.assertEqual(
+            sorted(row['username'] for row in self.read_output()),
+            ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']
+        )
+
+    def test_retries_after_rate_limit(self):
+        mock_crawl = mock.Mock(side_effect=[RateLimitError(), crawl('ada')])
+        with mock.patch.object(bulk.RatePacer, 'pause') as mock_pause:
+            self.run_crawler(['ada'], mock_crawl)
+        mock_pause.assert_called_once_with(0)
+        self.assertEqual(self.read_output(), [crawl('ada')])
+
+    def test_records_failures(self):
+        self.run_crawler(['ada'], mock.Mock(side_effect=ApiResponseError('oops')))
+        self.assertEqual(
+            self.read_output(),
+            [{'username': 'ada', 'profile': None, 'error': 'oops'}]
+        )
+
+    def test_records_unexpected_failures(self):
+        errors = {
+            'ada': github.GithubException(502, 'Bad Gateway', None),
+            'bob': requests.ConnectionError(),
+        }
+
+        def crawl_or_fail(username):
+            if username in errors:
+                raise errors[username]
+            return crawl(username)
+
+        self.run_crawler(['ada', 'bob', 'cy'], crawl_or_fail)
+        rows = {row['username']: row for row in self.read_output()}
+        self.assertIn('502', rows['ada']['error'])
+        self.assertEqual(rows['bob']['error'], 'ConnectionError')
+        self.assertEqual(rows['cy'], crawl('cy'))
+
+
+class CrawlProfileTestCase(TestCase):
+    def test_merges_profiles(self):
+        profiles = {'github': {'stars': 1}, 'bitbucket': None}
+        with mock.patch.object(bulk, 'build_profiles', return_value=profiles):
+            row = bulk.crawl_profile('ada')
+        self.assertEqual(row['username'], 'ada')
+        self.assertEqual(row['profile']['stars'], 1)
+
+        profiles = {'github': None, 'bitbucket': None}
+        with mock.patch.object(bulk, 'build_profiles', return_value=profiles):
+            self.assertEqual(bulk.crawl_profile('ada'), {'username': 'ada', 'profile': None})
+
+
+class RatePacerTestCase(TestCase):
+    def test_spaces_starts(self):
+        pacer = bulk.RatePacer(rate_budget=3600, profile_cost=10)
+        self.assertEqual(pacer.spacing, 10)
+        with mock.patch.object(bulk.time, 'sleep') as mock_sleep:
+            with mock.patch.object(bulk.time, 'monotonic', return_value=1000):
+                pacer._next_start = 1000
+                pacer.wait()
+                pacer.wait()
+                pacer.pause(30)
+                pacer.wait()
+        self.assertEqual([call[0][0] for call in mock_sleep.call_args_list], [0, 10, 30])
+
+
+@skipIf(bulk.pyarrow is None, 'pyarrow is not installed')
+class ParquetWriterTestCase(TestCase):
+    def test_writes_batches_as_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            writer = bulk.ParquetWriter(directory)
+            self.assertEqual(writer.write([crawl('ada'), {'username': 'bob', 'profile': None}]), 1)
+            self.assertEqual(writer.write([crawl('carol')]), 2)
+            table = bulk.pyarrow.parquet.read_table(directory)
+            self.assertEqual(table.num_rows, 3)
+
+            bulk.ParquetWriter(directory, state=1)
+            self.assertEqual(os.listdir(directory), ['part-00001.parquet'])
@@ -1,4 +1,4 @@
-from unittest import TestCase
+from unittest import mock, TestCase
 
 from application import helpers
 
@@ -34,3 +34,64 @@ class MergeProfilesTestCase(TestCase):
                 'topics': ['web applications'],
             }
         )
+
+
+class SummarizeOrganizationTestCase(TestCase):
+    def test_returns_nothing_without_crawl(self):
+        self.assertEqual(helpers.summarize_organization(None), (None, {}))
+
+    def test_counts_shared_repositories_once(self):
+        crawl = {
+            'members': {
+                'ada': {'followers': 3, 'following': 1, 'starred': 2},
+                'bob': {'followers': 4, 'following': 0, 'starred': 0},
+            },
+            'repositories': {
+                'org/shared': {
+                    'owner': 'org',
+                    'fork': False,
+                    'stars': 10,
+                    'issues': 2,
+                    'watchers': 5,
+                    'languages': ['Python'],
+                    'topics': ['web'],
+                    'commits': {'ada': 7, 'bob': 3},
+                },
+                'ada/fork': {
+                    'owner': 'ada',
+                    'fork': True,
+                    'stars': 1,
+                    'issues': 0,
+                    'watchers': 1,
+                    'languages': ['C'],
+                    'topics': [],
+                    'commits': {},
+                },
+            },
+            'complete': True,
+        }
+
+        totals, members = helpers.summarize_organization(crawl)
+        self.assertEqual(totals['repositories'], {'original': 1, 'forked': 1})
+        self.assertEqual(totals['stars'], 11)
+        self.assertEqual(totals['commits'], 10)
+        self.assertEqual(totals['followers'], 7)
+        self.assertEqual(sorted(totals['languages']), ['C', 'Python'])
+        self.assertEqual(
+            members['ada'],
+            {
+                'followers': 3,
+                'following': 1,
+                'starred': 2,
+                'repositories': {'original': 0, 'forked': 1},
+                'stars': 1,
+                'issues': 0,
+                'watchers': 1,
+                'commits': 7,
+                'languages': mock.ANY,
+                'topics': ['web'],
+            }
+        )
+        self.assertEqual(sorted(members['ada']['languages']), ['C', 'Python'])
+        self.assertEqual(members['bob']['commits'], 3)
+        self.assertEqual(members['bob']['repositories'], {'original': 0, 'forked': 0})
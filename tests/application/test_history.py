@@ -0,0 +1,90 @@
+import os
+import tempfile
+from unittest import mock, TestCase
+
+from application import history
+
+
+def make_profile(stars, commits=0):
+    return {'stars': stars, 'commits': commits, 'repositories': {'original': 2, 'forked': 1}}
+
+
+class EncodingTestCase(TestCase):
+    def test_round_trips_values(self):
+        values = [0, 1, -1, 63, -64, 300, 2 ** 62, -2 ** 62]
+        self.assertEqual(history._decode(history._encode(values)), values)
+        self.assertEqual(len(history._encode([0, 1, -1, 63])), 4)
+
+
+class HistoryStoreTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = history.HistoryStore(
+            os.path.join(directory.name, 'history.sqlite3'),
+            min_interval=10,
+            keyframe_interval=4,
+            raw_retention=1000,
+            downsample_interval=100,
+        )
+
+    def test_reads_ranges_across_keyframes(self):
+        for i in range(10):
+            self.assertTrue(self.store.record('key', make_profile(i * 3, 50 - i), 100 + i * 10))
+
+        points = self.store.get_range('key', 135, 165)
+        self.assertEqual([timestamp for timestamp, _ in points], [140, 150, 160])
+        self.assertEqual(points[0][1]['stars'], 12)
+        self.assertEqual(points[-1][1]['commits'], 44)
+        self.assertEqual(points[-1][1]['original'], 2)
+        self.assertEqual(len(self.store.get_range('key')), 10)
+        self.assertEqual(self.store.get_range('other'), [])
+
+        keyframes = self.store._connect().execute(
+            'SELECT timestamp FROM points WHERE keyframe = 1 ORDER BY timestamp'
+        ).fetchall()
+        self.assertEqual(keyframes, [(100,), (140,), (180,)])
+
+    def test_drops_points_too_close_together(self):
+        self.assertTrue(self.store.record('key', make_profile(1), 100))
+        self.assertFalse(self.store.record('key', make_profile(2), 105))
+        self.assertFalse(self.store.record('key', make_profile(2), 90))
+        self.assertEqual(self.store.get_range('key'), [(100, mock.ANY)])
+
+    def test_downsamples_old_points(self):
+        for i in range(30):
+            self.store.record('key', make_profile(i), 1000 + i * 40)
+        self.store.record('key', make_profile(100), 2500)
+
+        points = self.store.get_range('key')
+        timestamps = [timestamp for timestamp, _ in points]
+        # the last point of each 100s bucket before 1500, then every point
+        self.assertEqual(
+            timestamps,
+            [1080, 1160, 1280, 1360, 1480] + list(range(1520, 2161, 40)) + [2500]
+        )
+        self.assertEqual(points[0][1]['stars'], 2)
+        self.assertEqual(dict(points)[1480]['stars'], 12)
+        self.assertEqual(dict(points)[1520]['stars'], 13)
+        self.assertEqual(points[-1][1]['stars'], 100)
+        self.assertEqual(
+            [timestamp for timestamp, _ in self.store.get_range('key', 1100, 1600)],
+            [1160, 1280, 1360, 1480, 1520, 1560, 1600]
+        )
+
+
+class RecordProfilesTestCase(TestCase):
+    def test_records_merged_profiles(self):
+        store = mock.Mock()
+        with mock.patch.object(history, 'get_history_store', return_value=store):
+            history.record_profiles('gh', 'bb', {'github': {'stars': 1}, 'bitbucket': None}, 100)
+            history.record_profiles('gh', 'bb', {'github': None, 'bitbucket': None}, 200)
+
+        store.record.assert_called_once_with('["gh", "bb"]', mock.ANY, 100)
+        self.assertEqual(store.record.call_args[0][1]['stars'], 1)
+
+    def test_skips_when_disabled(self):
+        with mock.patch.dict(history.config, {'history_path': ''}):
+            history.record_profiles('gh', 'bb', {'github': {'stars': 1}, 'bitbucket': None})
+            self.assertEqual(history.get_history('gh', 'bb'), [])
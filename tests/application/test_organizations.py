@@ -0,0 +1,150 @@
+from contextlib import ExitStack
+from unittest import mock, skipIf, TestCase
+
+from application import aggregation, organizations
+from clients import BitBucketClient, GithubClient, exceptions
+
+
+class GetOrganizationProfileTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        organizations.organization_cache.clear()
+        organizations.organization_index.clear()
+
+    def test_builds_and_caches_profile(self):
+        profile = {
+            'totals': {'repositories': {'original': 4, 'forked': 1}},
+            'members': {'Ada': {}},
+        }
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(
+                    organizations,
+                    'build_organization_profile',
+                    return_value=profile
+                ),
+                mock.patch.object(organizations.time, 'time', return_value=100),
+                mock.patch.object(organizations.admission_controller, 'admit'),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            first = organizations.get_organization_profile('gh_org', 'bb_team')
+            second = organizations.get_organization_profile('gh_org', 'bb_team')
+
+            organizations.build_organization_profile.assert_called_once_with(
+                'gh_org',
+                'bb_team'
+            )
+            organizations.admission_controller.admit.assert_called_once_with(mock.ANY)
+            self.assertEqual(organizations.profile_costs.get(('gh_org', 'bb_team')), 5)
+            self.assertEqual(
+                organizations.organization_index.get('ada'),
+                [('gh_org', 'bb_team')]
+            )
+            self.assertEqual(organizations.invalidate_cached_organizations('GH_ORG'), 1)
+            self.assertIsNone(organizations.organization_cache.get(('gh_org', 'bb_team')))
+        self.assertEqual(first, (profile, 100))
+        self.assertEqual(second, (profile, 100))
+
+
+class BuildOrganizationProfileTestCase(TestCase):
+    def test_merges_providers_and_members(self):
+        github_crawl = {
+            'members': {'ada': {'followers': 1, 'following': 0, 'starred': 0}},
+            'repositories': {
+                'org/repo': {
+                    'owner': 'org',
+                    'fork': False,
+                    'stars': 2,
+                    'issues': 0,
+                    'watchers': 0,
+                    'languages': [],
+                    'topics': [],
+                    'commits': {'ada': 5},
+                },
+            },
+            'complete': True,
+        }
+        bitbucket_crawl = {
+            'members': {'ada': {'followers': 2, 'following': 1}},
+            'repositories': {},
+            'complete': False,
+        }
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(organizations, '_crawl_github', return_value=github_crawl),
+                mock.patch.object(
+                    organizations,
+                    '_crawl_bitbucket',
+                    return_value=bitbucket_crawl
+                ),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            profile = organizations.build_organization_profile('gh_org', 'bb_team')
+
+            budget = organizations._crawl_github.call_args[0][1]
+            organizations._crawl_bitbucket.assert_called_once_with('bb_team', budget)
+
+        self.assertFalse(profile['complete'])
+        self.assertEqual(profile['totals']['commits'], 5)
+        self.assertEqual(profile['totals']['followers'], 3)
+        self.assertEqual(list(profile['members']), ['ada'])
+        self.assertEqual(profile['members']['ada']['followers'], 3)
+        self.assertEqual(profile['members']['ada']['commits'], 5)
+
+    def test_reports_crawls_exhausting_budget_while_listing(self):
+        error = exceptions.BudgetExhaustedError()
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(GithubClient, 'get_organization', side_effect=error),
+                mock.patch.object(BitBucketClient, 'get_team', return_value=None),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            profile = organizations.build_organization_profile('gh_org', 'bb_team')
+
+        self.assertFalse(profile['complete'])
+        self.assertEqual(profile['members'], {})
+
+    def test_ignores_unknown_accounts(self):
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(organizations, '_crawl_github', return_value=None),
+                mock.patch.object(organizations, '_crawl_bitbucket', return_value=None),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            profile = organizations.build_organization_profile('gh_org', 'bb_team')
+
+        self.assertTrue(profile['complete'])
+        self.assertEqual(profile['members'], {})
+
+
+@skipIf(aggregation.numpy is None, 'numpy is not installed')
+class MergeMembersTestCase(TestCase):
+    def test_merges_like_merge_profiles(self):
+        github_members = {
+            'ada': {
+                'repositories': {'original': 3, 'forked': 1},
+                'stars': 10,
+                'commits': 100,
+                'languages': ['Python', 'C'],
+                'topics': ['web'],
+            },
+            'bob': {'repositories': 2, 'commits': 30, 'languages': ['Python']},
+            'cy': None,
+        }
+        bitbucket_members = {
+            'ada': {'repositories': 1, 'stars': 50, 'languages': ['Go']},
+            'dee': {'followers': 1},
+        }
+        merged = organizations.merge_members(github_members, bitbucket_members)
+        with mock.patch.object(aggregation, 'numpy', None):
+            expected = organizations.merge_members(github_members, bitbucket_members)
+        self.assertEqual(merged, expected)
+        self.assertEqual(sorted(merged), ['ada', 'bob', 'cy', 'dee'])
@@ -0,0 +1,106 @@
+import time
+from unittest import mock, TestCase
+
+from application import prewarm
+from cache import TTLCache
+from clients import exceptions
+
+
+class RequestCounterTestCase(TestCase):
+    def test_most_common_orders_by_frequency(self):
+        counter = prewarm.RequestCounter(half_life=3600, max_keys=10)
+        for key in ('a', 'b', 'b', 'c', 'c', 'c'):
+            counter.record(key)
+        self.assertEqual(counter.most_common(2), ['c', 'b'])
+
+    def test_old_requests_decay(self):
+        counter = prewarm.RequestCounter(half_life=60, max_keys=10)
+        with mock.patch.object(prewarm.time, 'time', return_value=0):
+            for _ in range(3):
+                counter.record('old')
+        with mock.patch.object(prewarm.time, 'time', return_value=600):
+            counter.record('new')
+            self.assertEqual(counter.most_common(2), ['new', 'old'])
+
+    def test_reads_clock_under_lock(self):
+        counter = prewarm.RequestCounter(half_life=60, max_keys=10)
+
+        def locked_time():
+            self.assertTrue(counter._lock.locked())
+            return 100
+
+        with mock.patch.object(prewarm.time, 'time', side_effect=locked_time):
+            counter.record('key')
+            counter.most_common(1)
+
+    def test_prunes_coldest_keys(self):
+        counter = prewarm.RequestCounter(half_life=3600, max_keys=10)
+        for key in range(10):
+            counter.record('hot')
+            counter.record(key)
+        counter.record('overflow')
+        self.assertLessEqual(len(counter), 10)
+        self.assertIn('hot', counter.most_common(1))
+
+
+class ProfileRefresherTestCase(TestCase):
+    def _make_refresher(self, cache, counter, build, **kwargs):
+        options = {
+            'interval': 60,
+            'lead_time': 300,
+            'rate_budget': 6000,
+            'budget_share': 0.5,
+            'profile_cost': 50,
+        }
+        options.update(kwargs)
+        return prewarm.ProfileRefresher(cache, counter, build, **options)
+
+    def test_refreshes_per_round(self):
+        refresher = self._make_refresher(None, None, None)
+        self.assertEqual(refresher.refreshes_per_round, 1)
+
+    def test_refreshes_hottest_expiring_profiles(self):
+        cache = TTLCache(ttl=3600)
+        counter = prewarm.RequestCounter(half_life=3600, max_keys=10)
+        for key in (('a',), ('b',), ('b',), ('c',), ('c',), ('c',)):
+            counter.record(key)
+        cache.set(('c',), 'fresh')
+        cache.set(('b',), 'stale', ttl=10)
+        build = mock.Mock(side_effect=lambda name: name.upper())
+
+        refresher = self._make_refresher(cache, counter, build, budget_share=1)
+        self.assertEqual(refresher.refresh(), [('b',), ('a',)])
+        self.assertEqual(cache.get(('a',)), 'A')
+        self.assertEqual(cache.get(('b',)), 'B')
+        self.assertEqual(cache.get(('c',)), 'fresh')
+
+    def test_stays_within_budget(self):
+        cache = TTLCache(ttl=3600)
+        counter = prewarm.RequestCounter(half_life=3600, max_keys=10)
+        for key in range(5):
+            counter.record((key,))
+        build = mock.Mock()
+
+        refresher = self._make_refresher(cache, counter, build)
+        self.assertEqual(len(refresher.refresh()), 1)
+        build.assert_called_once()
+
+    def test_stops_on_rate_limit(self):
+        cache = TTLCache(ttl=3600)
+        counter = prewarm.RequestCounter(half_life=3600, max_keys=10)
+        for key in range(5):
+            counter.record((key,))
+        build = mock.Mock(side_effect=exceptions.RateLimitError())
+
+        refresher = self._make_refresher(cache, counter, build, budget_share=1)
+        self.assertEqual(refresher.refresh(), [])
+        build.assert_called_once()
+
+    def test_run_refreshes_until_stopped(self):
+        refresher = self._make_refresher(None, None, None, interval=0.01)
+        with mock.patch.object(refresher, 'refresh') as mock_refresh:
+            refresher.start()
+            time.sleep(0.05)
+            refresher.stop()
+            refresher.join()
+        self.assertTrue(mock_refresh.called)
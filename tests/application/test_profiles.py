@@ -0,0 +1,289 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from unittest import mock, TestCase
+
+from application import profiles
+from cache import CompactRecord
+from clients import BitBucketClient, GithubClient, exceptions
+
+
+class GetProfilesTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        profiles.profile_cache.clear()
+
+    def test_builds_and_caches_missing_profiles(self):
+        built_profiles = {
+            'github': {'stars': 3, 'repositories': {'original': 2}, 'languages': ['Go']},
+            'bitbucket': None,
+        }
+        with mock.patch.object(profiles, 'build_profiles', return_value=built_profiles) as mock_build:
+            with mock.patch.object(profiles.time, 'time', return_value=100):
+                first = profiles.get_profiles('gh_user', 'bb_user', True)
+                second = profiles.get_profiles('gh_user', 'bb_user', True)
+                entry = profiles.profile_cache.get(('gh_user', 'bb_user', True))
+
+        mock_build.assert_called_once_with('gh_user', 'bb_user', True)
+        self.assertEqual(first, (built_profiles, 100))
+        self.assertEqual(second, (built_profiles, 100))
+        self.assertIsInstance(entry['profiles']['github'], CompactRecord)
+
+    def test_records_request(self):
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(profiles, 'build_profiles'),
+                mock.patch.object(profiles.request_counter, 'record'),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            profiles.get_profiles('gh_user', 'bb_user', False)
+            profiles.request_counter.record.assert_called_once_with(
+                ('gh_user', 'bb_user', False)
+            )
+
+
+    def test_admits_cold_builds_by_estimated_cost(self):
+        built = {'github': {'repositories': {'original': 2, 'forked': 1}}, 'bitbucket': None}
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(profiles, 'build_profiles', return_value=built),
+                mock.patch.object(profiles.admission_controller, 'admit'),
+                mock.patch.object(profiles, 'estimate_cost', return_value=12),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            profiles.get_profiles('gh_user', 'bb_user', True)
+            profiles.get_profiles('gh_user', 'bb_user', True)
+            profiles.admission_controller.admit.assert_called_once_with(12)
+            self.assertEqual(profiles.profile_costs.get(('gh_user', 'bb_user', True)), 3)
+
+
+class BuildCacheEntryTestCase(TestCase):
+    def test_records_history(self):
+        built_profiles = {'github': {'stars': 1}, 'bitbucket': None}
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(profiles, 'build_profiles', return_value=built_profiles),
+                mock.patch.object(profiles, 'record_profiles'),
+                mock.patch.object(profiles.time, 'time', return_value=100),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            entry = profiles._build_cache_entry('gh_user', 'bb_user', False)
+            profiles.record_profiles.assert_called_once_with(
+                'gh_user', 'bb_user', built_profiles, 100
+            )
+        self.assertEqual(entry['fetched_at'], 100)
+
+
+class EstimateCostTestCase(TestCase):
+    def test_uses_last_repository_count(self):
+        profiles.profile_costs.set(('a', 'b', None), 7)
+        self.assertEqual(profiles.estimate_cost(('a', 'b', None)), 7)
+
+    def test_defaults_for_unknown_profiles(self):
+        with mock.patch.dict(profiles.config, {'admission_default_cost': '50'}):
+            self.assertEqual(profiles.estimate_cost(('unknown', 'unknown', None)), 50)
+
+
+class CountRepositoriesTestCase(TestCase):
+    def test_counts_all_providers(self):
+        data = {
+            'github': {'repositories': {'original': 2, 'forked': 1}},
+            'bitbucket': {'repositories': 4},
+        }
+        self.assertEqual(profiles.count_repositories(data), 7)
+        self.assertEqual(profiles.count_repositories({'github': None, 'bitbucket': None}), 0)
+
+
+class GetMaxAgeTestCase(TestCase):
+    def test_returns_remaining_freshness(self):
+        with mock.patch.object(profiles.profile_cache, 'ttl', 3600):
+            with mock.patch.object(profiles.time, 'time', return_value=1000):
+                self.assertEqual(profiles.get_max_age(400), 3000)
+                self.assertEqual(profiles.get_max_age(-5000), 0)
+
+
+class BuildProfilesTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        profiles.unknown_accounts.clear()
+        profiles.bitbucket_account_kinds.clear()
+
+    def test_retrieves_profiles(self):
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(GithubClient, 'get_profile'),
+                mock.patch.object(BitBucketClient, 'get_profile'),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            data = profiles.build_profiles('gh_user', 'bb_user', True)
+            GithubClient.get_profile.assert_called_once_with('gh_user')
+            BitBucketClient.get_profile.assert_called_once_with('bb_user', is_team=True)
+            self.assertEqual(
+                data,
+                {
+                    'github': GithubClient.get_profile.return_value,
+                    'bitbucket': BitBucketClient.get_profile.return_value,
+                }
+            )
+
+    def test_ignores_missing_github_profile(self):
+        error = exceptions.UnknownProfileError()
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(GithubClient, 'get_profile', side_effect=error),
+                mock.patch.object(BitBucketClient, 'get_profile'),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            data = profiles.build_profiles('username', 'username', True)
+            self.assertEqual(
+                data,
+                {
+                    'github': None,
+                    'bitbucket': BitBucketClient.get_profile.return_value,
+                }
+            )
+
+    def test_ignores_missing_bitbucket_profile(self):
+        error = exceptions.UnknownProfileError()
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(GithubClient, 'get_profile'),
+                mock.patch.object(BitBucketClient, 'get_profile', side_effect=error),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            data = profiles.build_profiles('username', 'username', True)
+            self.assertEqual(
+                data,
+                {
+                    'github': GithubClient.get_profile.return_value,
+                    'bitbucket': None,
+                }
+            )
+
+    def test_raises_error_on_github_rate_limit(self):
+        error = exceptions.RateLimitError('this is a test')
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(GithubClient, 'get_profile', side_effect=error),
+                mock.patch.object(BitBucketClient, 'get_profile'),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            with self.assertRaises(exceptions.RateLimitError):
+                profiles.build_profiles('username', 'username', True)
+            BitBucketClient.get_profile.assert_not_called()
+
+    def test_raises_error_on_invalid_github_credentials(self):
+        error = exceptions.InvalidCredentialsError('this is a test')
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(GithubClient, 'get_profile', side_effect=error),
+                mock.patch.object(BitBucketClient, 'get_profile'),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            with self.assertRaises(exceptions.InvalidCredentialsError):
+                profiles.build_profiles('username', 'username', True)
+            BitBucketClient.get_profile.assert_not_called()
+
+    def test_raises_error_on_bitbucket_rate_limit(self):
+        error = exceptions.RateLimitError('this is a test')
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(GithubClient, 'get_profile'),
+                mock.patch.object(BitBucketClient, 'get_profile', side_effect=error),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            with self.assertRaises(exceptions.RateLimitError):
+                profiles.build_profiles('username', 'username', True)
+
+    def test_runs_crawls_in_pool_when_configured(self):
+        pool = ThreadPoolExecutor(max_workers=2)
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(profiles, 'get_crawl_pool', return_value=pool),
+                mock.patch.object(GithubClient, 'get_profile', return_value={'stars': 1}),
+                mock.patch.object(BitBucketClient, 'get_profile', return_value={'commits': 2}),
+                mock.patch.object(pool, 'submit', wraps=pool.submit),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            data = profiles.build_profiles('gh_user', 'bb_user', False)
+            pool.submit.assert_any_call(profiles._fetch_github_profile, 'gh_user')
+            pool.submit.assert_any_call(profiles._fetch_bitbucket_profile, 'bb_user', (False,))
+            self.assertEqual(data, {'github': {'stars': 1}, 'bitbucket': {'commits': 2}})
+        pool.shutdown()
+
+    def test_crawl_functions_can_be_sent_to_worker_processes(self):
+        for function in (profiles._fetch_github_profile, profiles._fetch_bitbucket_profile):
+            self.assertIs(pickle.loads(pickle.dumps(function)), function)
+
+    def test_remembers_unknown_accounts(self):
+        error = exceptions.UnknownProfileError()
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(GithubClient, 'get_profile', side_effect=error),
+                mock.patch.object(BitBucketClient, 'get_profile', side_effect=error),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            profiles.build_profiles('gh_user', 'bb_user', True)
+            data = profiles.build_profiles('gh_user', 'bb_user', True)
+            GithubClient.get_profile.assert_called_once_with('gh_user')
+            BitBucketClient.get_profile.assert_called_once_with('bb_user', is_team=True)
+            self.assertEqual(data, {'github': None, 'bitbucket': None})
+
+    def test_seeks_bitbucket_team_then_user(self):
+        error = exceptions.UnknownProfileError()
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(GithubClient, 'get_profile'),
+                mock.patch.object(
+                    BitBucketClient,
+                    'get_profile',
+                    side_effect=[error, {'commits': 1}, {'commits': 2}]
+                ),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            first = profiles.build_profiles('gh_user', 'bb_user')
+            second = profiles.build_profiles('gh_user', 'bb_user')
+            self.assertEqual(
+                BitBucketClient.get_profile.call_args_list,
+                [
+                    mock.call('bb_user', is_team=True),
+                    mock.call('bb_user', is_team=False),
+                    mock.call('bb_user', is_team=False),
+                ]
+            )
+            self.assertEqual(first['bitbucket'], {'commits': 1})
+            self.assertEqual(second['bitbucket'], {'commits': 2})
+            self.assertFalse(profiles.bitbucket_account_kinds.get('bb_user'))
+
+
+class RunInlineTestCase(TestCase):
+    def test_wraps_result(self):
+        self.assertEqual(profiles._run_inline(abs, -2).result(), 2)
+
+    def test_wraps_error(self):
+        future = profiles._run_inline(int, 'not a number')
+        self.assertIsInstance(future.exception(), ValueError)
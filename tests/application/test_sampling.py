@@ -0,0 +1,46 @@
+import threading
+import time
+from unittest import TestCase
+
+from application import sampling
+
+
+def spin(stopped):
+    while not stopped.is_set():
+        sum(range(100))
+
+
+class SamplingProfilerTestCase(TestCase):
+    def start_spinning(self):
+        stopped = threading.Event()
+        thread = threading.Thread(target=spin, args=(stopped,))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(stopped.set)
+        return thread
+
+    def test_samples_given_threads(self):
+        thread = self.start_spinning()
+        profiler = sampling.SamplingProfiler(interval=0.001, thread_ids=[thread.ident])
+        profiler.start()
+        time.sleep(0.1)
+        stacks = profiler.stop()
+
+        lines = stacks.splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            self.assertGreater(int(count), 0)
+            self.assertTrue(stack.startswith('threading._bootstrap;'))
+        self.assertIn('tests.application.test_sampling.spin', stacks)
+        self.assertNotIn('sampling.SamplingProfiler.run', stacks)
+
+    def test_profile_process_ignores_caller(self):
+        self.start_spinning()
+        stacks = sampling.profile_process(0.05, interval=0.001)
+        self.assertIn('tests.application.test_sampling.spin', stacks)
+        self.assertNotIn('test_profile_process_ignores_caller', stacks)
+
+    def test_profile_process_runs_one_profile_at_a_time(self):
+        with sampling._profile_lock:
+            self.assertIsNone(sampling.profile_process(0.01))
@@ -0,0 +1,134 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from unittest import TestCase
+from urllib.request import urlopen
+
+from application import server
+
+
+SERVER_SCRIPT = '''
+import os
+import sys
+import time
+
+from application.server import PreforkServer
+
+
+def app(environ, start_response):
+    time.sleep(float(environ['QUERY_STRING'] or 0))
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'done']
+
+
+prefork_server = PreforkServer(
+    app,
+    host='127.0.0.1',
+    port=0,
+    workers=2,
+    threads=2,
+    graceful_timeout=5,
+    post_fork=[lambda index: print('started', index, os.getpid(), flush=True)],
+    worker_exit=[lambda: print('drained', flush=True)],
+)
+print(prefork_server.bind()[1], flush=True)
+prefork_server.run()
+'''
+
+
+class PreforkServerTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.process = subprocess.Popen(
+            [sys.executable, '-c', SERVER_SCRIPT],
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        self.url = 'http://127.0.0.1:{}/'.format(self.process.stdout.readline().strip())
+
+    def tearDown(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process.stdout.close()
+        return super().tearDown()
+
+    def _get(self, query=''):
+        for _ in range(50):
+            try:
+                with urlopen(self.url + '?' + query, timeout=5) as response:
+                    return response.read()
+            except ConnectionError:
+                time.sleep(0.1)
+
+    def test_serves_requests(self):
+        self.assertEqual(self._get(), b'done')
+
+    def test_drains_in_flight_requests_on_sigterm(self):
+        self._get()
+        responses = []
+        request = threading.Thread(target=lambda: responses.append(self._get('0.5')))
+        request.start()
+        time.sleep(0.2)
+        os.kill(self.process.pid, signal.SIGTERM)
+        request.join()
+
+        self.assertEqual(responses, [b'done'])
+        self.assertEqual(self.process.wait(timeout=5), 0)
+        self.assertEqual(self.process.stdout.read().count('drained'), 2)
+
+    def test_replaces_dead_workers(self):
+        self._get()
+        worker_pids = subprocess.check_output(
+            ['pgrep', '-P', str(self.process.pid)],
+            universal_newlines=True,
+        ).split()
+        os.kill(int(worker_pids[0]), signal.SIGKILL)
+        time.sleep(0.5)
+        self.assertEqual(self._get(), b'done')
+        replaced_pids = subprocess.check_output(
+            ['pgrep', '-P', str(self.process.pid)],
+            universal_newlines=True,
+        ).split()
+        self.assertEqual(len(replaced_pids), 2)
+        self.assertNotIn(worker_pids[0], replaced_pids)
+
+        os.kill(self.process.pid, signal.SIGTERM)
+        self.process.wait(timeout=5)
+        started = [
+            line.split()[1:]
+            for line in self.process.stdout.read().splitlines()
+            if line.startswith('started')
+        ]
+        indexes = {pid: index for index, pid in started}
+        self.assertEqual(sorted(indexes[pid] for pid in worker_pids), ['0', '1'])
+        self.assertEqual(started[-1][0], indexes[worker_pids[0]])
+
+
+class ThreadPoolWSGIServerTestCase(TestCase):
+    def test_handles_requests_on_thread_pool(self):
+        def app(environ, start_response):
+            start_response('204 No Content', [])
+            return []
+
+        wsgi_server = server.ThreadPoolWSGIServer(
+            '127.0.0.1',
+            0,
+            app,
+            threads=1,
+            fd=None,
+        )
+        thread = threading.Thread(target=wsgi_server.serve_forever)
+        thread.start()
+        try:
+            url = 'http://127.0.0.1:{}/'.format(wsgi_server.server_address[1])
+            with urlopen(url, timeout=5) as response:
+                self.assertEqual(response.status, 204)
+        finally:
+            wsgi_server.shutdown()
+            wsgi_server.server_close()
+            wsgi_server.executor.shutdown()
+            thread.join()
@@ -0,0 +1,158 @@
+import hashlib
+import hmac
+from unittest import mock, TestCase
+
+from application import organizations, profiles, webhooks
+from cache import RepositoryCache, TTLCache
+
+
+def build_profiles(github_username, bitbucket_username, is_team=None):
+    return {
+        'github': {'stars': 5, 'watchers': 5, 'starred': 2, 'commits': 10},
+        'bitbucket': {'commits': 3},
+    }
+
+
+def make_repository(full_name):
+    return {'full_name': full_name, 'owner': {'login': full_name.split('/')[0]}}
+
+
+class VerifySignatureTestCase(TestCase):
+    def test_verifies_hmac(self):
+        digest = hmac.new(b'secret', b'{}', hashlib.sha256).hexdigest()
+        self.assertTrue(webhooks.verify_signature('secret', b'{}', 'sha256=' + digest))
+        self.assertFalse(webhooks.verify_signature('other', b'{}', 'sha256=' + digest))
+        self.assertFalse(webhooks.verify_signature('secret', b'{ }', 'sha256=' + digest))
+        self.assertFalse(webhooks.verify_signature('secret', b'{}', digest))
+        self.assertFalse(webhooks.verify_signature('secret', b'{}', None))
+        self.assertFalse(webhooks.verify_signature('', b'{}', 'sha256=' + digest))
+
+
+class HandleEventTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        profiles.profile_cache.clear()
+        profiles.profile_index.clear()
+        webhooks.handled_deliveries.clear()
+        organizations.organization_cache.clear()
+        organizations.organization_index.clear()
+        self.repository_cache = RepositoryCache(TTLCache(ttl=60))
+        patcher = mock.patch.object(webhooks, 'repository_cache', self.repository_cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with mock.patch.object(profiles, 'build_profiles', side_effect=build_profiles):
+            profiles.get_profiles('Ada', 'ada_bb', None)
+            profiles.get_profiles('bob', 'bob', None)
+
+    def get_cached_profile(self, key, provider):
+        return profiles.unpack_record(profiles.profile_cache.get(key)['profiles'][provider])
+
+    def test_counts_stars_in_place(self):
+        expires_at = profiles.profile_cache.get_entry(('Ada', 'ada_bb', None))[1]
+        result = webhooks.handle_github_event('star', {
+            'action': 'created',
+            'repository': make_repository('ada/repo'),
+            'sender': {'login': 'bob'},
+        })
+        self.assertEqual(result, {'updated': 2, 'invalidated': 0})
+        ada = self.get_cached_profile(('Ada', 'ada_bb', None), 'github')
+        self.assertEqual((ada['stars'], ada['watchers'], ada['starred']), (6, 6, 2))
+        self.assertEqual(self.get_cached_profile(('bob', 'bob', None), 'github')['starred'], 3)
+        self.assertAlmostEqual(
+            profiles.profile_cache.get_entry(('Ada', 'ada_bb', None))[1],
+            expires_at,
+            places=2
+        )
+
+        webhooks.handle_github_event('star', {
+            'action': 'deleted',
+            'repository': make_repository('ada/repo'),
+            'sender': {'login': 'bob'},
+        })
+        self.assertEqual(self.get_cached_profile(('Ada', 'ada_bb', None), 'github')['stars'], 5)
+
+    def test_skips_redelivered_events(self):
+        payload = {
+            'action': 'created',
+            'repository': make_repository('ada/repo'),
+            'sender': {'login': 'bob'},
+        }
+        first = webhooks.handle_github_event('star', payload, 'delivery-1')
+        second = webhooks.handle_github_event('star', payload, 'delivery-1')
+        self.assertEqual(first, {'updated': 2, 'invalidated': 0})
+        self.assertEqual(second, {'updated': 0, 'invalidated': 0})
+        self.assertEqual(self.get_cached_profile(('Ada', 'ada_bb', None), 'github')['stars'], 6)
+
+    def test_releases_delivery_when_handling_fails(self):
+        payload = {
+            'action': 'created',
+            'repository': make_repository('ada/repo'),
+            'sender': {'login': 'bob'},
+        }
+        with mock.patch.object(webhooks, '_handle_github_event', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                webhooks.handle_github_event('star', payload, 'delivery-1')
+        result = webhooks.handle_github_event('star', payload, 'delivery-1')
+        self.assertEqual(result, {'updated': 2, 'invalidated': 0})
+
+    def test_invalidates_pushed_repository(self):
+        self.repository_cache.set('github', ('ada/repo', 'ada'), 'v1', {'commits': 1})
+        self.repository_cache.set('github_contributors', 'ada/repo', 'v1', {'ada': 1})
+        result = webhooks.handle_github_event('push', {'repository': make_repository('ada/repo')})
+        self.assertEqual(result, {'updated': 0, 'invalidated': 1})
+        self.assertIsNone(profiles.profile_cache.get(('Ada', 'ada_bb', None)))
+        self.assertIsNotNone(profiles.profile_cache.get(('bob', 'bob', None)))
+        self.assertIsNone(self.repository_cache.get('github', ('ada/repo', 'ada'), 'v1'))
+        self.assertIsNone(self.repository_cache.get('github_contributors', 'ada/repo', 'v1'))
+
+    def test_invalidates_organizations_of_owner(self):
+        organization_profile = {
+            'totals': {'repositories': {}},
+            'members': {'Ada': {}},
+            'complete': True,
+        }
+        with mock.patch.object(
+            organizations,
+            'build_organization_profile',
+            return_value=organization_profile
+        ):
+            organizations.get_organization_profile('acme', 'acme_bb')
+            organizations.get_organization_profile('other', None)
+
+        result = webhooks.handle_github_event('push', {'repository': make_repository('ada/repo')})
+        self.assertEqual(result, {'updated': 0, 'invalidated': 3})
+        self.assertIsNone(organizations.organization_cache.get(('acme', 'acme_bb')))
+        self.assertIsNone(organizations.organization_cache.get(('other', None)))
+
+        organizations.organization_cache.set(('acme', 'acme_bb'), {})
+        webhooks.handle_bitbucket_event('repo:push', {
+            'repository': {'uuid': '{uuid}', 'owner': {'username': 'acme_bb'}},
+        })
+        self.assertIsNone(organizations.organization_cache.get(('acme', 'acme_bb')))
+
+    def test_invalidates_forking_account(self):
+        result = webhooks.handle_github_event('fork', {
+            'repository': make_repository('ada/repo'),
+            'forkee': make_repository('bob/repo'),
+        })
+        self.assertEqual(result, {'updated': 0, 'invalidated': 2})
+
+    def test_ignores_unrelated_events(self):
+        self.assertEqual(
+            webhooks.handle_github_event('ping', {'zen': 'Keep it logically awesome.'}),
+            {'updated': 0, 'invalidated': 0}
+        )
+        self.assertEqual(
+            webhooks.handle_github_event('issues', {'repository': make_repository('ada/repo')}),
+            {'updated': 0, 'invalidated': 0}
+        )
+
+    def test_invalidates_bitbucket_repository(self):
+        self.repository_cache.set('bitbucket', '{uuid}', 'v1', {'commits': 1})
+        result = webhooks.handle_bitbucket_event('repo:fork', {
+            'repository': {'uuid': '{uuid}', 'owner': {'username': 'ada_bb'}},
+            'fork': {'uuid': '{fork}', 'owner': {'nickname': 'bob'}},
+        })
+        self.assertEqual(result, {'updated': 0, 'invalidated': 2})
+        self.assertIsNone(self.repository_cache.get('bitbucket', '{uuid}', 'v1'))
+        self.assertIsNone(profiles.profile_cache.get(('bob', 'bob', None)))
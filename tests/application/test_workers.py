@@ -0,0 +1,34 @@
+from unittest import mock, TestCase
+
+from application import workers
+
+
+class GetCrawlPoolTestCase(TestCase):
+    def tearDown(self):
+        workers.shutdown_crawl_pool()
+        return super().tearDown()
+
+    def test_returns_none_when_disabled(self):
+        with mock.patch.dict(workers.config, {'crawl_processes': 0}):
+            self.assertIsNone(workers.get_crawl_pool())
+
+    def test_reuses_process_pool(self):
+        with mock.patch.dict(workers.config, {'crawl_processes': '2'}):
+            pool = workers.get_crawl_pool()
+            self.assertIsInstance(pool, workers.ProcessPoolExecutor)
+            self.assertIs(workers.get_crawl_pool(), pool)
+            self.assertEqual(pool.submit(abs, -3).result(), 3)
+
+    def test_shutdown_discards_pool(self):
+        with mock.patch.dict(workers.config, {'crawl_processes': 1}):
+            pool = workers.get_crawl_pool()
+            workers.shutdown_crawl_pool()
+            self.assertIsNot(workers.get_crawl_pool(), pool)
+
+    def test_replaces_pool_inherited_through_fork(self):
+        with mock.patch.dict(workers.config, {'crawl_processes': 1}):
+            pool = workers.get_crawl_pool()
+            with mock.patch.object(workers.os, 'getpid', return_value=-1):
+                self.assertIsNot(workers.get_crawl_pool(), pool)
+                workers.shutdown_crawl_pool()
+            pool.shutdown()
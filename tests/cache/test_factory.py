@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+from unittest import mock, TestCase
+
+from cache import factory
+
+
+class MakeCacheTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        factory._stores.clear()
+        self.in_process_caches = mock.patch.dict(factory.in_process_caches)
+        self.in_process_caches.start()
+
+    def tearDown(self):
+        self.in_process_caches.stop()
+        factory._stores.clear()
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def test_memory_backend(self):
+        with mock.patch.dict(factory.config, {'cache_backend': 'memory'}):
+            cache = factory.make_cache('profiles', 60)
+        self.assertIsInstance(cache, factory.TTLCache)
+        self.assertEqual(cache.ttl, 60)
+        self.assertIs(factory.in_process_caches['profiles'], cache)
+
+    def test_sqlite_backend(self):
+        settings = {
+            'cache_backend': 'sqlite',
+            'cache_path': os.path.join(self.directory, 'cache.sqlite3'),
+            'cache_l1_size': '16',
+        }
+        with mock.patch.dict(factory.config, settings):
+            cache = factory.make_cache('profiles', 60)
+            other_cache = factory.make_cache('other', 60)
+        self.assertIsInstance(cache, factory.LayeredCache)
+        self.assertIs(cache.store, other_cache.store)
+        self.assertEqual(cache.l1.max_size, 16)
+
+    def test_unknown_backend(self):
+        with mock.patch.dict(factory.config, {'cache_backend': 'floppy'}):
+            with self.assertRaises(ValueError):
+                factory.make_cache('profiles', 60)
+
+
+class StartCheckpointerTestCase(TestCase):
+    def test_disabled_without_directory(self):
+        with mock.patch.dict(factory.config, {'cache_snapshot_dir': ''}):
+            self.assertIsNone(factory.start_checkpointer())
+
+    def test_restores_and_starts(self):
+        settings = {'cache_snapshot_dir': 'snapshots', 'cache_snapshot_interval': '30'}
+        with mock.patch.dict(factory.config, settings):
+            with mock.patch.object(factory, 'Checkpointer') as mock_checkpointer:
+                with mock.patch.object(factory.atexit, 'register') as mock_register:
+                    checkpointer = factory.start_checkpointer()
+
+        mock_checkpointer.assert_called_once_with(
+            factory.in_process_caches,
+            'snapshots',
+            interval=30
+        )
+        checkpointer.restore.assert_called_once_with()
+        checkpointer.start.assert_called_once_with()
+        mock_register.assert_called_once_with(checkpointer.stop)
+
+    def test_keeps_worker_snapshots_apart(self):
+        settings = {'cache_snapshot_dir': 'snapshots', 'cache_snapshot_interval': '30'}
+        with mock.patch.dict(factory.config, settings):
+            with mock.patch.object(factory, 'Checkpointer') as mock_checkpointer:
+                with mock.patch.object(factory.atexit, 'register'):
+                    factory.start_checkpointer(1)
+
+        mock_checkpointer.assert_called_once_with(
+            factory.in_process_caches,
+            os.path.join('snapshots', 'worker-1'),
+            interval=30
+        )
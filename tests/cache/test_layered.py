@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+from unittest import mock, TestCase
+
+from cache import layered
+
+
+class SQLiteStoreTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def test_creates_private_file(self):
+        path = os.path.join(self.directory, 'private', 'cache.sqlite3')
+        layered.SQLiteStore(path)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+        self.assertEqual(os.stat(os.path.dirname(path)).st_mode & 0o777, 0o700)
+
+    def test_refuses_shared_files(self):
+        open(self.path, 'w').close()
+        os.chmod(self.path, 0o666)
+        with self.assertRaises(PermissionError):
+            layered.SQLiteStore(self.path)
+
+        os.chmod(self.path, 0o600)
+        os.chmod(self.directory, 0o1777)
+        with self.assertRaises(PermissionError):
+            layered.SQLiteStore(self.path)
+
+    def test_stores_entries(self):
+        store = layered.SQLiteStore(self.path)
+        store.set('key', {'some': 'value'}, expires_at=layered.time.time() + 60)
+        value, _ = store.get('key')
+        self.assertEqual(value, {'some': 'value'})
+
+        store.delete('key')
+        self.assertIsNone(store.get('key'))
+
+    def test_ignores_expired_entries(self):
+        store = layered.SQLiteStore(self.path)
+        store.set('key', 'value', expires_at=layered.time.time() - 1)
+        self.assertIsNone(store.get('key'))
+
+    def test_adds_missing_or_expired_entries_only(self):
+        store = layered.SQLiteStore(self.path)
+        other_store = layered.SQLiteStore(self.path)
+        self.assertTrue(store.add('key', 'first', layered.time.time() + 60))
+        self.assertFalse(other_store.add('key', 'second', layered.time.time() + 60))
+        self.assertEqual(other_store.get('key')[0], 'first')
+
+        store.set('expired', 'old', layered.time.time() - 1)
+        self.assertTrue(other_store.add('expired', 'new', layered.time.time() + 60))
+        self.assertEqual(store.get('expired')[0], 'new')
+
+    def test_clears_prefix(self):
+        store = layered.SQLiteStore(self.path)
+        expires_at = layered.time.time() + 60
+        store.set('a:1', 'value', expires_at)
+        store.set('b:1', 'value', expires_at)
+        store.clear('a:')
+        self.assertIsNone(store.get('a:1'))
+        self.assertIsNotNone(store.get('b:1'))
+
+    def test_notifies_listeners_of_writes_by_other_processes(self):
+        reader = layered.SQLiteStore(self.path, poll_interval=0)
+        writer = layered.SQLiteStore(self.path, poll_interval=0)
+        listener = mock.Mock()
+        reader.listeners.append(listener)
+
+        writer.set('mine', 'value', layered.time.time() + 60)
+        reader.sync()
+        listener.assert_not_called()
+
+        with mock.patch.object(layered.os, 'getpid', return_value=-1):
+            writer.set('theirs', 'value', layered.time.time() + 60)
+        reader.sync()
+        listener.assert_called_once_with('theirs')
+
+
+class LayeredCacheTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.store = layered.SQLiteStore(
+            os.path.join(self.directory, 'cache.sqlite3'),
+            poll_interval=0
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def test_reads_through_to_store(self):
+        writer = layered.LayeredCache('profiles', self.store, ttl=60)
+        reader = layered.LayeredCache('profiles', self.store, ttl=60)
+        writer.set(('user', None), {'stars': 1})
+
+        self.assertEqual(reader.get(('user', None)), {'stars': 1})
+        self.assertEqual(len(reader.l1), 1)
+        self.assertIn(('user', None), reader)
+
+    def test_namespaces_keys(self):
+        profiles = layered.LayeredCache('profiles', self.store, ttl=60)
+        accounts = layered.LayeredCache('accounts', self.store, ttl=60)
+        profiles.set('key', 'profile')
+        self.assertIsNone(accounts.get('key'))
+
+    def test_evicts_entries_overwritten_elsewhere(self):
+        cache = layered.LayeredCache('profiles', self.store, ttl=60)
+        other_cache = layered.LayeredCache('other', self.store, ttl=60)
+        cache.set('key', 'old')
+        other_cache.set('key', 'other')
+        with mock.patch.object(layered.os, 'getpid', return_value=-1):
+            self.store.set(layered._encode_key('profiles', 'key'), 'new', layered.time.time() + 60)
+
+        self.assertEqual(cache.get('key'), 'new')
+        self.assertEqual(other_cache.get('key'), 'other')
+
+    def test_evicts_everything_when_cleared_elsewhere(self):
+        cache = layered.LayeredCache('profiles', self.store, ttl=60)
+        cache.set('key', 'value')
+        with mock.patch.object(layered.os, 'getpid', return_value=-1):
+            self.store.clear('profiles:')
+        self.assertIsNone(cache.get('key'))
+
+    def test_adds_through_to_store(self):
+        cache = layered.LayeredCache('deliveries', self.store, ttl=60)
+        other_cache = layered.LayeredCache('deliveries', self.store, ttl=60)
+        self.assertTrue(cache.add('delivery', True))
+        self.assertFalse(other_cache.add('delivery', True))
+        self.assertIn('delivery', other_cache)
+
+    def test_delete_and_clear(self):
+        cache = layered.LayeredCache('profiles', self.store, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.delete('a')
+        self.assertIsNone(cache.get('a'))
+        cache.clear()
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache.l1), 0)
+
+    def test_l1_is_bounded(self):
+        cache = layered.LayeredCache('profiles', self.store, ttl=60, l1_size=2)
+        for key in range(5):
+            cache.set(key, key)
+        self.assertEqual(len(cache.l1), 2)
+        self.assertEqual(cache.get(0), 0)
+
+
+class RedisStoreTestCase(TestCase):
+    def test_requires_redis(self):
+        with mock.patch.object(layered, 'redis', None):
+            with self.assertRaises(ImportError):
+                layered.RedisStore('redis://localhost:6379/0')
+
+    def test_adds_with_set_nx(self):
+        with mock.patch.object(layered, 'redis') as redis:
+            store = layered.RedisStore('redis://localhost:6379/0')
+        client = redis.Redis.from_url.return_value
+        client.set.return_value = None
+        self.assertFalse(store.add('key', 'value', layered.time.time() + 60))
+        self.assertEqual(client.set.call_args[1]['nx'], True)
+        client.publish.assert_not_called()
+
+        client.set.return_value = True
+        self.assertTrue(store.add('key', 'value', layered.time.time() + 60))
+        client.publish.assert_called_once()
@@ -0,0 +1,81 @@
+import pickle
+import tracemalloc
+from unittest import mock, TestCase
+
+from cache import records
+from cache.records import CompactRecord, pack_record, unpack_record
+
+
+PROFILE = {
+    'followers': 4,
+    'following': 2,
+    'starred': 8,
+    'repositories': {'original': 3, 'forked': 1},
+    'stars': 10,
+    'issues': 0,
+    'watchers': -1,
+    'commits': 2 ** 40,
+    'languages': ['Python', 'C'],
+    'topics': [],
+}
+
+
+class CompactRecordTestCase(TestCase):
+    def test_round_trips_profiles(self):
+        record = pack_record(PROFILE)
+        self.assertIsInstance(record, CompactRecord)
+        data = unpack_record(record)
+        self.assertEqual(data, PROFILE)
+        self.assertEqual(list(data), list(PROFILE))
+        self.assertEqual(list(data['repositories']), ['original', 'forked'])
+        self.assertEqual(record, PROFILE)
+
+    def test_pickles_as_plain_data(self):
+        record = pack_record(PROFILE)
+        self.assertEqual(record.__reduce__(), (pack_record, (PROFILE,)))
+        restored = pickle.loads(pickle.dumps(record))
+        self.assertIsInstance(restored, CompactRecord)
+        self.assertEqual(restored, PROFILE)
+
+    def test_keeps_unsupported_values(self):
+        for value in (
+            None,
+            [1, 2],
+            {'flag': True},
+            {'ratio': 0.5},
+            {'commits': 2 ** 64},
+            {'nested': {'counts': {'a': 1}}},
+            {'languages': ['Python', None]},
+        ):
+            self.assertIs(pack_record(value), value)
+            self.assertIs(unpack_record(value), value)
+
+    def test_keeps_dicts_beyond_layout_limit(self):
+        with mock.patch.object(records, 'layouts', records.Vocabulary()):
+            with mock.patch.object(records, 'MAX_LAYOUTS', 1):
+                self.assertIsInstance(pack_record({'a': 1}), CompactRecord)
+                self.assertIsInstance(pack_record({'a': 2}), CompactRecord)
+                value = {'b': 1}
+                self.assertIs(pack_record(value), value)
+
+    def test_takes_less_memory_than_dicts(self):
+        def measure(build):
+            tracemalloc.start()
+            try:
+                values = build()
+                size = tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+            self.assertEqual(len(values), 1000)
+            return size
+
+        pack_record(PROFILE)
+        dict_size = measure(lambda: [
+            dict(PROFILE, stars=i, repositories=dict(PROFILE['repositories']),
+                 languages=list(PROFILE['languages']), topics=list(PROFILE['topics']))
+            for i in range(1000)
+        ])
+        record_size = measure(lambda: [
+            pack_record(dict(PROFILE, stars=i)) for i in range(1000)
+        ])
+        self.assertLess(record_size * 2, dict_size)
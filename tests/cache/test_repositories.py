@@ -0,0 +1,60 @@
+from unittest import mock, TestCase
+
+from cache import records
+from cache.records import CompactRecord
+from cache.repositories import RepositoryCache
+from cache.ttl import TTLCache
+
+
+class RepositoryCacheTestCase(TestCase):
+    def test_returns_metrics_of_matching_version(self):
+        cache = RepositoryCache(TTLCache(ttl=60))
+        cache.set('github', 'owner/repo', 'v1', {'commits': 3})
+        self.assertEqual(cache.get('github', 'owner/repo', 'v1'), {'commits': 3})
+        self.assertIsNone(cache.get('github', 'owner/repo', 'v2'))
+        self.assertIsNone(cache.get('bitbucket', 'owner/repo', 'v1'))
+
+    def test_invalidate(self):
+        cache = RepositoryCache(TTLCache(ttl=60))
+        cache.set('github', 'owner/repo', 'v1', {'commits': 3})
+        cache.invalidate('github', 'owner/repo')
+        self.assertIsNone(cache.get('github', 'owner/repo', 'v1'))
+
+    def test_get_or_compute_reuses_fresh_metrics(self):
+        cache = RepositoryCache(TTLCache(ttl=60))
+        compute = mock.Mock(side_effect=[{'commits': 1}, {'commits': 2}])
+        self.assertEqual(cache.get_or_compute('github', 'r', 'v1', compute), {'commits': 1})
+        self.assertEqual(cache.get_or_compute('github', 'r', 'v1', compute), {'commits': 1})
+        self.assertEqual(cache.get_or_compute('github', 'r', 'v2', compute), {'commits': 2})
+        self.assertEqual(compute.call_count, 2)
+
+    def test_get_or_compute_bypasses_cache_without_id(self):
+        cache = RepositoryCache(TTLCache(ttl=60))
+        compute = mock.Mock(return_value={'commits': 1})
+        cache.get_or_compute('github', None, 'v1', compute)
+        cache.get_or_compute('github', None, 'v1', compute)
+        self.assertEqual(compute.call_count, 2)
+
+    def test_stores_metrics_as_records(self):
+        entries = TTLCache(ttl=60)
+        cache = RepositoryCache(entries)
+        cache.set('github', 'owner/repo', 'v1', {'commits': 3, 'languages': ['Go']}, compact=True)
+        cache.set('github', 'owner/other', 'v1', 12, compact=True)
+        self.assertIsInstance(entries.get(('github', 'owner/repo'))['metrics'], CompactRecord)
+        self.assertEqual(
+            cache.get('github', 'owner/repo', 'v1'),
+            {'commits': 3, 'languages': ['Go']}
+        )
+        self.assertEqual(cache.get('github', 'owner/other', 'v1'), 12)
+
+    def test_keeps_data_keyed_metrics_as_dicts(self):
+        entries = TTLCache(ttl=60)
+        cache = RepositoryCache(entries)
+        layout_count = len(records.layouts)
+        label_count = len(records.labels)
+        for index in range(3):
+            contributors = {'contributor-{}'.format(index): index}
+            cache.get_or_compute('github_contributors', index, 'v1', lambda: contributors)
+        self.assertEqual(entries.get(('github_contributors', 2))['metrics'], {'contributor-2': 2})
+        self.assertEqual(len(records.layouts), layout_count)
+        self.assertEqual(len(records.labels), label_count)
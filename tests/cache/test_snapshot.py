@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+from unittest import mock, TestCase
+
+from cache import snapshot
+from cache.ttl import TTLCache
+
+
+class SnapshotTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'profiles.snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def test_round_trip(self):
+        expires_at = snapshot.time.time() + 60
+        entries = [
+            (('user', None, True), {'github': {'stars': 1}}, expires_at),
+            ('expired', 'value', snapshot.time.time() - 1),
+        ]
+        self.assertEqual(snapshot.write_snapshot(self.path, entries), 1)
+
+        loaded = snapshot.Snapshot(self.path)
+        self.assertEqual(len(loaded), 1)
+        self.assertEqual(
+            loaded.pop(('user', None, True)),
+            ({'github': {'stars': 1}}, expires_at)
+        )
+        self.assertIsNone(loaded.pop(('user', None, True)))
+        self.assertIsNone(loaded.pop('expired'))
+
+    def test_copies_raw_entries(self):
+        expires_at = snapshot.time.time() + 60
+        snapshot.write_snapshot(self.path, [('a', 1, expires_at), ('b', 2, expires_at)])
+        previous = snapshot.Snapshot(self.path)
+        previous.discard('b')
+
+        snapshot.write_snapshot(self.path, [('c', 3, expires_at)], previous.raw_entries())
+        loaded = snapshot.Snapshot(self.path)
+        self.assertEqual(loaded.pop('a'), (1, expires_at))
+        self.assertIsNone(loaded.pop('b'))
+        self.assertEqual(loaded.pop('c'), (3, expires_at))
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as other_file:
+            other_file.write(b'not a snapshot at all')
+        with self.assertRaises(ValueError):
+            snapshot.Snapshot(self.path)
+
+
+class TTLCacheSnapshotTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'profiles.snapshot')
+        expires_at = snapshot.time.time() + 60
+        snapshot.write_snapshot(self.path, [('a', 1, expires_at), ('b', 2, expires_at)])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def test_loads_snapshot_entries_on_demand(self):
+        cache = TTLCache(ttl=60)
+        cache.attach_snapshot(snapshot.Snapshot(self.path))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_writes_shadow_snapshot_entries(self):
+        cache = TTLCache(ttl=60)
+        cache.attach_snapshot(snapshot.Snapshot(self.path))
+        cache.set('a', 10)
+        cache.delete('b')
+        self.assertEqual(cache.get('a'), 10)
+        self.assertIsNone(cache.get('b'))
+
+    def test_snapshot_entries_include_unloaded_entries(self):
+        cache = TTLCache(ttl=60)
+        cache.attach_snapshot(snapshot.Snapshot(self.path))
+        cache.get('a')
+        entries, raw_entries = cache.get_snapshot_entries()
+        self.assertEqual([key for key, _, _ in entries], ['a'])
+        self.assertEqual([key for key, _, _ in raw_entries], ['b'])
+
+
+class CheckpointerTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def test_restores_checkpointed_caches(self):
+        cache = TTLCache(ttl=60)
+        cache.set('key', 'value')
+        snapshot.Checkpointer({'profiles': cache}, self.directory, 60).checkpoint()
+
+        restarted_cache = TTLCache(ttl=60)
+        snapshot.Checkpointer({'profiles': restarted_cache}, self.directory, 60).restore()
+        self.assertEqual(restarted_cache.get('key'), 'value')
+
+    def test_ignores_missing_and_corrupt_snapshots(self):
+        with open(os.path.join(self.directory, 'broken.snapshot'), 'wb') as broken_file:
+            broken_file.write(b'garbage')
+        caches = {'missing': TTLCache(ttl=60), 'broken': TTLCache(ttl=60)}
+        snapshot.Checkpointer(caches, self.directory, 60).restore()
+        self.assertIsNone(caches['broken'].get('key'))
+
+    def test_stop_writes_final_checkpoint(self):
+        checkpointer = snapshot.Checkpointer({}, self.directory, 60)
+        with mock.patch.object(checkpointer, 'checkpoint') as mock_checkpoint:
+            checkpointer.start()
+            checkpointer.stop()
+            checkpointer.join()
+        mock_checkpoint.assert_called_once_with()
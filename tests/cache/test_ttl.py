@@ -0,0 +1,54 @@
+from unittest import mock, TestCase
+
+from cache import ttl
+
+
+class TTLCacheTestCase(TestCase):
+    def test_returns_stored_value(self):
+        cache = ttl.TTLCache(ttl=60)
+        cache.set('key', 'value')
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertIn('key', cache)
+
+    def test_returns_default_on_miss(self):
+        cache = ttl.TTLCache(ttl=60)
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.get('key', 'default'), 'default')
+
+    def test_expires_entries(self):
+        cache = ttl.TTLCache(ttl=60)
+        with mock.patch.object(ttl.time, 'time', return_value=0):
+            cache.set('key', 'value')
+            cache.set('other_key', 'value', ttl=120)
+        with mock.patch.object(ttl.time, 'time', return_value=60):
+            self.assertIsNone(cache.get('key'))
+            self.assertEqual(cache.get_entry('other_key'), ('value', 120))
+
+    def test_adds_missing_or_expired_entries_only(self):
+        cache = ttl.TTLCache(ttl=60)
+        with mock.patch.object(ttl.time, 'time', return_value=0):
+            self.assertTrue(cache.add('key', 'first'))
+            self.assertFalse(cache.add('key', 'second'))
+            self.assertEqual(cache.get('key'), 'first')
+        with mock.patch.object(ttl.time, 'time', return_value=60):
+            self.assertTrue(cache.add('key', 'third'))
+            self.assertEqual(cache.get('key'), 'third')
+
+    def test_delete_and_clear(self):
+        cache = ttl.TTLCache(ttl=60)
+        cache.set('key', 'value')
+        cache.set('other_key', 'value')
+        cache.delete('key')
+        self.assertNotIn('key', cache)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_evicts_least_recently_used_entries(self):
+        cache = ttl.TTLCache(ttl=60, max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
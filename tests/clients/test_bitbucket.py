@@ -3,8 +3,16 @@ from unittest import mock, TestCase
 
 import responses
 
+from cache import RepositoryCache, TTLCache
+from clients import bitbucket, retry
+from clients.budget import RequestBudget
 from clients.bitbucket import config, BitBucketClient
-from clients.exceptions import ApiResponseError, RateLimitError, UnknownProfileError
+from clients.exceptions import (
+    ApiResponseError,
+    BudgetExhaustedError,
+    RateLimitError,
+    UnknownProfileError,
+)
 
 
 class BitBucketClientTestCase(TestCase):
@@ -47,6 +55,64 @@ class BitBucketClientTestCase(TestCase):
 
         self.assertEqual(cm.exception.args, (404, test_response))
 
+    @responses.activate
+    def test_get_resource_retries_server_errors(self):
+        client = BitBucketClient()
+        test_url = 'https://api.bitbucket.org/2.0/teams/mailchimp'
+        responses.add(responses.GET, test_url, json={'error': 'oops'}, status=503)
+        responses.add(responses.GET, test_url, json={'username': 'mailchimp'}, status=200)
+
+        with mock.patch.object(bitbucket.retry_policy, 'get_delay', return_value=0):
+            self.assertEqual(client._get_resource(test_url), {'username': 'mailchimp'})
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_get_resource_retries_server_errors_without_json_body(self):
+        client = BitBucketClient()
+        test_url = 'https://api.bitbucket.org/2.0/teams/mailchimp'
+        responses.add(responses.GET, test_url, body='<html>Bad Gateway</html>', status=502)
+        responses.add(responses.GET, test_url, json={'username': 'mailchimp'}, status=200)
+
+        with mock.patch.object(bitbucket.retry_policy, 'get_delay', return_value=0):
+            self.assertEqual(client._get_resource(test_url), {'username': 'mailchimp'})
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_get_resource_waits_out_rate_limit(self):
+        client = BitBucketClient()
+        test_url = 'https://api.bitbucket.org/2.0/teams/mailchimp'
+        responses.add(
+            responses.GET,
+            test_url,
+            json={'error': 'slow down'},
+            status=429,
+            headers={'Retry-After': '2'}
+        )
+        responses.add(responses.GET, test_url, json={'username': 'mailchimp'}, status=200)
+
+        with mock.patch.object(retry.time, 'sleep') as mock_sleep:
+            self.assertEqual(client._get_resource(test_url), {'username': 'mailchimp'})
+        mock_sleep.assert_called_once_with(2.0)
+
+    def test_classify_error(self):
+        self.assertEqual(bitbucket.classify_error(ApiResponseError(502, {})), (True, None))
+        self.assertEqual(bitbucket.classify_error(ApiResponseError(404, {})), (False, None))
+        self.assertEqual(bitbucket.classify_error(RateLimitError('limit')), (False, None))
+        self.assertEqual(bitbucket.classify_error(UnknownProfileError('missing')), (False, None))
+
+        error = RateLimitError('limit')
+        error.retry_after = 5
+        self.assertEqual(bitbucket.classify_error(error), (True, 5))
+
+    def test_hedges_when_configured(self):
+        with mock.patch.dict(config, {'hedge_requests': 'true'}):
+            client = BitBucketClient()
+        self.assertIs(client.hedging_policy, bitbucket.hedging_policy)
+
+        with mock.patch.object(client, '_request_resource', return_value={'size': 1}):
+            self.assertEqual(client._get_resource('some_url'), {'size': 1})
+            client._request_resource.assert_called_once_with('some_url')
+
     @responses.activate
     def test_get_response_size_returns_size_attribute(self):
         client = BitBucketClient()
@@ -71,6 +137,45 @@ class BitBucketClientTestCase(TestCase):
             [1, 2, 3, 4, 5, 6]
         )
 
+    @responses.activate
+    def test_get_response_values_prefetches_sized_collections(self):
+        client = BitBucketClient()
+        client.page_window = 2
+        test_url = 'https://api.bitbucket.org/2.0/repositories/user?pagelen=2'
+        page_url = 'https://api.bitbucket.org/2.0/repositories/user?pagelen=2&page={}'
+        pages = {
+            1: {'values': [1, 2], 'page': 1, 'pagelen': 2, 'size': 7, 'next': page_url.format(2)},
+            2: {'values': [3, 4], 'page': 2, 'pagelen': 2, 'size': 7, 'next': page_url.format(3)},
+            3: {'values': [5, 6], 'page': 3, 'pagelen': 2, 'size': 7, 'next': page_url.format(4)},
+            4: {'values': [7], 'page': 4, 'pagelen': 2, 'size': 7},
+        }
+        responses.add(responses.GET, test_url, json=pages[1], status=200)
+        for number in (2, 3, 4):
+            responses.add(responses.GET, page_url.format(number), json=pages[number], status=200)
+
+        self.assertEqual(list(client._get_response_values(test_url)), [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(len(responses.calls), 4)
+
+    def test_get_remaining_page_urls(self):
+        page = {
+            'page': 2,
+            'pagelen': 10,
+            'size': 45,
+            'next': 'https://api.bitbucket.org/2.0/teams/t/members?q=x&page=3',
+        }
+        self.assertEqual(
+            BitBucketClient._get_remaining_page_urls(page),
+            [
+                'https://api.bitbucket.org/2.0/teams/t/members?q=x&page=3',
+                'https://api.bitbucket.org/2.0/teams/t/members?q=x&page=4',
+                'https://api.bitbucket.org/2.0/teams/t/members?q=x&page=5',
+            ]
+        )
+
+    def test_get_remaining_page_urls_without_size(self):
+        self.assertIsNone(BitBucketClient._get_remaining_page_urls({'next': 'next_link'}))
+        self.assertEqual(BitBucketClient._get_remaining_page_urls({'size': 3}), [])
+
     @responses.activate
     def test_get_profile_raises_error_on_missing_profile(self):
         client = BitBucketClient()
@@ -188,3 +293,151 @@ class BitBucketClientTestCase(TestCase):
                     'languages': ['Erlang']
                 }
             )
+
+    def test_get_repository_data_reuses_cached_repository_metrics(self):
+        client = BitBucketClient()
+        client.repository_cache = RepositoryCache(TTLCache(ttl=60))
+        user = {
+            'username': 'some_username',
+            'links': {'repositories': {'href': 'repositories_link'}}
+        }
+        repo = {
+            'uuid': '{some-uuid}',
+            'updated_on': '2018-10-01T00:00:00+00:00',
+            'slug': 'some_repo',
+            'has_issues': False,
+            'language': 'Erlang',
+            'links': {'watchers': {'href': 'watchers_link'}},
+        }
+        client.repository_cache.set(
+            'bitbucket',
+            '{some-uuid}',
+            '2018-10-01T00:00:00+00:00',
+            {'watchers': 4, 'commits': 5, 'issues': 6}
+        )
+
+        with mock.patch.object(client, '_get_response_values', return_value=[repo]):
+            with mock.patch.object(client, '_get_repository_metrics') as mock_get_metrics:
+                data = client._get_repository_data(user)
+
+        mock_get_metrics.assert_not_called()
+        self.assertEqual(
+            data,
+            {
+                'repositories': 1,
+                'watchers': 4,
+                'commits': 5,
+                'issues': 6,
+                'languages': ['Erlang'],
+            }
+        )
+
+
+
+class GetTeamTestCase(TestCase):
+    def _add_page(self, url, values):
+        responses.add(responses.GET, url, json={'values': values}, status=200)
+
+    def _make_repo(self, full_name):
+        return {
+            'uuid': '{' + full_name + '}',
+            'updated_on': '2018-10-01',
+            'full_name': full_name,
+            'slug': full_name.split('/')[1],
+            'language': 'Haskell',
+            'has_issues': False,
+            'links': {'watchers': {'href': 'https://bb/watchers/' + full_name}},
+        }
+
+    @responses.activate
+    def test_crawls_each_repository_once(self):
+        client = BitBucketClient()
+        client.base_url = 'https://bb'
+        client.repository_cache = RepositoryCache(TTLCache(ttl=60))
+        shared_repo = self._make_repo('team/shared')
+        responses.add(
+            responses.GET,
+            'https://bb/teams/team',
+            json={'links': {'repositories': {'href': 'https://bb/repositories/team'}}},
+            status=200,
+        )
+        self._add_page('https://bb/teams/team/members', [{'username': 'ada'}])
+        self._add_page('https://bb/repositories/team', [shared_repo])
+        responses.add(
+            responses.GET,
+            'https://bb/users/ada',
+            json={'links': {
+                'repositories': {'href': 'https://bb/repositories/ada'},
+                'followers': {'href': 'https://bb/followers/ada'},
+                'following': {'href': 'https://bb/following/ada'},
+            }},
+            status=200,
+        )
+        self._add_page('https://bb/repositories/ada', [shared_repo])
+        for url in ('https://bb/followers/ada', 'https://bb/following/ada',
+                    'https://bb/watchers/team/shared'):
+            responses.add(responses.GET, url, json={'size': 2}, status=200)
+        self._add_page('https://bb/repositories/team/shared/commits', [
+            {'author': {'user': {'username': 'ada'}}},
+            {'author': {'user': {'username': 'ada'}}},
+            {'author': {'user': {'username': 'stranger'}}},
+            {'author': {'raw': 'Anonymous <anon@example.com>'}},
+        ])
+
+        crawl = client.get_team('team', RequestBudget(100))
+
+        self.assertTrue(crawl['complete'])
+        self.assertEqual(crawl['members'], {'ada': {'followers': 2, 'following': 2}})
+        self.assertEqual(
+            crawl['repositories'],
+            {
+                'team/shared': {
+                    'owner': 'team',
+                    'fork': False,
+                    'issues': 0,
+                    'watchers': 2,
+                    'languages': ['Haskell'],
+                    'topics': [],
+                    'commits': {'ada': 2},
+                },
+            }
+        )
+        commit_requests = [
+            call for call in responses.calls
+            if call.request.url.endswith('/commits')
+        ]
+        self.assertEqual(len(commit_requests), 1)
+
+    @responses.activate
+    def test_charges_budget_for_each_request(self):
+        client = BitBucketClient()
+        client.base_url = 'https://bb'
+        responses.add(
+            responses.GET,
+            'https://bb/teams/team',
+            json={'links': {'repositories': {'href': 'https://bb/repositories/team'}}},
+            status=200,
+        )
+        request_budget = RequestBudget(1)
+        with self.assertRaises(BudgetExhaustedError):
+            client.get_team('team', request_budget)
+        self.assertEqual(len(responses.calls), 1)
+        self.assertEqual(request_budget.spent, 1)
+        self.assertIsNone(client.budget)
+
+    @responses.activate
+    def test_raises_error_on_unknown_team(self):
+        client = BitBucketClient()
+        client.base_url = 'https://bb'
+        responses.add(responses.GET, 'https://bb/teams/team', json={}, status=404)
+        with self.assertRaises(UnknownProfileError):
+            client.get_team('team', RequestBudget(100))
+
+class GetSessionTestCase(TestCase):
+    def test_reuses_session_within_process(self):
+        self.assertIs(bitbucket.get_session(), bitbucket.get_session())
+
+    def test_creates_session_after_fork(self):
+        session = bitbucket.get_session()
+        with mock.patch.object(bitbucket.os, 'getpid', return_value=-1):
+            self.assertIsNot(bitbucket.get_session(), session)
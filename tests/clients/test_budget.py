@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from clients import budget
+from clients.exceptions import BudgetExhaustedError
+
+
+class RequestBudgetTestCase(TestCase):
+    def test_spends_up_to_limit(self):
+        request_budget = budget.RequestBudget(5)
+        self.assertTrue(request_budget.spend(3))
+        self.assertFalse(request_budget.spend(3))
+        self.assertTrue(request_budget.spend(2))
+        self.assertEqual(request_budget.spent, 5)
+        self.assertTrue(request_budget.exhausted)
+
+
+    def test_charges_single_requests(self):
+        request_budget = budget.RequestBudget(1)
+        request_budget.charge()
+        with self.assertRaises(BudgetExhaustedError):
+            request_budget.charge()
+        self.assertEqual(request_budget.spent, 1)
+
+
+class FanOutTestCase(TestCase):
+    def test_processes_items_within_budget(self):
+        request_budget = budget.RequestBudget(3)
+
+        def task(requests):
+            for _ in range(requests):
+                request_budget.charge()
+            return requests
+
+        results = budget.fan_out(
+            task,
+            {'a': 1, 'b': 2, 'c': 3},
+            budget=request_budget,
+            max_workers=1,
+        )
+        self.assertEqual(results, {'a': 1, 'b': 2})
+        self.assertEqual(request_budget.spent, 3)
@@ -2,13 +2,20 @@ from contextlib import ExitStack
 from unittest import mock, TestCase
 
 import github
+from github.Requester import Requester
 
+from cache import RepositoryCache, TTLCache
+from clients.budget import RequestBudget
 from clients.exceptions import (
+    BudgetExhaustedError,
     InvalidCredentialsError,
     RateLimitError,
     UnknownProfileError,
 )
+from clients import github as github_client
 from clients.github import GithubClient
+from clients.github_commits import CommitCounter
+from clients.limiter import AdaptiveLimiter
 
 
 class GithubClientTestCase(TestCase):
@@ -42,6 +49,47 @@ class GithubClientTestCase(TestCase):
                 client.get_profile('foobar')
             self.assertEqual(str(cm.exception), 'Exceeded GitHub rate limit')
 
+    def test_get_profile_retries_server_errors(self):
+        client = GithubClient()
+        error = github.GithubException(502, None)
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(client.client, 'get_user', side_effect=[error, mock.MagicMock()]),
+                mock.patch.object(client, '_get_user_data', return_value={'user': 'data'}),
+                mock.patch.object(client, '_get_repository_data', return_value={'repo': 'data'}),
+                mock.patch.object(client.retry_policy, 'get_delay', return_value=0),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            data = client.get_profile('foobar')
+            self.assertEqual(client.client.get_user.call_count, 2)
+            self.assertEqual(data, {'user': 'data', 'repo': 'data'})
+
+    def test_classify_error(self):
+        self.assertEqual(
+            github_client.classify_error(github.GithubException(500, None)),
+            (True, None)
+        )
+        self.assertEqual(
+            github_client.classify_error(github.UnknownObjectException(404, None)),
+            (False, None)
+        )
+        secondary_limit = github.RateLimitExceededException(403, None, {'retry-after': '3'})
+        self.assertEqual(github_client.classify_error(secondary_limit), (True, 3.0))
+
+    def test_is_overloaded(self):
+        self.assertTrue(github_client.is_overloaded(
+            github.RateLimitExceededException(403, None)
+        ))
+        self.assertTrue(github_client.is_overloaded(
+            github.GithubException(403, {'message': 'You have triggered an abuse detection mechanism.'})
+        ))
+        self.assertFalse(github_client.is_overloaded(
+            github.GithubException(403, {'message': 'Resource not accessible'})
+        ))
+        self.assertFalse(github_client.is_overloaded(github.GithubException(500, None)))
+
     def test_get_profile_raises_error_on_bad_credentials(self):
         client = GithubClient()
         error = github.BadCredentialsException(None, None)
@@ -112,7 +160,9 @@ class GithubClientTestCase(TestCase):
         repo_2.get_commits.return_value.totalCount = 79
         user.get_repos.return_value = [repo_1, repo_2]
 
-        data = GithubClient._get_repository_data(user)
+        client = GithubClient()
+        client.commit_counter = CommitCounter('total_count')
+        data = client._get_repository_data(user)
         self.assertIsInstance(data, dict)
         self.assertEqual(data['repositories'], {'original': 1, 'forked': 1})
         self.assertEqual(data['stars'], 5)
@@ -121,3 +171,194 @@ class GithubClientTestCase(TestCase):
         self.assertEqual(data['commits'], 79)
         self.assertCountEqual(data['languages'], ['Python', 'JavaScript'])
         self.assertCountEqual(data['topics'], ['test', 'repositories'])
+
+    def test_get_repository_data_retries_single_requests(self):
+        user = mock.MagicMock(login='octocat')
+        repos = [
+            mock.MagicMock(
+                fork=False,
+                full_name='octocat/{}'.format(name),
+                language='Go',
+                topics=None,
+            )
+            for name in ('first', 'second')
+        ]
+        user.get_repos.return_value = repos
+
+        client = GithubClient()
+        client.repository_cache = RepositoryCache(TTLCache(ttl=60))
+        client.commit_counter = mock.Mock()
+        client.commit_counter.count.side_effect = [1, github.GithubException(502, None), 2]
+        with mock.patch.object(client.retry_policy, 'get_delay', return_value=0):
+            data = client._get_repository_data(user)
+
+        self.assertEqual(data['commits'], 3)
+        user.get_repos.assert_called_once_with()
+        self.assertEqual(
+            [call[0][0] for call in client.commit_counter.count.call_args_list],
+            [repos[0], repos[1], repos[1]]
+        )
+
+    def test_get_repository_data_reuses_cached_commit_counts(self):
+        user = mock.MagicMock(login='octocat')
+        repo = mock.MagicMock(
+            fork=False,
+            full_name='octocat/repo',
+            pushed_at='2018-10-01',
+            stargazers_count=0,
+            open_issues_count=0,
+            watchers_count=0,
+            language=None,
+            topics=None,
+        )
+        user.get_repos.return_value = [repo]
+
+        client = GithubClient()
+        client.repository_cache = RepositoryCache(TTLCache(ttl=60))
+        client.commit_counter = mock.Mock()
+        client.commit_counter.count.return_value = 12
+        self.assertEqual(client._get_repository_data(user)['commits'], 12)
+        self.assertEqual(client._get_repository_data(user)['commits'], 12)
+        client.commit_counter.count.assert_called_once_with(repo, user)
+
+        repo.pushed_at = '2018-10-02'
+        client._get_repository_data(user)
+        self.assertEqual(client.commit_counter.count.call_count, 2)
+
+
+class GetOrganizationTestCase(TestCase):
+    def _make_repo(self, full_name, owner, fork=False):
+        repo = mock.MagicMock(
+            full_name=full_name,
+            fork=fork,
+            pushed_at='2018-10-01',
+            stargazers_count=1,
+            open_issues_count=0,
+            watchers_count=1,
+            language='Go',
+            topics=None,
+        )
+        repo.owner.login = owner
+        return repo
+
+    def _make_client(self):
+        client = GithubClient()
+        client.client = mock.Mock()
+        client.repository_cache = RepositoryCache(TTLCache(ttl=60))
+        client._hook_requester()
+        return client
+
+    def test_crawls_each_repository_once(self):
+        shared_repo = self._make_repo('org/shared', 'org')
+        own_repo = self._make_repo('ada/own', 'ada')
+        ada = mock.MagicMock(login='ada')
+        ada.get_repos.return_value = [shared_repo, own_repo]
+        bob = mock.MagicMock(login='bob')
+        bob.get_repos.return_value = [shared_repo]
+        organization = mock.Mock()
+        organization.get_members.return_value = [ada, bob]
+        organization.get_repos.return_value = [shared_repo]
+
+        client = self._make_client()
+        client.client.get_organization.return_value = organization
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(client, '_get_user_data', return_value={'followers': 1}),
+                mock.patch.object(
+                    client,
+                    '_get_contributor_commits',
+                    return_value={'ada': 2, 'bob': 3, 'stranger': 4}
+                ),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            crawl = client.get_organization('org', RequestBudget(100))
+            self.assertEqual(client._get_contributor_commits.call_count, 2)
+
+        self.assertTrue(crawl['complete'])
+        self.assertEqual(crawl['members'], {'ada': {'followers': 1}, 'bob': {'followers': 1}})
+        self.assertEqual(sorted(crawl['repositories']), ['ada/own', 'org/shared'])
+        self.assertEqual(
+            crawl['repositories']['org/shared']['commits'],
+            {'ada': 2, 'bob': 3}
+        )
+
+    def test_stops_within_budget(self):
+        client = GithubClient()
+        client.client = mock.Mock()
+        client.repository_cache = RepositoryCache(TTLCache(ttl=60))
+        requester = client.client._Github__requester
+        request_json = requester.requestJson
+        request_json.return_value = (200, {}, '[]')
+        client._hook_requester()
+
+        def get_repos():
+            requester.requestJson('GET', '/users/ada/repos')
+            return []
+
+        ada = mock.MagicMock(login='ada')
+        ada.get_repos.side_effect = get_repos
+        organization = mock.Mock()
+        organization.get_members.return_value = [ada]
+        organization.get_repos.return_value = [self._make_repo('org/repo', 'org')]
+        client.client.get_organization.return_value = organization
+        with ExitStack() as stack:
+            context_managers = (
+                mock.patch.object(client, '_get_user_data', return_value={'followers': 1}),
+                mock.patch.object(
+                    client,
+                    '_get_contributor_commits',
+                    side_effect=lambda repo: requester.requestJson('GET', '/stats')
+                ),
+            )
+            for context_manager in context_managers:
+                stack.enter_context(context_manager)
+
+            crawl = client.get_organization('org', RequestBudget(1))
+
+        self.assertFalse(crawl['complete'])
+        self.assertEqual(crawl['members'], {'ada': {'followers': 1}})
+        self.assertEqual(crawl['repositories'], {})
+        request_json.assert_called_once_with('GET', '/users/ada/repos')
+
+    def test_charges_requests_sent_through_client(self):
+        response = (200, {}, '{}')
+        with mock.patch.object(Requester, 'requestJson', return_value=response) as mock_send:
+            client = GithubClient('token')
+            requester = client.client._Github__requester
+            client.budget = RequestBudget(1)
+            requester.requestJson('GET', '/users/ada')
+            with self.assertRaises(BudgetExhaustedError):
+                requester.requestJson('GET', '/users/bob')
+            client.budget = None
+            requester.requestJson('GET', '/users/cy')
+            self.assertEqual(mock_send.call_count, 2)
+
+    def test_limits_requests_sent_through_client(self):
+        refusal = (403, {'x-ratelimit-remaining': '0'}, '{"message": "API rate limit exceeded"}')
+        with mock.patch.object(Requester, 'requestJson', return_value=refusal):
+            client = GithubClient('token')
+            client.limiter = AdaptiveLimiter(
+                github_client.is_overloaded,
+                initial_limit=8,
+                is_refused=github_client.is_refused,
+            )
+            response = client.client._Github__requester.requestJson('GET', '/users/ada')
+        self.assertEqual(response, refusal)
+        self.assertEqual(client.limiter.limit, 4)
+        self.assertEqual(client.limiter.in_flight, 0)
+
+    def test_is_refused(self):
+        self.assertTrue(github_client.is_refused((429, {}, '')))
+        self.assertTrue(github_client.is_refused(
+            (403, {}, '{"message": "You have exceeded a secondary rate limit."}')
+        ))
+        self.assertFalse(github_client.is_refused((403, {}, '{"message": "Forbidden"}')))
+        self.assertFalse(github_client.is_refused((200, {}, '{}')))
+
+    def test_raises_error_on_unknown_organization(self):
+        client = self._make_client()
+        client.client.get_organization.side_effect = github.UnknownObjectException(404, None)
+        with self.assertRaises(UnknownProfileError):
+            client.get_organization('org', RequestBudget(100))
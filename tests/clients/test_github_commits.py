@@ -0,0 +1,168 @@
+from unittest import mock, TestCase
+
+import github
+
+from clients import github_commits
+from clients.exceptions import ApiResponseError
+
+
+class CountWithLinkHeaderTestCase(TestCase):
+    def test_reads_last_page_number(self):
+        repo = mock.MagicMock(url='https://api.github.com/repos/owner/repo')
+        user = mock.MagicMock(login='octocat')
+        link = (
+            '<https://api.github.com/repositories/1/commits?author=octocat&per_page=1&page=2>; '
+            'rel="next", '
+            '<https://api.github.com/repositories/1/commits?author=octocat&per_page=1&page=42>; '
+            'rel="last"'
+        )
+        repo._requester.requestJsonAndCheck.return_value = ({'link': link}, [{}])
+
+        self.assertEqual(github_commits.count_with_link_header(repo, user), 42)
+        repo._requester.requestJsonAndCheck.assert_called_once_with(
+            'GET',
+            'https://api.github.com/repos/owner/repo/commits',
+            parameters={'author': 'octocat', 'per_page': 1},
+        )
+
+    def test_counts_single_page(self):
+        repo = mock.MagicMock()
+        repo._requester.requestJsonAndCheck.return_value = ({}, [{}])
+        self.assertEqual(github_commits.count_with_link_header(repo, mock.MagicMock()), 1)
+
+    def test_counts_empty_repository(self):
+        repo = mock.MagicMock()
+        error = github.GithubException(409, {'message': 'Git Repository is empty.'}, None)
+        repo._requester.requestJsonAndCheck.side_effect = error
+        self.assertEqual(github_commits.count_with_link_header(repo, mock.MagicMock()), 0)
+
+
+class CountWithContributorStatsTestCase(TestCase):
+    def _contributor(self, login, total):
+        contributor = mock.MagicMock(total=total)
+        contributor.author.login = login
+        return contributor
+
+    def test_finds_user(self):
+        repo = mock.MagicMock()
+        repo.get_stats_contributors.return_value = [
+            self._contributor('someone', 3),
+            self._contributor('octocat', 12),
+        ]
+        user = mock.MagicMock(login='octocat')
+        self.assertEqual(github_commits.count_with_contributor_stats(repo, user), 12)
+
+    def test_returns_none_while_computing(self):
+        repo = mock.MagicMock()
+        repo.get_stats_contributors.return_value = None
+        user = mock.MagicMock(login='octocat')
+        self.assertIsNone(github_commits.count_with_contributor_stats(repo, user))
+
+    def test_missing_user(self):
+        repo = mock.MagicMock()
+        user = mock.MagicMock(login='octocat')
+        repo.get_stats_contributors.return_value = [self._contributor('someone', 3)]
+        self.assertEqual(github_commits.count_with_contributor_stats(repo, user), 0)
+
+        repo.get_stats_contributors.return_value = [self._contributor('someone', 3)] * 100
+        self.assertIsNone(github_commits.count_with_contributor_stats(repo, user))
+
+
+class CountWithGraphqlTestCase(TestCase):
+    def test_reads_history_total_count(self):
+        repo = mock.MagicMock(full_name='owner/repo')
+        user = mock.MagicMock(node_id='MDQ6VXNlcjE=')
+        repo._requester.requestJsonAndCheck.return_value = ({}, {
+            'data': {'repository': {'defaultBranchRef': {
+                'target': {'history': {'totalCount': 17}}
+            }}}
+        })
+
+        self.assertEqual(github_commits.count_with_graphql(repo, user), 17)
+        _, kwargs = repo._requester.requestJsonAndCheck.call_args
+        self.assertEqual(
+            kwargs['input']['variables'],
+            {'owner': 'owner', 'name': 'repo', 'author': 'MDQ6VXNlcjE='}
+        )
+
+    def test_handles_errors_and_empty_repositories(self):
+        repo = mock.MagicMock(full_name='owner/repo')
+        repo._requester.requestJsonAndCheck.return_value = ({}, {'errors': ['nope']})
+        self.assertIsNone(github_commits.count_with_graphql(repo, mock.MagicMock()))
+
+        repo._requester.requestJsonAndCheck.return_value = ({}, {
+            'data': {'repository': {'defaultBranchRef': None}}
+        })
+        self.assertEqual(github_commits.count_with_graphql(repo, mock.MagicMock()), 0)
+
+
+class CommitCounterTestCase(TestCase):
+    def _make_counter(self, **strategies):
+        counter = github_commits.CommitCounter()
+        counter.strategies = github_commits.OrderedDict(
+            (name, mock.Mock(side_effect=side_effect))
+            for name, side_effect in strategies.items()
+        )
+        return counter
+
+    def test_single_mode(self):
+        counter = github_commits.CommitCounter('graphql')
+        self.assertEqual(list(counter.strategies), ['graphql'])
+
+    def test_tries_untimed_strategies_then_cheapest(self):
+        counter = self._make_counter(slow=[5, 5], fast=[5, 5])
+        counter.costs = {'slow': 2.0}
+        repo = mock.MagicMock(full_name='owner/repo')
+        self.assertEqual(counter.count(repo, None), 5)
+        counter.strategies['fast'].assert_called_once_with(repo, None)
+        counter.strategies['slow'].assert_not_called()
+
+    def test_falls_back_when_strategy_is_unavailable(self):
+        counter = self._make_counter(
+            first=[None],
+            second=[github.GithubException(500, None)],
+            third=[7, 8],
+        )
+        repo = mock.MagicMock(full_name='owner/repo')
+        self.assertEqual(counter.count(repo, None), 7)
+        self.assertEqual(set(counter.costs), {'first', 'second', 'third'})
+
+        self.assertEqual(counter.count(repo, None), 8)
+        counter.strategies['first'].assert_called_once_with(repo, None)
+
+    def test_propagates_rate_limit(self):
+        error = github.RateLimitExceededException(403, None)
+        counter = self._make_counter(only=[error])
+        with self.assertRaises(github.RateLimitExceededException):
+            counter.count(mock.MagicMock(), None)
+
+    def test_raises_when_all_strategies_fail(self):
+        counter = self._make_counter(only=[None])
+        with self.assertRaises(ApiResponseError):
+            counter.count(mock.MagicMock(), None)
+
+        error = github.GithubException(502, None)
+        counter = self._make_counter(first=[None], last=[error])
+        with self.assertRaises(github.GithubException) as cm:
+            counter.count(mock.MagicMock(), None)
+        self.assertIs(cm.exception, error)
+
+    def test_penalizes_failures(self):
+        counter = self._make_counter(failing=[None], working=[3])
+        counter.costs = {'working': 1.0}
+        self.assertEqual(counter.count(mock.MagicMock(full_name='owner/repo'), None), 3)
+        self.assertGreaterEqual(counter.costs['failing'], 2.0)
+        self.assertEqual(counter._rank('other/repo'), ['working', 'failing'])
+
+    def test_record_smooths_costs(self):
+        counter = github_commits.CommitCounter(smoothing=0.5)
+        counter._record('link', 1.0)
+        counter._record('link', 3.0)
+        self.assertEqual(counter.costs, {'link': 2.0})
+
+    def test_benchmark_times_every_strategy(self):
+        counter = self._make_counter(first=[1], second=[None])
+        results = counter.benchmark(mock.MagicMock(), None)
+        self.assertEqual(results['first'][0], 1)
+        self.assertIsNone(results['second'][0])
+        self.assertEqual(set(counter.costs), {'first', 'second'})
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+import clients
+
+
+class LazyImportTestCase(TestCase):
+    def test_does_not_import_providers_until_accessed(self):
+        script = (
+            'import sys\n'
+            'import clients.exceptions\n'
+            'assert "github" not in sys.modules\n'
+            'assert "requests" not in sys.modules\n'
+            'from clients import GithubClient\n'
+            'assert "github" in sys.modules\n'
+        )
+        subprocess.check_call([sys.executable, '-c', script])
+
+    def test_raises_attribute_error_for_unknown_names(self):
+        with self.assertRaises(AttributeError):
+            clients.SourceForgeClient
+
+    def test_lists_lazy_attributes(self):
+        self.assertIn('GithubClient', dir(clients))
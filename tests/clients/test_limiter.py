@@ -0,0 +1,103 @@
+import threading
+from unittest import mock, TestCase
+
+from clients import limiter
+
+
+class AdaptiveLimiterTestCase(TestCase):
+    def _make_limiter(self, **kwargs):
+        return limiter.AdaptiveLimiter(
+            lambda error: isinstance(error, OverflowError),
+            **kwargs
+        )
+
+    def test_returns_result_of_call(self):
+        adaptive_limiter = self._make_limiter()
+        self.assertEqual(adaptive_limiter.call(max, 1, 2), 2)
+        self.assertEqual(adaptive_limiter.in_flight, 0)
+
+    def test_grows_limit_while_latency_is_flat(self):
+        adaptive_limiter = self._make_limiter(initial_limit=4, max_limit=5)
+        for _ in range(4):
+            adaptive_limiter._release(adaptive_limiter._acquire(), latency=0.1)
+        self.assertGreater(adaptive_limiter.limit, 4.9)
+
+        for _ in range(10):
+            adaptive_limiter._release(adaptive_limiter._acquire(), latency=0.1)
+        self.assertEqual(adaptive_limiter.limit, 5)
+
+    def test_cuts_limit_when_upstream_is_overloaded(self):
+        adaptive_limiter = self._make_limiter(initial_limit=8, backoff=0.5)
+        with self.assertRaises(OverflowError):
+            adaptive_limiter.call(mock.Mock(side_effect=OverflowError))
+        self.assertEqual(adaptive_limiter.limit, 4)
+        self.assertEqual(adaptive_limiter.in_flight, 0)
+
+    def test_cuts_limit_on_refused_result(self):
+        adaptive_limiter = self._make_limiter(
+            initial_limit=8,
+            backoff=0.5,
+            is_refused=lambda result: result == 'refused',
+        )
+        self.assertEqual(adaptive_limiter.call(str, 'refused'), 'refused')
+        self.assertEqual(adaptive_limiter.limit, 4)
+        adaptive_limiter.call(str, 'accepted')
+        self.assertGreater(adaptive_limiter.limit, 4)
+
+    def test_ignores_other_errors(self):
+        adaptive_limiter = self._make_limiter(initial_limit=8)
+        with self.assertRaises(ValueError):
+            adaptive_limiter.call(mock.Mock(side_effect=ValueError))
+        self.assertEqual(adaptive_limiter.limit, 8)
+
+    def test_cuts_limit_on_latency_spike(self):
+        adaptive_limiter = self._make_limiter(initial_limit=8, tolerance=2.0)
+        adaptive_limiter.baseline = 0.1
+        adaptive_limiter._release(adaptive_limiter._acquire(), latency=0.5)
+        self.assertEqual(adaptive_limiter.limit, 4)
+
+    def test_cuts_once_per_burst(self):
+        adaptive_limiter = self._make_limiter(initial_limit=8)
+        starts = [adaptive_limiter._acquire() for _ in range(3)]
+        for start in starts:
+            adaptive_limiter._release(start, overloaded=True)
+        self.assertEqual(adaptive_limiter.limit, 4)
+
+        adaptive_limiter._release(adaptive_limiter._acquire(), overloaded=True)
+        self.assertEqual(adaptive_limiter.limit, 2)
+
+    def test_does_not_cut_below_minimum(self):
+        adaptive_limiter = self._make_limiter(initial_limit=2, min_limit=2)
+        adaptive_limiter._release(adaptive_limiter._acquire(), overloaded=True)
+        self.assertEqual(adaptive_limiter.limit, 2)
+
+    def test_blocks_calls_beyond_limit(self):
+        adaptive_limiter = self._make_limiter(initial_limit=1)
+        start = adaptive_limiter._acquire()
+        acquired = threading.Event()
+
+        def acquire():
+            adaptive_limiter._acquire()
+            acquired.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        self.assertFalse(acquired.wait(0.05))
+        adaptive_limiter._release(start, latency=0.1)
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+
+    def test_reports_metrics(self):
+        adaptive_limiter = self._make_limiter(initial_limit=8)
+        adaptive_limiter._release(adaptive_limiter._acquire(), latency=0.25)
+        self.assertEqual(
+            adaptive_limiter.get_metrics(),
+            {'limit': 8, 'in_flight': 0, 'baseline_latency': 0.25}
+        )
+
+
+class MakeLimiterTestCase(TestCase):
+    def test_registers_limiter(self):
+        with mock.patch.dict(limiter.limiters, clear=True):
+            adaptive_limiter = limiter.make_limiter('upstream', bool)
+            self.assertIs(limiter.limiters['upstream'], adaptive_limiter)
@@ -0,0 +1,123 @@
+import threading
+from unittest import mock, TestCase
+
+from clients import retry
+
+
+class ParseRetryAfterTestCase(TestCase):
+    def test_parses_seconds(self):
+        self.assertEqual(retry.parse_retry_after('12'), 12.0)
+
+    def test_parses_http_date(self):
+        with mock.patch.object(retry.time, 'time', return_value=0):
+            self.assertEqual(retry.parse_retry_after('Thu, 01 Jan 1970 00:00:30 GMT'), 30)
+
+    def test_ignores_missing_or_invalid_values(self):
+        self.assertIsNone(retry.parse_retry_after(None))
+        self.assertIsNone(retry.parse_retry_after('soon'))
+
+
+class RetryBudgetTestCase(TestCase):
+    def test_limits_retries_to_share_of_calls(self):
+        budget = retry.RetryBudget(ratio=0.5, reserve=1)
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+
+class RetryPolicyTestCase(TestCase):
+    def _make_policy(self, classification=(True, None), **kwargs):
+        return retry.RetryPolicy(lambda error: classification, **kwargs)
+
+    def test_returns_result(self):
+        policy = self._make_policy()
+        self.assertEqual(policy.call(abs, -1), 1)
+
+    def test_retries_transient_errors(self):
+        policy = self._make_policy(max_attempts=3)
+        func = mock.Mock(side_effect=[ValueError(), ValueError(), 'result'])
+        with mock.patch.object(retry.time, 'sleep') as mock_sleep:
+            self.assertEqual(policy.call(func, 'arg'), 'result')
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    def test_gives_up_after_max_attempts(self):
+        policy = self._make_policy(max_attempts=2)
+        func = mock.Mock(side_effect=ValueError())
+        with mock.patch.object(retry.time, 'sleep'):
+            with self.assertRaises(ValueError):
+                policy.call(func)
+        self.assertEqual(func.call_count, 2)
+
+    def test_does_not_retry_permanent_errors(self):
+        policy = self._make_policy(classification=(False, None))
+        func = mock.Mock(side_effect=ValueError())
+        with self.assertRaises(ValueError):
+            policy.call(func)
+        func.assert_called_once_with()
+
+    def test_waits_as_long_as_asked(self):
+        policy = self._make_policy(classification=(True, 3), max_delay=5)
+        func = mock.Mock(side_effect=[ValueError(), 'result'])
+        with mock.patch.object(retry.time, 'sleep') as mock_sleep:
+            policy.call(func)
+        mock_sleep.assert_called_once_with(3)
+
+    def test_does_not_wait_longer_than_max_delay(self):
+        policy = self._make_policy(classification=(True, 60), max_delay=5)
+        func = mock.Mock(side_effect=ValueError())
+        with self.assertRaises(ValueError):
+            policy.call(func)
+        func.assert_called_once_with()
+
+    def test_respects_budget(self):
+        budget = retry.RetryBudget(ratio=0, reserve=0)
+        policy = self._make_policy(budget=budget)
+        func = mock.Mock(side_effect=ValueError())
+        with self.assertRaises(ValueError):
+            policy.call(func)
+        func.assert_called_once_with()
+
+    def test_backoff_is_jittered_and_capped(self):
+        policy = self._make_policy(base_delay=1, max_delay=3)
+        with mock.patch.object(retry.random, 'uniform', side_effect=lambda low, high: high):
+            self.assertEqual([policy.get_delay(attempt) for attempt in (1, 2, 3)], [1, 2, 3])
+
+
+class HedgingPolicyTestCase(TestCase):
+    def test_threshold_requires_samples(self):
+        policy = retry.HedgingPolicy(percentile=95, min_samples=3)
+        self.assertIsNone(policy.threshold)
+        for elapsed in (0.3, 0.1, 0.2):
+            policy._record(elapsed)
+        self.assertEqual(policy.threshold, 0.3)
+
+    def test_returns_result_without_hedging(self):
+        policy = retry.HedgingPolicy(min_samples=1)
+        func = mock.Mock(return_value='result')
+        self.assertEqual(policy.call(func, 'arg'), 'result')
+        func.assert_called_once_with('arg')
+
+    def test_hedges_slow_calls(self):
+        policy = retry.HedgingPolicy(min_samples=1)
+        policy._record(0.01)
+        release = threading.Event()
+        calls = []
+
+        def func():
+            calls.append(None)
+            if len(calls) == 1:
+                release.wait(5)
+                return 'slow'
+            return 'fast'
+
+        self.assertEqual(policy.call(func), 'fast')
+        release.set()
+        self.assertEqual(len(calls), 2)
+
+    def test_raises_when_every_attempt_fails(self):
+        policy = retry.HedgingPolicy()
+        with self.assertRaises(ValueError):
+            policy.call(mock.Mock(side_effect=ValueError()))
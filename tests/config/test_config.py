@@ -45,3 +45,20 @@ class LoadedConfigTestCase(TestCase):
     def test_config_attr_exists(self):
         self.assertTrue(hasattr(config, 'config'))
         self.assertIsInstance(config.config, dict)
+
+
+class ParseFileTestCase(TestCase):
+    def test_parses_unchanged_file_once(self):
+        with mock.patch.object(config.yaml, 'load', return_value={'key': 'value'}) as mock_load:
+            with mock.patch.dict(config._parsed_files, clear=True):
+                config._get_config('config/config.yaml')
+                loaded_config = config._get_config('config/config.yaml')
+        mock_load.assert_called_once_with(mock.ANY, Loader=config.SafeLoader)
+        self.assertEqual(loaded_config, {'key': 'value'})
+
+    def test_does_not_share_overrides_between_loads(self):
+        with mock.patch.dict(config._parsed_files, clear=True):
+            with mock.patch.dict(os.environ, {'GITHUB_TOKEN': 'overridden'}):
+                config._get_config('config/config.yaml')
+            loaded_config = config._get_config('config/config.yaml')
+        self.assertNotEqual(loaded_config['github_token'], 'overridden')